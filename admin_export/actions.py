@@ -5,10 +5,14 @@ Admin actions.
 
 from functools import partial
 
-from django.contrib import admin
 from django.contrib.contenttypes.models import ContentType
 from django.http import HttpResponseRedirect
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.utils.html import format_html
+
+from .jobs import enqueue_export, get_job_threshold
+from .selection import store_selection
+from .writers import get_formats
 
 #######################################################################
 
@@ -16,21 +20,29 @@ from django.urls import reverse_lazy
 def base_redirect_action(modeladmin, request, queryset, view_name, extra_query=None):
     """
     This is the base action.
+    The selection (explicit, or a filtered "select all") is stored
+    server-side; only its token is passed on to the export view.
+    Large exports (see ``jobs.get_job_threshold()``) are queued as
+    background jobs instead.
     """
     url = reverse_lazy(view_name)
-    selected = request.POST.getlist(admin.ACTION_CHECKBOX_NAME)
-    qs_count = queryset.count()
-    if qs_count != len(selected):
-        # probably "select all" - but remember it may have a restricted "all"
-        if qs_count == queryset.model.objects.all().count():
-            query = "query=all"
-        else:
-            query = "query=" + "+".join(
-                (str(e) for e in queryset.values_list("pk", flat=True))
-            )
-    else:
-        query = "query=" + "+".join((str(e) for e in selected))
     ct = ContentType.objects.get_for_model(queryset.model)
+    threshold = get_job_threshold(modeladmin)
+    if threshold is not None and queryset.count() > threshold:
+        query = "contenttype={0}".format(ct.pk)
+        if extra_query:
+            query += "&" + extra_query
+        job = enqueue_export(request, queryset, str(url), query)
+        status_url = reverse("admin_export_job_status", kwargs={"pk": job.pk})
+        modeladmin.message_user(
+            request,
+            format_html(
+                'The export has been queued; <a href="{0}">check its progress</a>.',
+                status_url,
+            ),
+        )
+        return None
+    query = "selection=" + store_selection(queryset)
     query += "&contenttype={0}".format(ct.pk)
     if extra_query:
         query += "&" + extra_query
@@ -63,7 +75,7 @@ spreadsheet_redirect_action.short_description = "Export selected to spreadsheet"
 
 spreadsheet_actions = {}
 
-for format in ["csv", "xlsx"]:  # consider also: odf, xls
+for format in get_formats():
     name = "export_redirect_spreadsheet_{0}".format(format)
     f = partial(spreadsheet_redirect_action, format=format)
     f.short_description = (
@@ -100,6 +112,7 @@ data_actions = {}
 
 for format in [
     "json",
+    "ndjson",
     "xml",
 ]:  # consider also: yaml - but check if PyYAML is installed.
     name = "export_redirect_serializer_{0}".format(format)
@@ -0,0 +1,108 @@
+"""
+SQL-side annotation columns.
+
+An export field can be an aggregate over a related path, computed by the
+database in the main query rather than by a method on each row:
+``alias=Function(path)``, e.g., ``books=Count(book)``, or with a title
+and ``none_str`` as for other fields, ``last_sale=Max(book.sale.date):Last
+sale:never``.  The functions are ``Count``, ``Sum``, ``Min``, ``Max`` and
+``Avg``; the path is dotted (or a ``__`` lookup), from the exported model.
+The column is named, and titled by default, by the alias.
+
+Other expressions (e.g., a ``Subquery``) can be given by a model admin (or
+export view) as ``export_annotations``, a dictionary of aliases to
+expressions; the aliases can then be used as export fields.
+
+The annotations are applied to the export queryset (only those used by
+the export fields), and are plain columns: so the values fast path is
+kept, and the cell types follow their output fields.  ``Count`` counts
+distinct values, so that it is not inflated when several multi-valued
+relations are joined in one export; the other aggregates over different
+multi-valued relations may be, so use subqueries for those.
+"""
+#######################################################################
+
+from django.core.exceptions import FieldError, ImproperlyConfigured
+from django.db.models import Avg, Count, Max, Min, Sum
+
+from .utils import decode_field, parse_annotation
+
+#######################################################################
+
+AGGREGATES = {
+    "Count": Count,
+    "Sum": Sum,
+    "Min": Min,
+    "Max": Max,
+    "Avg": Avg,
+}
+
+#######################################################################
+
+
+def make_aggregate(model, function, path):
+    """
+    Return the aggregate expression for ``function(path)``.
+    """
+    try:
+        aggregate = AGGREGATES[function]
+    except KeyError:
+        raise ImproperlyConfigured(
+            "Unknown export aggregate {0!r} for {1} (use one of: {2})".format(
+                function, model._meta.label, ", ".join(sorted(AGGREGATES))
+            )
+        )
+    lookup = path.replace(".", "__")
+    if aggregate is Count:
+        return Count(lookup, distinct=True)
+    return aggregate(lookup)
+
+
+def get_annotations(model, fields, extra=None):
+    """
+    Return the ``(alias, expression)`` pairs for the annotation columns
+    of the export fields: aggregate specs, and the aliases of the
+    ``extra`` expressions (a dictionary) which are exported.
+    """
+    annotations = []
+    aliases = set()
+    for fieldname in fields:
+        name = decode_field(fieldname)[0]
+        if name in aliases:
+            continue
+        spec = parse_annotation(fieldname)
+        if spec is not None:
+            alias, function, path = spec
+            expression = make_aggregate(model, function, path)
+        elif extra and name in extra:
+            alias, expression = name, extra[name]
+        else:
+            continue
+        annotations.append((alias, expression))
+        aliases.add(alias)
+    return annotations
+
+
+def get_output_fields(model, annotations):
+    """
+    Return a map of the aliases to the output fields of the annotations;
+    resolving them against the model, so that errors are found up front.
+    """
+    if not annotations:
+        return {}
+    try:
+        query = model._default_manager.annotate(**dict(annotations)).query
+    except (FieldError, ValueError) as e:
+        raise ImproperlyConfigured(
+            "Invalid export annotation for {0}: {1}".format(model._meta.label, e)
+        )
+    result = {}
+    for alias, expression in annotations:
+        try:
+            result[alias] = query.annotations[alias].output_field
+        except FieldError:  # e.g., mixed types
+            result[alias] = None
+    return result
+
+
+#######################################################################
@@ -0,0 +1,27 @@
+"""
+Application configuration for admin exports.
+"""
+#######################################################################
+
+from django.apps import AppConfig
+from django.core import serializers
+from django.core.signals import request_started
+
+#######################################################################
+
+
+class AdminExportConfig(AppConfig):
+    name = "admin_export"
+    verbose_name = "Admin export"
+
+    def ready(self):
+        if "ndjson" not in serializers.get_serializer_formats():
+            serializers.register_serializer("ndjson", "admin_export.ndjson")
+        from .jobs import recover_on_first_request
+        from .permissions import connect_signals
+
+        connect_signals()
+        request_started.connect(recover_on_first_request)
+
+
+#######################################################################
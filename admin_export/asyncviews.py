@@ -0,0 +1,160 @@
+"""
+Async export views, for ASGI deployments (needs Django 4.2 or later).
+
+The export is set up as by the sync views (permissions, plan, caching,
+validators, etc.); then its output is generated a block at a time, each
+block (fetching a chunk of rows, and encoding it) in a short hop to a
+thread.  So no thread is held while the response is sent, and many slow
+downloads can share a few workers.  When the client disconnects, the
+export is stopped and closed after the block in progress; its database
+work is done in chunks (see ``ExportMixin.iter_chunks()``), so nothing
+is left running.
+
+The async views are used in ``admin_export.urls`` when enabled; under
+WSGI the sync views should be used, since a WSGI server has to buffer
+async responses.  Background jobs and shards run the export in the sync
+view which an async view names as its ``sync_view_class``; so subclasses
+of the async views should name their sync counterparts.
+
+Settings:
+    ADMIN_EXPORT_ASYNC_VIEWS: use the async export views in the urls
+        (default: False).
+    ADMIN_EXPORT_ASYNC_BLOCK_SIZE: the (minimum) number of bytes
+        generated in each hop to a thread (default: 64 KiB).
+"""
+#######################################################################
+
+from functools import wraps
+
+import django
+from django.conf import settings
+from django.contrib.admin.sites import site
+from django.contrib.auth.views import redirect_to_login
+from django.urls import reverse
+from django.utils.cache import add_never_cache_headers
+
+from .utils import get_sync_view_class
+from .views import ExportSerializer, ExportSpreadsheet
+
+#######################################################################
+
+# adaptively use asgiref (which older versions of Django do not need).
+try:
+    from asgiref.sync import sync_to_async
+except ImportError:
+    sync_to_async = None
+
+#######################################################################
+
+# async iterators for streaming responses are new in Django 4.2.
+ASYNC_VIEWS_SUPPORTED = django.VERSION >= (4, 2) and sync_to_async is not None
+
+DEFAULT_BLOCK_SIZE = 64 * 1024
+
+#######################################################################
+
+
+def async_views_enabled():
+    return ASYNC_VIEWS_SUPPORTED and getattr(
+        settings, "ADMIN_EXPORT_ASYNC_VIEWS", False
+    )
+
+
+def get_block_size():
+    return getattr(settings, "ADMIN_EXPORT_ASYNC_BLOCK_SIZE", DEFAULT_BLOCK_SIZE)
+
+
+async def aiter_blocks(content, close=None, block_size=None):
+    """
+    Generate the (sync) content in blocks of at least ``block_size``
+    bytes, each generated in a thread.  If this is stopped early, e.g.,
+    cancelled when the client disconnects, ``close`` is called (in a
+    thread) to stop the content.
+    """
+    if block_size is None:
+        block_size = get_block_size()
+    iterator = iter(content)
+
+    def next_block():
+        parts = []
+        size = 0
+        for data in iterator:
+            parts.append(data)
+            size += len(data)
+            if size >= block_size:
+                break
+        return b"".join(parts)
+
+    done = False
+    try:
+        while True:
+            block = await sync_to_async(next_block)()
+            if not block:
+                done = True
+                break
+            yield block
+    finally:
+        if not done and close is not None:
+            await sync_to_async(close)()
+
+
+def async_admin_view(view):
+    """
+    The async counterpart of ``AdminSite.admin_view()``, for GET views:
+    only active staff users get the view.
+    """
+
+    @wraps(view)
+    async def inner(request, *args, **kwargs):
+        if not await sync_to_async(site.has_permission)(request):
+            return redirect_to_login(
+                request.get_full_path(), reverse("admin:login", current_app=site.name)
+            )
+        response = await view(request, *args, **kwargs)
+        add_never_cache_headers(response)
+        return response
+
+    # background jobs resolve the view from its url; see ``jobs.run_job()``.
+    inner.sync_view_class = get_sync_view_class(view)
+    return inner
+
+
+#######################################################################
+
+
+class AsyncExportMixin(object):
+    """
+    Makes an export view async; see the module documentation.
+    """
+
+    sync_view_class = None  # the sync view, e.g., for background jobs
+
+    async def get(self, request, *args, **kwargs):
+        response = await sync_to_async(super(AsyncExportMixin, self).get)(
+            request, *args, **kwargs
+        )
+        if response.streaming and not response.is_async:
+            # the response closes the export content.
+            response.streaming_content = aiter_blocks(
+                response.streaming_content, close=response.close
+            )
+        return response
+
+
+class AsyncExportSpreadsheet(AsyncExportMixin, ExportSpreadsheet):
+    """
+    Async spreadsheet exporter.
+    """
+
+    sync_view_class = ExportSpreadsheet
+
+
+class AsyncExportSerializer(AsyncExportMixin, ExportSerializer):
+    """
+    Async Django core serializer exporter.
+    """
+
+    sync_view_class = ExportSerializer
+
+
+#######################################################################
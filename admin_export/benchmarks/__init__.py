@@ -0,0 +1,10 @@
+"""
+Export benchmarks.
+
+A throwaway SQLite project with synthetic models is used to time the
+export views; see ``admin_export.benchmarks.runner``.  Run with::
+
+    python -m admin_export.benchmarks run --rows 1000 100000 1000000 \\
+        --output results.json
+    python -m admin_export.benchmarks compare baseline.json results.json
+"""
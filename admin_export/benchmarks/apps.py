@@ -0,0 +1,17 @@
+"""
+Application configuration for the export benchmarks.
+"""
+#######################################################################
+
+from django.apps import AppConfig
+
+#######################################################################
+
+
+class BenchmarksConfig(AppConfig):
+    name = "admin_export.benchmarks"
+    label = "admin_export_benchmarks"
+    verbose_name = "Admin export benchmarks"
+
+
+#######################################################################
@@ -0,0 +1,72 @@
+"""
+Synthetic models for the export benchmarks.
+"""
+#######################################################################
+
+from django.db import models
+
+#######################################################################
+
+
+class Wide(models.Model):
+    """
+    Many columns of assorted types.
+    """
+
+    name = models.CharField(max_length=64)
+    code = models.CharField(max_length=16)
+    email = models.EmailField()
+    description = models.TextField()
+    count = models.IntegerField()
+    big = models.BigIntegerField()
+    small = models.SmallIntegerField()
+    ratio = models.FloatField()
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    active = models.BooleanField(default=False)
+    created = models.DateTimeField()
+    day = models.DateField()
+    time = models.TimeField()
+    duration = models.DurationField()
+    uuid = models.UUIDField()
+    status = models.CharField(
+        max_length=1, choices=(("a", "Active"), ("b", "Blocked"), ("c", "Closed"))
+    )
+
+
+class Region(models.Model):
+    name = models.CharField(max_length=64)
+
+
+class Country(models.Model):
+    name = models.CharField(max_length=64)
+    region = models.ForeignKey(Region, on_delete=models.CASCADE)
+
+
+class City(models.Model):
+    name = models.CharField(max_length=64)
+    country = models.ForeignKey(Country, on_delete=models.CASCADE)
+
+
+class Address(models.Model):
+    """
+    The end of a chain of foreign keys.
+    """
+
+    street = models.CharField(max_length=64)
+    city = models.ForeignKey(City, on_delete=models.CASCADE)
+
+
+class Tag(models.Model):
+    name = models.CharField(max_length=64)
+
+
+class Article(models.Model):
+    """
+    Rows with many-to-many relations.
+    """
+
+    title = models.CharField(max_length=64)
+    tags = models.ManyToManyField(Tag)
+
+
+#######################################################################
@@ -0,0 +1,499 @@
+"""
+Benchmark runner for the export views.
+
+Each dataset (``wide``: many columns of assorted types; ``chain``: a
+chain of foreign keys; ``m2m``: many-to-many relations) is generated once
+per size into an SQLite database.  Each export is then run in a fresh
+process -- so that the peak RSS is its own -- and the wall time, peak RSS,
+query count, output size and rows per second are recorded.  LaTeX is
+stubbed out, so the PDF numbers cover everything but the typesetting.
+
+Results are saved as JSON; ``compare`` fails when a result is slower, or
+uses more memory, than the baseline by more than the threshold, or runs
+more queries than the baseline.
+"""
+#######################################################################
+
+import argparse
+import datetime
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+#######################################################################
+
+DATASETS = {
+    # name: (model, export fields (None for all))
+    "wide": ("Wide", None),
+    "chain": (
+        "Address",
+        ["id", "street", "city.name", "city.country.name", "city.country.region.name"],
+    ),
+    "m2m": ("Article", ["id", "title", "tags.count"]),
+}
+
+EXPORTS = {
+    # format: view name
+    "csv": "ExportSpreadsheet",
+    "xlsx": "ExportSpreadsheet",
+    "json": "ExportSerializer",
+    "xml": "ExportSerializer",
+    "pdf": "ExportPDF",
+}
+
+DEFAULT_ROWS = [1000]
+DEFAULT_THRESHOLD = 0.2
+BATCH_SIZE = 5000
+USERNAME = "benchmark"
+
+#######################################################################
+
+
+def configure(database):
+    """
+    Configure Django for the benchmark project, with the given database.
+    """
+    import django
+    from django.conf import settings
+
+    settings.configure(
+        DEBUG=False,
+        SECRET_KEY="admin-export-benchmarks",
+        INSTALLED_APPS=[
+            "django.contrib.admin",
+            "django.contrib.auth",
+            "django.contrib.contenttypes",
+            "django.contrib.sessions",
+            "django.contrib.messages",
+            "admin_export",
+            "admin_export.benchmarks.apps.BenchmarksConfig",
+        ],
+        DATABASES={
+            "default": {"ENGINE": "django.db.backends.sqlite3", "NAME": database}
+        },
+        TEMPLATES=[
+            {
+                "BACKEND": "django.template.backends.django.DjangoTemplates",
+                "APP_DIRS": True,
+            }
+        ],
+        ROOT_URLCONF="admin_export.urls",
+        MEDIA_ROOT=os.path.join(os.path.dirname(database), "media"),
+        USE_TZ=True,
+        ADMIN_EXPORT_LATEX_COMPILER="admin_export.benchmarks.runner.stub_latex",
+    )
+    django.setup()
+
+
+def stub_latex(tex_path, timeout, passes=2):
+    """
+    Stand in for LaTeX: write a placeholder PDF.
+    """
+    pdf_path = os.path.splitext(tex_path)[0] + ".pdf"
+    with open(pdf_path, "wb") as fp:
+        fp.write(b"%PDF-1.4\n%%EOF\n")
+    return pdf_path
+
+
+def get_peak_rss():
+    """
+    Return the peak resident set size of this process, in bytes.
+    """
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak
+    return peak * 1024
+
+
+#######################################################################
+
+
+def bulk_create(model, objects):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= BATCH_SIZE:
+            model.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
+
+
+def populate(rows):
+    """
+    Generate the datasets, with ``rows`` rows each.
+    Primary keys are given explicitly, so that relations can be built
+    without reading the rows back.
+    """
+    import decimal
+    import uuid
+
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.utils import timezone
+
+    from .models import Address, Article, City, Country, Region, Tag, Wide
+
+    call_command("migrate", run_syncdb=True, verbosity=0)
+    User.objects.create_superuser(USERNAME, "", USERNAME)
+
+    epoch = timezone.now().replace(microsecond=0)
+    bulk_create(
+        Wide,
+        (
+            Wide(
+                pk=i + 1,
+                name="Name {0}".format(i),
+                code="C{0:08d}".format(i),
+                email="user{0}@example.com".format(i),
+                description="Row {0}: a longer piece of text, with punctuation "
+                '& "quotes", for escaping.'.format(i),
+                count=i,
+                big=i * 1000003,
+                small=i % 32000,
+                ratio=i / 7.0,
+                amount=decimal.Decimal(i % 100000) / 100,
+                active=bool(i % 2),
+                created=epoch - datetime.timedelta(minutes=i),
+                day=(epoch - datetime.timedelta(days=i % 3650)).date(),
+                time=datetime.time(i % 24, i % 60, i % 60),
+                duration=datetime.timedelta(seconds=i),
+                uuid=uuid.UUID(int=i),
+                status="abc"[i % 3],
+            )
+            for i in range(rows)
+        ),
+    )
+
+    regions, countries, cities = 10, 100, min(rows, 1000)
+    bulk_create(
+        Region, (Region(pk=i + 1, name="Region {0}".format(i)) for i in range(regions))
+    )
+    bulk_create(
+        Country,
+        (
+            Country(pk=i + 1, name="Country {0}".format(i), region_id=i % regions + 1)
+            for i in range(countries)
+        ),
+    )
+    bulk_create(
+        City,
+        (
+            City(pk=i + 1, name="City {0}".format(i), country_id=i % countries + 1)
+            for i in range(cities)
+        ),
+    )
+    bulk_create(
+        Address,
+        (
+            Address(pk=i + 1, street="{0} Main St.".format(i), city_id=i % cities + 1)
+            for i in range(rows)
+        ),
+    )
+
+    tags = 50
+    bulk_create(Tag, (Tag(pk=i + 1, name="Tag {0}".format(i)) for i in range(tags)))
+    bulk_create(
+        Article,
+        (Article(pk=i + 1, title="Article {0}".format(i)) for i in range(rows)),
+    )
+    Through = Article.tags.through
+    bulk_create(
+        Through,
+        (
+            Through(article_id=i + 1, tag_id=(i + j) % tags + 1)
+            for i in range(rows)
+            for j in range(i % 4)
+        ),
+    )
+
+
+def _populate(database, rows):
+    configure(database)
+    populate(rows)
+    from django.db import connections
+
+    connections.close_all()
+
+
+def get_database(workdir, rows):
+    """
+    Return the path of the database with ``rows`` rows per dataset,
+    generating it if needed.
+    """
+    database = os.path.join(workdir, "bench-{0}.sqlite3".format(rows))
+    if not os.path.exists(database):
+        partial = database + ".partial"
+        if os.path.exists(partial):
+            os.remove(partial)
+        run_in_process(_populate, partial, rows)
+        os.rename(partial, database)
+    return database
+
+
+def run_in_process(func, *args):
+    """
+    Call the function in a fresh process, returning the result.
+    """
+    context = multiprocessing.get_context("spawn")
+    pool = context.Pool(1)
+    try:
+        return pool.apply(func, args)
+    finally:
+        pool.close()
+        pool.join()
+
+
+#######################################################################
+
+
+def run_case(database, dataset, format):
+    """
+    Run one export (in a fresh process), returning its measurements.
+    """
+    configure(database)
+
+    from django.contrib.auth.models import User
+    from django.contrib.contenttypes.models import ContentType
+    from django.db import connection
+    from django.test import RequestFactory
+    from django.test.utils import CaptureQueriesContext
+
+    from .. import views
+    from ..jobs import _iter_content
+    from . import models
+
+    model_name, fields = DATASETS[dataset]
+    model = getattr(models, model_name)
+    view = getattr(views, EXPORTS[format]).as_view(export_fields=fields)
+    params = {
+        "contenttype": ContentType.objects.get_for_model(model).pk,
+        "query": "all",
+    }
+    if format != "pdf":
+        params["format"] = format
+    request = RequestFactory().get("/", params)
+    request.user = User.objects.get(username=USERNAME)
+    rows = model.objects.count()
+
+    gc.collect()
+    rss_before = get_peak_rss()
+    start = time.perf_counter()
+    with CaptureQueriesContext(connection) as queries:
+        response = view(request)
+        size = sum(len(chunk) for chunk in _iter_content(response))
+        if hasattr(response, "close"):
+            response.close()
+    seconds = time.perf_counter() - start
+    return {
+        "seconds": seconds,
+        "peak_rss": get_peak_rss(),
+        "rss_before": rss_before,
+        "queries": len(queries),
+        "bytes": size,
+        "rows": rows,
+        "rows_per_second": rows / seconds if seconds else None,
+    }
+
+
+def case_key(result):
+    return "{dataset}/{format}/{size}".format(**result)
+
+
+def run(sizes, datasets, formats, workdir, repeat=1, log=None):
+    """
+    Run the benchmarks, returning the results.
+    """
+    results = []
+    for size in sizes:
+        database = get_database(workdir, size)
+        for dataset in datasets:
+            for format in formats:
+                result = {"dataset": dataset, "format": format, "size": size}
+                try:
+                    runs = [
+                        run_in_process(run_case, database, dataset, format)
+                        for i in range(repeat)
+                    ]
+                except Exception as e:
+                    result["error"] = "{0}: {1}".format(type(e).__name__, e)
+                else:
+                    # the best of the runs, for each measurement.
+                    best = min(runs, key=lambda r: r["seconds"])
+                    best["peak_rss"] = min(r["peak_rss"] for r in runs)
+                    result.update(best)
+                results.append(result)
+                if log is not None:
+                    log(format_result(result))
+    return {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "django": _django_version(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def _django_version():
+    import django
+
+    return django.get_version()
+
+
+def format_result(result):
+    """
+    Return a one line summary of the result.
+    """
+    if "error" in result:
+        return "{0:<24} {1}".format(case_key(result), result["error"])
+    return "{0:<24} {1:>9.3f}s {2:>12.0f} rows/s {3:>8.1f} MB {4:>6} queries".format(
+        case_key(result),
+        result["seconds"],
+        result["rows_per_second"] or 0,
+        result["peak_rss"] / 1024.0**2,
+        result["queries"],
+    )
+
+
+#######################################################################
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare the current results to the baseline; returning a list of
+    regressions (as strings).
+    """
+    base = {case_key(r): r for r in baseline["results"] if "error" not in r}
+    regressions = []
+    for result in current["results"]:
+        key = case_key(result)
+        if key not in base:
+            continue
+        if "error" in result:
+            regressions.append("{0}: {1}".format(key, result["error"]))
+            continue
+        old = base[key]
+        for measure in ("seconds", "peak_rss"):
+            if result[measure] > old[measure] * (1 + threshold):
+                regressions.append(
+                    "{0}: {1} {2:.4g} -> {3:.4g} (+{4:.0%})".format(
+                        key,
+                        measure,
+                        old[measure],
+                        result[measure],
+                        result[measure] / old[measure] - 1,
+                    )
+                )
+        if result["queries"] > old["queries"]:
+            regressions.append(
+                "{0}: queries {1} -> {2}".format(key, old["queries"], result["queries"])
+            )
+    return regressions
+
+
+#######################################################################
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m admin_export.benchmarks", description="Export benchmarks."
+    )
+    commands = parser.add_subparsers(dest="command")
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument(
+        "--rows",
+        type=int,
+        nargs="+",
+        default=DEFAULT_ROWS,
+        help="the dataset sizes (default: %(default)s)",
+    )
+    run_parser.add_argument(
+        "--datasets", nargs="+", choices=sorted(DATASETS), default=sorted(DATASETS)
+    )
+    run_parser.add_argument(
+        "--formats", nargs="+", choices=list(EXPORTS), default=list(EXPORTS)
+    )
+    run_parser.add_argument(
+        "--repeat", type=int, default=1, help="runs per export (the best is kept)"
+    )
+    run_parser.add_argument(
+        "--workdir",
+        help="keep (and reuse) the generated databases in this directory",
+    )
+    run_parser.add_argument("--output", help="save the results to this JSON file")
+    run_parser.add_argument(
+        "--baseline", help="compare the results to this JSON file, as for compare"
+    )
+    run_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    compare_parser = commands.add_parser(
+        "compare", help="compare results to a baseline"
+    )
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="the allowed fractional slowdown (default: %(default)s)",
+    )
+    return parser
+
+
+def load(filename):
+    with open(filename) as fp:
+        return json.load(fp)
+
+
+def report(regressions, threshold):
+    if not regressions:
+        print("No regressions (threshold {0:.0%}).".format(threshold))
+        return 0
+    print("Regressions (threshold {0:.0%}):".format(threshold))
+    for line in regressions:
+        print("  " + line)
+    return 1
+
+
+def main(argv=None):
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    if args.command == "compare":
+        regressions = compare(load(args.baseline), load(args.current), args.threshold)
+        return report(regressions, args.threshold)
+    if args.command != "run":
+        parser.print_help()
+        return 2
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="admin_export-bench-")
+    if not os.path.isdir(workdir):
+        os.makedirs(workdir)
+    try:
+        results = run(
+            args.rows, args.datasets, args.formats, workdir, args.repeat, log=print
+        )
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(results, fp, indent=2)
+    if args.baseline:
+        regressions = compare(load(args.baseline), results, args.threshold)
+        return report(regressions, args.threshold)
+    return 0
+
+
+#######################################################################
@@ -0,0 +1,153 @@
+"""
+Streaming compression of export output.
+
+Exports are compressed chunk by chunk, as they are produced: either as a
+``Content-Encoding`` negotiated from the ``Accept-Encoding`` request
+header (for formats which are not already compressed); or, with
+``compress=gzip`` (or ``compress=zstd``), as a ``.gz`` (or ``.zst``)
+attachment.  zstd needs the ``zstandard`` package.
+
+Settings:
+    ADMIN_EXPORT_COMPRESSION: negotiate a ``Content-Encoding``
+        (default: True).
+    ADMIN_EXPORT_COMPRESSION_LEVELS: the compression level for each
+        encoding (default: ``{"gzip": 6, "zstd": 3}``).
+"""
+#######################################################################
+
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+
+#######################################################################
+
+# adaptively use zstandard.
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+#######################################################################
+
+DEFAULT_LEVELS = {"gzip": 6, "zstd": 3}
+
+CONTENT_TYPES = {"gzip": "application/gzip", "zstd": "application/zstd"}
+
+EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+
+ALIASES = {"x-gzip": "gzip"}
+
+# formats which gain nothing from compression.
+PRECOMPRESSED_FORMATS = {"xlsx", "parquet", "pdf"}
+
+#######################################################################
+
+
+def compression_enabled():
+    return getattr(settings, "ADMIN_EXPORT_COMPRESSION", True)
+
+
+def get_level(encoding):
+    levels = getattr(settings, "ADMIN_EXPORT_COMPRESSION_LEVELS", {})
+    return levels.get(encoding, DEFAULT_LEVELS[encoding])
+
+
+def get_encodings():
+    """
+    Return the supported encodings, most preferred first.
+    """
+    encodings = ["gzip"]
+    if zstandard is not None:
+        encodings.insert(0, "zstd")
+    return encodings
+
+
+def get_compressor(encoding, level=None):
+    """
+    Return a compressor object (with ``compress()`` and ``flush()``
+    methods) for the encoding.
+    """
+    if level is None:
+        level = get_level(encoding)
+    if encoding == "gzip":
+        return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=level).compressobj()
+    raise ValueError("Unsupported encoding: {0!r}".format(encoding))
+
+
+def parse_accept_encoding(header):
+    """
+    Return a map of the encodings in the ``Accept-Encoding`` header to
+    their quality values.
+    """
+    accepted = OrderedDict()
+    for item in header.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[ALIASES.get(name, name)] = quality
+    return accepted
+
+
+def negotiate_encoding(header):
+    """
+    Return the best supported encoding acceptable in the
+    ``Accept-Encoding`` header, or ``None``.
+    """
+    accepted = parse_accept_encoding(header or "")
+    best, best_quality = None, 0.0
+    for encoding in get_encodings():
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+#######################################################################
+
+
+def iter_compressed(content, encoding, level=None):
+    """
+    Generate the compressed content, chunk by chunk.
+    """
+    compressor = get_compressor(encoding, level)
+    for chunk in content:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def compress_response(response, encoding, level=None):
+    """
+    Compress the content of the response (in place).
+    """
+    if response.has_header("Content-Length"):
+        del response["Content-Length"]
+    if response.streaming:
+        response.streaming_content = iter_compressed(
+            response.streaming_content, encoding, level
+        )
+    elif getattr(response, "is_rendered", True):
+        response.content = b"".join(
+            iter_compressed([response.content], encoding, level)
+        )
+    else:
+        response.add_post_render_callback(
+            lambda r: compress_response(r, encoding, level)
+        )
+    return response
+
+
+#######################################################################
@@ -0,0 +1,154 @@
+"""
+Typed cell conversion.
+
+Each export column gets a cell type, chosen once from its model field (or
+the output field of an annotation column); writers then map the cell
+types to converters (see ``TEXT_CONVERTERS``) which turn resolved values
+into cells.  Columns which are not (typed) model fields are converted
+generically.
+"""
+#######################################################################
+
+from django.db import models
+from django.utils import timezone
+from django.utils.encoding import force_str
+
+from .utils import decode_field, get_model_field
+
+#######################################################################
+
+STR = "str"
+INT = "int"
+FLOAT = "float"
+DECIMAL = "decimal"
+BOOL = "bool"
+DATE = "date"
+DATETIME = "datetime"
+TIME = "time"
+DURATION = "duration"
+UUID = "uuid"
+
+# (field class, cell type), most specific first.
+FIELD_TYPES = [
+    (models.BooleanField, BOOL),
+    (models.AutoField, INT),
+    (models.IntegerField, INT),
+    (models.FloatField, FLOAT),
+    (models.DecimalField, DECIMAL),
+    (models.DateTimeField, DATETIME),
+    (models.DateField, DATE),
+    (models.TimeField, TIME),
+    (models.DurationField, DURATION),
+    (models.UUIDField, UUID),
+    (models.CharField, STR),
+    (models.TextField, STR),
+]
+if hasattr(models, "NullBooleanField"):
+    FIELD_TYPES.insert(0, (models.NullBooleanField, BOOL))
+
+#######################################################################
+
+
+def get_cell_type(field):
+    """
+    Return the cell type for the model field, or ``None`` if unknown.
+    """
+    if field is None or field.is_relation:
+        return None
+    for field_class, cell_type in FIELD_TYPES:
+        if isinstance(field, field_class):
+            return cell_type
+    return None
+
+
+def get_cell_types(model, fields, output_fields=None):
+    """
+    Return the cell type of each export field; ``output_fields`` maps
+    the aliases of annotation columns to their output fields.
+    """
+    output_fields = output_fields or {}
+    cell_types = []
+    for fieldname in fields:
+        name = decode_field(fieldname)[0]
+        if name in output_fields:
+            field = output_fields[name]
+        else:
+            field = get_model_field(model, fieldname)
+        cell_types.append(get_cell_type(field))
+    return cell_types
+
+
+def get_converters(cell_types, table):
+    """
+    Return the converter for each cell type, from the table; ``None``
+    where values are kept as they are.
+    """
+    default = table.get(None, None)
+    return [table.get(t, default) for t in cell_types]
+
+
+#######################################################################
+
+
+def to_text(value):
+    if value.__class__ is str:
+        return value
+    return force_str(value)
+
+
+def to_native(value):
+    """
+    Typed values are kept; text (the ``none_str``, or a null relation on
+    the way to the column) is a null.
+    """
+    if value.__class__ is str:
+        return None
+    return value
+
+
+def to_naive_datetime(value):
+    """
+    Aware datetimes are made naive, in the current time zone (e.g., Excel
+    has no time zones).
+    """
+    if value.__class__ is str:
+        return None
+    if timezone.is_aware(value):
+        return timezone.make_naive(value)
+    return value
+
+
+# the text of the values; as ``force_str()`` would give, but quicker.
+TEXT_CONVERTERS = {
+    None: force_str,
+    STR: to_text,
+    INT: str,
+    FLOAT: str,
+    DECIMAL: str,
+    BOOL: str,
+    DATE: str,
+    DATETIME: str,
+    TIME: str,
+    DURATION: str,
+    UUID: str,
+}
+
+# native values, as spreadsheet cells.
+SPREADSHEET_CONVERTERS = dict(
+    TEXT_CONVERTERS,
+    **{
+        INT: to_native,
+        FLOAT: to_native,
+        DECIMAL: to_native,
+        BOOL: to_native,
+        DATE: to_native,
+        DATETIME: to_naive_datetime,
+        TIME: to_native,
+        DURATION: to_native,
+    }
+)
+
+# the resolved values, as they are.
+NATIVE_CONVERTERS = {}
+
+#######################################################################
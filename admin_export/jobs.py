@@ -0,0 +1,325 @@
+"""
+Background export jobs.
+
+Large exports are queued as ``ExportJob`` rows and run by a small local
+pool of worker threads, so no external broker is needed.  Any process
+can pick up queued jobs: a job is claimed by atomically switching its
+status from queued to running.  The finished file is saved to
+``default_storage``.
+
+Running jobs report a heartbeat with their progress; a job without one
+for ``ADMIN_EXPORT_JOB_TIMEOUT`` seconds (e.g., its process died) is
+queued again, or failed once it has been attempted too often.  Each
+process checks for such jobs, and for jobs left queued (e.g., by a
+restart), when it handles its first request; and the status of a stuck
+job triggers the check too.  The ``run_export_jobs`` management command
+does the same, and runs the queued jobs itself.
+
+Finished jobs, and their files, are deleted once they are older than
+``ADMIN_EXPORT_JOB_EXPIRY``; by ``run_export_jobs``, and when the
+process checks for lost jobs.
+
+Settings:
+    ADMIN_EXPORT_JOB_THRESHOLD: exports of more rows than this are run in
+        the background (default: ``None``, i.e., never).  A model admin
+        can override this with an ``export_job_threshold`` attribute.
+    ADMIN_EXPORT_JOB_WORKERS: the number of worker threads (default: 2).
+    ADMIN_EXPORT_JOB_TIMEOUT: the number of seconds without a heartbeat
+        after which a running job is considered lost (default: 600).
+    ADMIN_EXPORT_JOB_MAX_ATTEMPTS: the number of times a job is run
+        before a lost job is failed (default: 3).
+    ADMIN_EXPORT_JOB_EXPIRY: the number of seconds finished jobs are kept
+        for (default: 7 days; ``None`` to keep them).
+"""
+#######################################################################
+
+import mimetypes
+import pickle
+import tempfile
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.files import File
+from django.core.signals import request_started
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import F
+from django.urls import resolve
+from django.utils import timezone
+
+from .models import ExportJob
+from .selection import dump_selection, restore_selection
+from .utils import get_sync_view_class, make_export_view
+
+#######################################################################
+
+_executor = None
+_executor_lock = threading.Lock()
+_recovered = False
+
+#######################################################################
+
+
+def get_job_threshold(modeladmin=None):
+    """
+    Return the row count above which exports are run in the background,
+    or ``None`` if exports are always run in the request.
+    """
+    default = getattr(settings, "ADMIN_EXPORT_JOB_THRESHOLD", None)
+    return getattr(modeladmin, "export_job_threshold", default)
+
+
+def get_executor():
+    """
+    Return the (process-wide) worker pool.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "ADMIN_EXPORT_JOB_WORKERS", 2)
+            )
+        return _executor
+
+
+def get_job_timeout():
+    return getattr(settings, "ADMIN_EXPORT_JOB_TIMEOUT", 600)
+
+
+def get_max_attempts():
+    return getattr(settings, "ADMIN_EXPORT_JOB_MAX_ATTEMPTS", 3)
+
+
+def get_job_expiry():
+    return getattr(settings, "ADMIN_EXPORT_JOB_EXPIRY", 7 * 24 * 60 * 60)
+
+
+#######################################################################
+
+
+def enqueue_export(request, queryset, path, query_string):
+    """
+    Queue the export of ``queryset`` through the export view at ``path``,
+    returning the new job.
+    """
+    job = ExportJob.objects.create(
+        user=request.user if request.user.is_authenticated else None,
+        content_type=ContentType.objects.get_for_model(queryset.model),
+        path=path,
+        query_string=query_string,
+        selection=pickle.dumps(dump_selection(queryset)),
+    )
+    transaction.on_commit(wake_workers)
+    return job
+
+
+def wake_workers():
+    """
+    Have the worker pool run any pending jobs.
+    """
+    get_executor().submit(run_pending)
+
+
+def claim_next_job():
+    """
+    Claim the oldest queued job, or return ``None``.
+    """
+    queued = ExportJob.objects.filter(status=ExportJob.QUEUED)
+    for pk in queued.order_by("created").values_list("pk", flat=True)[:10]:
+        now = timezone.now()
+        claimed = queued.filter(pk=pk).update(
+            status=ExportJob.RUNNING,
+            started=now,
+            heartbeat=now,
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return ExportJob.objects.get(pk=pk)
+    return None
+
+
+def is_stale(job):
+    """
+    Return True if the job is running, but has not reported progress
+    within the job timeout.
+    """
+    if job.status != ExportJob.RUNNING or job.heartbeat is None:
+        return False
+    return job.heartbeat < timezone.now() - timedelta(seconds=get_job_timeout())
+
+
+def requeue_stale_jobs():
+    """
+    Queue the stale running jobs (see ``is_stale()``) again; or fail
+    those which have been attempted too often.  Return the number of jobs
+    queued again.
+    """
+    cutoff = timezone.now() - timedelta(seconds=get_job_timeout())
+    stale = ExportJob.objects.filter(status=ExportJob.RUNNING, heartbeat__lt=cutoff)
+    stale.filter(attempts__gte=get_max_attempts()).update(
+        status=ExportJob.FAILED,
+        error="The export was interrupted too often.",
+        finished=timezone.now(),
+    )
+    return stale.filter(attempts__lt=get_max_attempts()).update(
+        status=ExportJob.QUEUED, rows_done=0, started=None, heartbeat=None
+    )
+
+
+def expire_jobs():
+    """
+    Delete the finished jobs (and their files) which have expired; return
+    the number of jobs deleted.
+    """
+    expiry = get_job_expiry()
+    if expiry is None:
+        return 0
+    cutoff = timezone.now() - timedelta(seconds=expiry)
+    expired = ExportJob.objects.filter(
+        status__in=[ExportJob.DONE, ExportJob.FAILED], finished__lt=cutoff
+    )
+    count = 0
+    for job in expired.iterator():
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+        count += 1
+    return count
+
+
+def recover_jobs():
+    """
+    Queue stale jobs again, and wake the workers for any queued jobs;
+    e.g., after a restart.  Expired jobs are deleted too.
+    """
+    requeue_stale_jobs()
+    expire_jobs()
+    if ExportJob.objects.filter(status=ExportJob.QUEUED).exists():
+        wake_workers()
+
+
+def recover_on_first_request(**kwargs):
+    """
+    Recover jobs when this process handles its first request (a
+    ``request_started`` receiver).
+    """
+    global _recovered
+    with _executor_lock:
+        if _recovered:
+            return
+        _recovered = True
+    request_started.disconnect(recover_on_first_request)
+    try:
+        recover_jobs()
+    except DatabaseError:
+        pass  # e.g., not migrated yet.
+
+
+def run_pending():
+    """
+    Run queued jobs until there are none left.
+    """
+    close_old_connections()
+    try:
+        while True:
+            job = claim_next_job()
+            if job is None:
+                break
+            run_job(job)
+    finally:
+        close_old_connections()
+
+
+#######################################################################
+
+
+def _iter_content(response):
+    """
+    Generate the content of a (possibly streaming) response.
+    """
+    if response.streaming:
+        for chunk in response.streaming_content:
+            yield chunk
+    else:
+        yield response.content
+
+
+def run_job(job):
+    """
+    Run the export for a claimed job, through its export view.
+    """
+
+    def progress(count, total=None):
+        updates = {"rows_done": F("rows_done") + count, "heartbeat": timezone.now()}
+        if total is not None:
+            updates["rows_total"] = total
+        ExportJob.objects.filter(pk=job.pk).update(**updates)
+
+    try:
+        view = make_export_view(
+            get_sync_view_class(resolve(job.path).func),
+            job.path,
+            job.query_string,
+            job.user,
+            selection_data=pickle.loads(bytes(job.selection)),
+            progress_callback=progress,
+        )
+        model = job.content_type.model_class()
+        queryset = restore_selection(model, view.selection_data)
+        progress(0, view.security_filter(queryset).count())
+        response = view.get(view.request)
+        filename = response.get("Filename", None) or view.get_filename()
+        with tempfile.TemporaryFile() as fp:
+            for chunk in _iter_content(response):
+                fp.write(chunk)
+            fp.seek(0)
+            job.file.save(filename, File(fp), save=False)
+        if hasattr(response, "close"):
+            response.close()
+    except Exception:
+        job.status = ExportJob.FAILED
+        job.error = traceback.format_exc()
+        job.filename = ""
+    else:
+        job.status = ExportJob.DONE
+        job.filename = filename
+    job.finished = timezone.now()
+    # unless the job was given up on (see ``requeue_stale_jobs()``).
+    updated = ExportJob.objects.filter(
+        pk=job.pk, status=ExportJob.RUNNING, attempts=job.attempts
+    ).update(
+        status=job.status,
+        error=job.error,
+        file=job.file.name or "",
+        filename=job.filename,
+        finished=job.finished,
+    )
+    if not updated and job.file:
+        job.file.delete(save=False)
+    return job
+
+
+#######################################################################
+
+
+def job_status(job):
+    """
+    Return the status information for a job.
+    """
+    return {
+        "id": job.pk,
+        "status": job.status,
+        "rows_done": job.rows_done,
+        "rows_total": job.rows_total,
+        "filename": job.filename,
+        "content_type": mimetypes.guess_type(job.filename)[0] if job.filename else None,
+        "error": job.error if job.status == ExportJob.FAILED else "",
+        "created": job.created.isoformat(),
+        "finished": job.finished.isoformat() if job.finished else None,
+    }
+
+
+#######################################################################
@@ -0,0 +1,378 @@
+"""
+Export model data without a request, e.g., from cron jobs.
+
+The export goes through the same export views (and so the same export
+fields, permissions and formats) as the admin actions, for the given
+user; the output is streamed to a file.
+
+For formats whose output can be written a piece at a time (e.g., csv,
+ndjson or json), the rows are exported in segments of primary keys, and a
+checkpoint (the last primary key written, and the size of the output) is
+saved after each segment; so an interrupted export can be continued with
+``--resume``.  The checkpoint is removed when the export is done.
+
+Examples:
+    manage.py export_admin_data shop.Book --user admin --format csv \\
+        --filter author__name=Smith --fields id,title,author.name \\
+        --output books.csv
+    manage.py export_admin_data shop.Book --user admin --format ndjson \\
+        --workers 4 --output books.ndjson --resume
+"""
+#######################################################################
+
+import json
+import os
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core import serializers
+from django.core.exceptions import (
+    FieldError,
+    ImproperlyConfigured,
+    ValidationError,
+)
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max
+
+from ...jobs import _iter_content
+from ...selection import dump_selection
+from ...sharding import make_shard_task, map_tasks, render_shard
+from ...utils import make_export_view
+from ...views import ExportPDF, ExportSerializer, ExportSpreadsheet
+from ...writers import get_formats
+
+#######################################################################
+
+DEFAULT_CHECKPOINT_ROWS = 100000
+
+#######################################################################
+
+
+def parse_filters(expressions):
+    """
+    Return the ``filter()`` keyword arguments for ``lookup=value``
+    expressions; ``__in`` and ``__range`` values are comma separated.
+    """
+    filters = {}
+    for expression in expressions:
+        lookup, sep, value = expression.partition("=")
+        lookup = lookup.strip()
+        if not sep or not lookup:
+            raise CommandError("Invalid filter: {0!r}".format(expression))
+        if lookup.endswith("__in") or lookup.endswith("__range"):
+            value = value.split(",")
+        elif lookup.endswith("__isnull"):
+            value = value.lower() in ("1", "true", "yes")
+        filters[lookup] = value
+    return filters
+
+
+def get_view_class(format):
+    """
+    Return the export view class for the format.
+    """
+    if format == "pdf":
+        return ExportPDF
+    if format in get_formats():
+        return ExportSpreadsheet
+    if format in serializers.get_serializer_formats():
+        return ExportSerializer
+    raise CommandError("Unknown export format: {0!r}".format(format))
+
+
+def model_pk(model, value):
+    """
+    Return the primary key value from its (JSON) checkpoint value.
+    """
+    return model._meta.pk.to_python(value)
+
+
+def iter_segments(queryset, size, after=None):
+    """
+    Generate ``(after, last)`` primary key bounds for segments of (at
+    most) ``size`` rows of the queryset, in primary key order; from the
+    primary key ``after`` (exclusive), if given.
+    """
+    pks = queryset.order_by("pk").values_list("pk", flat=True)
+    while True:
+        page = pks if after is None else pks.filter(pk__gt=after)
+        bound = list(page[size - 1 : size])
+        if bound:
+            last = bound[0]
+        else:
+            last = page.aggregate(last=Max("pk"))["last"]
+            if last is None:
+                return
+        yield after, last
+        after = last
+
+
+#######################################################################
+
+
+class Command(BaseCommand):
+    help = "Export model data (as the admin export actions do) to a file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("model", help="the model, as app_label.ModelName")
+        parser.add_argument(
+            "--user",
+            required=True,
+            help="export as this user (username), for permissions",
+        )
+        parser.add_argument(
+            "--filter",
+            action="append",
+            default=[],
+            metavar="LOOKUP=VALUE",
+            help="only export matching rows (can be repeated)",
+        )
+        parser.add_argument(
+            "--fields",
+            help="comma separated export fields (default: as the admin)",
+        )
+        parser.add_argument("--format", default="csv")
+        parser.add_argument(
+            "--chunk-size", type=int, help="rows fetched from the database at a time"
+        )
+        parser.add_argument(
+            "--workers", type=int, default=1, help="the number of worker processes"
+        )
+        parser.add_argument(
+            "--output", help="the output file (default: the export filename)"
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help="the checkpoint file (default: the output file + .checkpoint)",
+        )
+        parser.add_argument(
+            "--checkpoint-rows",
+            type=int,
+            default=DEFAULT_CHECKPOINT_ROWS,
+            help="rows exported between checkpoints",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="continue from the checkpoint, if there is one",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            model = apps.get_model(options["model"])
+        except (LookupError, ValueError) as e:
+            raise CommandError(str(e))
+        try:
+            user = get_user_model()._default_manager.get_by_natural_key(options["user"])
+        except get_user_model().DoesNotExist:
+            raise CommandError("No such user: {0!r}".format(options["user"]))
+        format = options["format"]
+        filters = parse_filters(options["filter"])
+        queryset = model._default_manager.all()
+        try:
+            queryset = queryset.filter(**filters)
+        except (FieldError, ValueError, ValidationError) as e:
+            raise CommandError("Invalid filter: {0}".format(e))
+
+        initkwargs = {}
+        if options["fields"]:
+            initkwargs["export_fields"] = [
+                f.strip() for f in options["fields"].split(",") if f.strip()
+            ]
+        if options["chunk_size"]:
+            initkwargs["chunk_size"] = options["chunk_size"]
+        view_class = get_view_class(format)
+        query_string = "contenttype={0}&format={1}".format(
+            ContentType.objects.get_for_model(model).pk, format
+        )
+
+        def make_view(selection, **extra):
+            return make_export_view(
+                view_class,
+                "",
+                query_string,
+                user,
+                selection_data=dump_selection(selection),
+                **dict(initkwargs, **extra)
+            )
+
+        view = make_view(queryset)
+        output = options["output"] or view.get_filename()
+        envelope = self.get_envelope(view)
+        if envelope is None:
+            if options["resume"]:
+                raise CommandError(
+                    "{0} exports cannot be resumed".format(format.upper())
+                )
+            view = make_view(queryset, export_workers=options["workers"])
+            rows = self.export(view, output)
+        else:
+            checkpoint = options["checkpoint"] or output + ".checkpoint"
+            state = {
+                "model": model._meta.label,
+                "user": options["user"],
+                "format": format,
+                "fields": initkwargs.get("export_fields", None),
+                "filters": options["filter"],
+                "output": os.path.abspath(output),
+            }
+            rows = self.export_segments(
+                view,
+                queryset,
+                make_view,
+                envelope,
+                output,
+                checkpoint,
+                state,
+                options,
+            )
+        if options["verbosity"] >= 1:
+            self.stdout.write("Exported {0} rows to {1}".format(rows, output))
+
+    def get_envelope(self, view):
+        """
+        Return ``(head, separator, tail, method)`` for exporting the view
+        a segment at a time (as bytes), with ``method`` rendering the body
+        of a segment; or ``None`` if it can only be exported in one go.
+        """
+        if isinstance(view, ExportSpreadsheet):
+            try:
+                writer = view.get_writer()
+            except ImproperlyConfigured as e:
+                raise CommandError(str(e))
+            if not writer.concatenate or view.render_via_template:
+                return None
+            headers = list(view.get_plan().labels) if view.include_headers else None
+            head = b"".join(writer.iter_bytes([], headers)) if headers else b""
+            return head, b"", b"", "render_bytes_shard"
+        if isinstance(view, ExportSerializer):
+            envelope = view.get_envelope(view.get_format())
+            if envelope is None:
+                return None
+            head, separator, tail = [e.encode("utf-8") for e in envelope]
+            return head, separator, tail, "render_serialized_shard"
+        return None
+
+    def export(self, view, output):
+        """
+        Export the view to the output file in one go.
+        """
+        rows = []
+        view.progress_callback = rows.append
+        response = view.get(view.request)
+        with open(output, "wb") as fp:
+            for chunk in _iter_content(response):
+                fp.write(chunk)
+        if hasattr(response, "close"):
+            response.close()
+        return sum(rows)
+
+    def export_segments(
+        self, view, queryset, make_view, envelope, output, checkpoint, state, options
+    ):
+        """
+        Export the view to the output file a segment at a time, saving a
+        checkpoint after each segment.
+        """
+        head, separator, tail, method = envelope
+        saved = None
+        if options["resume"] and os.path.exists(checkpoint):
+            saved = self.load_checkpoint(checkpoint, state)
+        if saved is None:
+            state.update(last_pk=None, rows=0, size=0, empty=True)
+            fp = open(output, "wb")
+            fp.write(head)
+        else:
+            state.update(saved)
+            fp = open(output, "r+b")
+            # drop anything written after the checkpoint.
+            fp.truncate(state["size"])
+            fp.seek(state["size"])
+        with fp:
+            self.save_checkpoint(checkpoint, fp, state)
+            secured = view.security_filter(view.get_selected_queryset())
+            after = state["last_pk"]
+            if after is not None:
+                after = model_pk(queryset.model, after)
+            segments = iter_segments(secured, options["checkpoint_rows"], after)
+            workers = options["workers"]
+            if workers > 1:
+                # the bounds are found before the connections are closed.
+                segments = list(segments)
+                tasks = [
+                    self.make_task(make_view, queryset, method, bounds)
+                    for bounds in segments
+                ]
+                results = zip(segments, map_tasks(tasks, workers))
+            else:
+                results = (
+                    (
+                        bounds,
+                        render_shard(
+                            self.make_task(make_view, queryset, method, bounds)
+                        ),
+                    )
+                    for bounds in segments
+                )
+            for (after, last), (count, body) in results:
+                if isinstance(body, str):
+                    body = body.encode("utf-8")
+                if body:
+                    if not state["empty"]:
+                        fp.write(separator)
+                    fp.write(body)
+                    state["empty"] = False
+                state["last_pk"] = last
+                state["rows"] += count
+                self.save_checkpoint(checkpoint, fp, state)
+                if options["verbosity"] >= 2:
+                    self.stdout.write(
+                        "{0} rows exported, to pk {1}".format(state["rows"], last)
+                    )
+            fp.write(tail)
+        os.remove(checkpoint)
+        return state["rows"]
+
+    def make_task(self, make_view, queryset, method, bounds):
+        """
+        Return the ``render_shard()`` task for the segment.
+        """
+        after, last = bounds
+        segment = queryset.filter(pk__lte=last)
+        if after is not None:
+            segment = segment.filter(pk__gt=after)
+        return make_shard_task(make_view(segment), method)
+
+    def load_checkpoint(self, checkpoint, state):
+        """
+        Return the saved state, checking that it is for the same export.
+        """
+        with open(checkpoint) as fp:
+            saved = json.load(fp)
+        for key, value in state.items():  # the export arguments
+            if saved.get(key, None) != value:
+                raise CommandError(
+                    "The checkpoint {0} is for another export ({1} differs)".format(
+                        checkpoint, key
+                    )
+                )
+        if not os.path.exists(state["output"]):
+            raise CommandError("The output file {0} is missing".format(state["output"]))
+        return saved
+
+    def save_checkpoint(self, checkpoint, fp, state):
+        """
+        Save the state, once the output written so far is on disk.
+        """
+        fp.flush()
+        os.fsync(fp.fileno())
+        state["size"] = fp.tell()
+        temp = checkpoint + ".tmp"
+        with open(temp, "w") as out:
+            json.dump(state, out, cls=DjangoJSONEncoder)
+        os.replace(temp, checkpoint)
+
+
+#######################################################################
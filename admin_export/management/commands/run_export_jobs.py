@@ -0,0 +1,46 @@
+"""
+Run the queued background export jobs in this process, e.g., from cron
+jobs or a worker service; stale running jobs are queued again first, and
+expired jobs are deleted (see ``admin_export.jobs``).
+
+Examples:
+    manage.py run_export_jobs
+    manage.py run_export_jobs --poll 30
+"""
+#######################################################################
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...jobs import expire_jobs, requeue_stale_jobs, run_pending
+
+#######################################################################
+
+
+class Command(BaseCommand):
+    help = "Run the queued background export jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--poll",
+            type=int,
+            metavar="SECONDS",
+            help="keep checking for jobs, at this interval (default: run once)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            requeued = requeue_stale_jobs()
+            if requeued and options["verbosity"] >= 1:
+                self.stdout.write("Queued {0} stale jobs again".format(requeued))
+            expired = expire_jobs()
+            if expired and options["verbosity"] >= 1:
+                self.stdout.write("Deleted {0} expired jobs".format(expired))
+            run_pending()
+            if not options["poll"]:
+                break
+            time.sleep(options["poll"])
+
+
+#######################################################################
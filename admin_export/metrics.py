@@ -0,0 +1,294 @@
+"""
+Export instrumentation.
+
+Each export is timed by phase:
+
+    plan: resolving the ``ExportPlan``;
+    cache: computing validators, and checking the result cache;
+    query: fetching chunks of rows (including prefetching);
+    rows: resolving the export fields of the rows;
+    shards: waiting for worker processes;
+    encode: everything else in the export, e.g., the writer or serializer;
+    write: the time the server spent sending the response.
+
+The database queries (on all connections, in this thread) and the rows
+exported are counted too.  The results are reported as a dictionary:
+to a structured log record (on the ``admin_export.metrics`` logger, with
+the dictionary as ``record.export_metrics``), the ``export_finished``
+signal and any metrics sinks; and in a ``Server-Timing`` response header.
+Streaming responses send their headers before the export is done, so
+their ``Server-Timing`` only covers the work done up front.
+
+Settings:
+    ADMIN_EXPORT_METRICS: instrument exports (default: True).
+    ADMIN_EXPORT_SERVER_TIMING: add the ``Server-Timing`` header
+        (default: True).
+    ADMIN_EXPORT_METRICS_SINKS: a list of dotted paths to metrics sinks:
+        callables which take the metrics dictionary, or classes of them,
+        e.g., ``MetricsSink`` subclasses (default: ``[]``).
+"""
+#######################################################################
+
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+
+from .signals import export_finished
+
+#######################################################################
+
+logger = logging.getLogger(__name__)
+
+_sinks = None
+_sinks_lock = threading.Lock()
+
+# the phases which are measured directly; encode and write are derived.
+MEASURED_PHASES = ("plan", "cache", "query", "rows", "shards")
+
+#######################################################################
+
+
+def metrics_enabled():
+    return getattr(settings, "ADMIN_EXPORT_METRICS", True)
+
+
+def server_timing_enabled():
+    return getattr(settings, "ADMIN_EXPORT_SERVER_TIMING", True)
+
+
+class MetricsSink(object):
+    """
+    Base class for metrics sinks; ``emit()`` is called with the metrics
+    dictionary of each export.
+    """
+
+    def __call__(self, metrics):
+        self.emit(metrics)
+
+    def emit(self, metrics):
+        raise NotImplementedError
+
+
+def get_sinks():
+    """
+    Return the (process-wide) list of metrics sinks.
+    """
+    global _sinks
+    paths = tuple(getattr(settings, "ADMIN_EXPORT_METRICS_SINKS", ()))
+    with _sinks_lock:
+        if _sinks is None or _sinks[0] != paths:
+            sinks = []
+            for path in paths:
+                sink = import_string(path)
+                if isinstance(sink, type):
+                    sink = sink()
+                sinks.append(sink)
+            _sinks = (paths, sinks)
+        return _sinks[1]
+
+
+#######################################################################
+
+
+class NullMetrics(object):
+    """
+    Stands in for ``ExportMetrics`` when an export is not instrumented,
+    e.g., in worker processes.
+    """
+
+    @contextmanager
+    def phase(self, name):
+        yield
+
+    def add_rows(self, count):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+class ExportMetrics(object):
+    """
+    The measurements for one export view.
+    """
+
+    def __init__(self, view):
+        self.view = view
+        self.started = perf_counter()
+        self.phases = OrderedDict((name, 0.0) for name in MEASURED_PHASES)
+        self.busy = 0.0  # time spent in the view, and its content
+        self.rows = 0
+        self.queries = 0
+        self.cache = None
+        self.result = None
+        self._wrappers = ExitStack()
+        for alias in connections:
+            self._wrappers.enter_context(
+                connections[alias].execute_wrapper(self._count_query)
+            )
+
+    def _count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Time the enclosed code as (part of) the named phase.
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] += perf_counter() - start
+
+    def add_rows(self, count):
+        self.rows += count
+
+    def attach(self, response):
+        """
+        Arrange for the export to be reported once the response is done.
+        """
+        self.busy += perf_counter() - self.started
+        self.cache = response.get("X-Export-Cache", None)
+        if response.streaming:
+            if server_timing_enabled():
+                response["Server-Timing"] = self.server_timing()
+            response.streaming_content = self.track(response.streaming_content)
+            # the response may be closed before its content is iterated.
+            self.on_close(response, self.finish)
+        elif not getattr(response, "is_rendered", True):
+            response.add_post_render_callback(self.finish_response)
+        else:
+            self.finish_response(response)
+        return response
+
+    def on_close(self, response, callback):
+        """
+        Call ``callback`` when the response is closed.
+        """
+        closers = getattr(response, "_resource_closers", None)
+        if closers is not None:
+            closers.append(callback)
+            return
+        close = response.close
+
+        def closer():
+            try:
+                close()
+            finally:
+                callback()
+
+        response.close = closer
+
+    def track(self, content):
+        """
+        Generate the content, timing it; and report when it is done.
+        """
+        content = iter(content)
+        try:
+            while True:
+                start = perf_counter()
+                try:
+                    chunk = next(content)
+                except StopIteration:
+                    break
+                finally:
+                    self.busy += perf_counter() - start
+                yield chunk
+        finally:
+            self.finish()
+
+    def finish_response(self, response):
+        self.finish()
+        if server_timing_enabled():
+            response["Server-Timing"] = self.server_timing()
+
+    def abort(self):
+        self._wrappers.close()
+
+    def get_phases(self, total=None):
+        """
+        Return the phase durations, in seconds.
+        """
+        phases = OrderedDict(self.phases)
+        phases["encode"] = max(self.busy - sum(self.phases.values()), 0.0)
+        if total is not None:
+            phases["write"] = max(total - self.busy, 0.0)
+        return phases
+
+    def server_timing(self):
+        """
+        Return the value of the ``Server-Timing`` header.
+        """
+        result = self.result
+        if result is None:
+            phases, total = self.get_phases(), self.busy
+        else:
+            phases, total = result["phases"], result["total"]
+        metrics = [
+            "{0};dur={1:.1f}".format(name, seconds * 1000)
+            for name, seconds in phases.items()
+            if seconds
+        ]
+        metrics.append(
+            '{0};dur={1:.1f};desc="{2} rows, {3} queries"'.format(
+                "total", total * 1000, self.rows, self.queries
+            )
+        )
+        return ", ".join(metrics)
+
+    def finish(self):
+        """
+        Report the export; this is only done once.
+        """
+        if self.result is not None:
+            return self.result
+        self._wrappers.close()
+        total = perf_counter() - self.started
+        view = self.view
+        plan = view._plan
+        self.result = {
+            "view": "{0}.{1}".format(type(view).__module__, type(view).__name__),
+            "model": plan.model._meta.label if plan is not None else None,
+            "format": plan.format if plan is not None else None,
+            "user": getattr(view.request.user, "pk", None),
+            "cache": self.cache,
+            "rows": self.rows,
+            "queries": self.queries,
+            "total": total,
+            "phases": self.get_phases(total),
+        }
+        self.report(self.result)
+        return self.result
+
+    def report(self, result):
+        """
+        Report the result to the log, signal receivers and sinks.
+        """
+        logger.info(
+            "Exported %(rows)d %(model)s rows as %(format)s in %(total).3fs "
+            "(%(queries)d queries)",
+            result,
+            extra={"export_metrics": result},
+        )
+        export_finished.send(
+            sender=type(self.view),
+            view=self.view,
+            request=self.view.request,
+            metrics=result,
+        )
+        for sink in get_sinks():
+            try:
+                sink(result)
+            except Exception:
+                logger.exception("Metrics sink %r failed", sink)
+
+
+#######################################################################
@@ -0,0 +1,27 @@
+# Generated by Django 2.2 on 2026-10-17 02:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("admin_export", "0002_exportwatermark"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="exportjob",
+            name="attempts",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="exportjob",
+            name="heartbeat",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="The last progress report of a running job",
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,85 @@
+"""
+Models for admin exports.
+"""
+#######################################################################
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+
+#######################################################################
+
+
+class ExportJob(models.Model):
+    """
+    An export which is run in the background; this is also the queue
+    entry for the worker pool.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    )
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL
+    )
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    path = models.CharField(max_length=255, help_text="The export view url")
+    query_string = models.TextField(blank=True)
+    selection = models.BinaryField(help_text="The pickled export selection")
+    status = models.CharField(
+        max_length=16, choices=STATUS_CHOICES, default=QUEUED, db_index=True
+    )
+    rows_done = models.PositiveIntegerField(default=0)
+    rows_total = models.PositiveIntegerField(null=True, blank=True)
+    file = models.FileField(upload_to="admin_export/%Y/%m/", blank=True)
+    filename = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    heartbeat = models.DateTimeField(
+        null=True, blank=True, help_text="The last progress report of a running job"
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created"]
+
+    def __str__(self):
+        return "{0} export #{1} ({2})".format(
+            self.content_type, self.pk, self.get_status_display()
+        )
+
+
+#######################################################################
+
+
+class ExportWatermark(models.Model):
+    """
+    The last watermark of delta exports, for a user and content type.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.CASCADE
+    )
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    field = models.CharField(max_length=255, help_text="The watermark field")
+    value = models.CharField(max_length=255)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [("user", "content_type", "field")]
+
+    def __str__(self):
+        return "{0}.{1} > {2}".format(self.content_type, self.field, self.value)
+
+
+#######################################################################
@@ -0,0 +1,63 @@
+"""
+Newline-delimited JSON (NDJSON) serializer: one JSON object per line,
+for bulk loaders which read a record at a time.
+
+This is registered with the core serializers as ``ndjson``.
+"""
+#######################################################################
+
+import json
+import mimetypes
+
+from django.core.serializers.base import DeserializationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.serializers.python import Deserializer as PythonDeserializer
+from django.core.serializers.python import Serializer as PythonSerializer
+
+#######################################################################
+
+mimetypes.add_type("application/x-ndjson", ".ndjson")
+
+#######################################################################
+
+
+class Serializer(PythonSerializer):
+    """
+    Convert a queryset to newline-delimited JSON.
+    """
+
+    internal_use_only = False
+
+    def end_object(self, obj):
+        json.dump(self.get_dump_object(obj), self.stream, cls=DjangoJSONEncoder)
+        self.stream.write("\n")
+        self._current = None
+
+    def getvalue(self):
+        # the python serializer returns its list of objects instead.
+        return self.stream.getvalue()
+
+
+def Deserializer(stream_or_string, **options):
+    """
+    Deserialize a stream or string of newline-delimited JSON data.
+    """
+    if isinstance(stream_or_string, bytes):
+        stream_or_string = stream_or_string.decode("utf-8")
+    if isinstance(stream_or_string, str):
+        stream_or_string = stream_or_string.splitlines()
+    for line in stream_or_string:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line.strip():
+            continue
+        try:
+            for obj in PythonDeserializer([json.loads(line)], **options):
+                yield obj
+        except (GeneratorExit, DeserializationError):
+            raise
+        except Exception as e:
+            raise DeserializationError(e)
+
+
+#######################################################################
@@ -0,0 +1,204 @@
+"""
+PDF export pipeline for the default (table) layout.
+
+The LaTeX source is written row by row to temporary files; large tables
+are split into segments of ``ADMIN_EXPORT_PDF_SEGMENT_ROWS`` rows, which
+are compiled in parallel (while later segments are still being written)
+and then joined with ``pdfpages``.  Every LaTeX run in the process is
+subject to a global concurrency cap, and to a timeout.
+
+Settings:
+    ADMIN_EXPORT_PDF_SEGMENT_ROWS: rows per segment (default: 2000).
+    ADMIN_EXPORT_PDF_WORKERS: segments compiled in parallel, per export
+        (default: 2).
+    ADMIN_EXPORT_LATEX_CONCURRENCY: LaTeX runs at once, per process
+        (default: 2).
+    ADMIN_EXPORT_LATEX_TIMEOUT: seconds allowed for compiling a document,
+        including waiting for a slot (default: 300).
+    ADMIN_EXPORT_LATEX_COMMAND: the LaTeX command (default: ``pdflatex``).
+    ADMIN_EXPORT_LATEX_COMPILER: the dotted path of a replacement for
+        ``run_latex()``, e.g., a stub for tests.
+"""
+#######################################################################
+
+import io
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.utils.encoding import force_str
+from django.utils.module_loading import import_string
+
+from .utils import latex_postamble, latex_preamble
+
+#######################################################################
+
+_semaphore = None
+_semaphore_lock = threading.Lock()
+
+LATEX_SPECIAL = {
+    "\\": r"\textbackslash{}",
+    "&": r"\&",
+    "%": r"\%",
+    "$": r"\$",
+    "#": r"\#",
+    "_": r"\_",
+    "{": r"\{",
+    "}": r"\}",
+    "~": r"\textasciitilde{}",
+    "^": r"\textasciicircum{}",
+}
+
+#######################################################################
+
+
+class LaTeXError(Exception):
+    """
+    Raised when a LaTeX document cannot be compiled (in time).
+    """
+
+
+#######################################################################
+
+
+def latex_escape(value):
+    """
+    Escape the text for use in a LaTeX document.
+    """
+    return "".join(LATEX_SPECIAL.get(c, c) for c in force_str(value))
+
+
+def get_semaphore():
+    """
+    Return the semaphore which caps concurrent LaTeX runs in the process.
+    """
+    global _semaphore
+    with _semaphore_lock:
+        if _semaphore is None:
+            _semaphore = threading.BoundedSemaphore(
+                getattr(settings, "ADMIN_EXPORT_LATEX_CONCURRENCY", 2)
+            )
+        return _semaphore
+
+
+def get_timeout():
+    return getattr(settings, "ADMIN_EXPORT_LATEX_TIMEOUT", 300)
+
+
+#######################################################################
+
+
+def run_latex(tex_path, timeout, passes=2):
+    """
+    Compile the LaTeX document, returning the path of the PDF.
+    (longtable needs more than one pass to settle its column widths.)
+    """
+    command = getattr(settings, "ADMIN_EXPORT_LATEX_COMMAND", "pdflatex")
+    directory, name = os.path.split(tex_path)
+    deadline = time.time() + timeout
+    for i in range(passes):
+        try:
+            subprocess.run(
+                [command, "-interaction=batchmode", "-halt-on-error", name],
+                cwd=directory,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=max(deadline - time.time(), 0),
+                check=True,
+            )
+        except subprocess.TimeoutExpired:
+            raise LaTeXError("LaTeX timed out compiling {0}".format(name))
+        except subprocess.CalledProcessError:
+            raise LaTeXError("LaTeX failed to compile {0}".format(name))
+        except OSError as e:  # e.g., not installed
+            raise LaTeXError("Cannot run LaTeX ({0}): {1}".format(command, e))
+    return os.path.splitext(tex_path)[0] + ".pdf"
+
+
+def compile_latex(tex_path, passes=2):
+    """
+    Compile the LaTeX document within the global concurrency cap.
+    """
+    compiler = getattr(settings, "ADMIN_EXPORT_LATEX_COMPILER", None)
+    compiler = import_string(compiler) if compiler else run_latex
+    timeout = get_timeout()
+    deadline = time.time() + timeout
+    semaphore = get_semaphore()
+    if not semaphore.acquire(timeout=timeout):
+        raise LaTeXError("Timed out waiting to run LaTeX")
+    try:
+        return compiler(tex_path, max(deadline - time.time(), 0), passes=passes)
+    finally:
+        semaphore.release()
+
+
+#######################################################################
+
+
+def write_segment(path, preamble, rows):
+    """
+    Write a segment document, for the (text) rows.
+    """
+    with io.open(path, "w", encoding="utf-8") as fp:
+        fp.write(preamble)
+        for row in rows:
+            fp.write("    ")
+            fp.write(" & ".join(latex_escape(cell) for cell in row))
+            fp.write(" \\\\\n")
+        fp.write(latex_postamble())
+
+
+def join_segments(directory, pdf_paths):
+    """
+    Return the path of the PDF which joins the segment PDFs (in order).
+    """
+    if len(pdf_paths) == 1:
+        return pdf_paths[0]
+    path = os.path.join(directory, "export.tex")
+    with io.open(path, "w", encoding="utf-8") as fp:
+        fp.write("\\documentclass[letterpaper]{article}\n")
+        fp.write("\\usepackage{pdfpages}\n")
+        fp.write("\\begin{document}\n")
+        for pdf_path in pdf_paths:
+            fp.write(
+                "\\includepdf[pages=-]{{{0}}}\n".format(os.path.basename(pdf_path))
+            )
+        fp.write("\\end{document}\n")
+    return compile_latex(path, passes=1)
+
+
+def render_pdf(directory, headers, rows, segment_rows=None, workers=None):
+    """
+    Render the table of (text) rows as a PDF in the directory, returning
+    the path of the PDF.
+    """
+    if segment_rows is None:
+        segment_rows = getattr(settings, "ADMIN_EXPORT_PDF_SEGMENT_ROWS", 2000)
+    if workers is None:
+        workers = getattr(settings, "ADMIN_EXPORT_PDF_WORKERS", 2)
+    preamble = latex_preamble([latex_escape(h) for h in headers])
+    rows = iter(rows)
+    futures = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            segment = []
+            for row in rows:
+                segment.append(row)
+                if len(segment) >= segment_rows:
+                    break
+            if futures and not segment:
+                break
+            path = os.path.join(directory, "segment-{0:05d}.tex".format(len(futures)))
+            write_segment(path, preamble, segment)
+            futures.append(executor.submit(compile_latex, path))
+            if len(segment) < segment_rows:
+                break
+        pdf_paths = [f.result() for f in futures]
+    return join_segments(directory, pdf_paths)
+
+
+#######################################################################
@@ -0,0 +1,239 @@
+"""
+Permission filtering for exports.
+
+Users with the change permission of a model can export all of its rows;
+others only the rows they have (change) object permissions for, with
+django-guardian (if installed), or none.  The object permission check is
+a part of the export query: ``EXISTS`` subqueries against guardian's user
+and group object permission tables, correlated with the exported rows;
+so nothing is fetched up front, however many object permissions there
+are.
+
+The model permission check, and the permission scope (the permission,
+and the user's groups), are cached per user and model for a short time;
+the cache is cleared (in this process) when users, groups or their
+permissions change.  Object permissions are not cached.
+
+Settings:
+    ADMIN_EXPORT_PERMISSION_CACHE_TIMEOUT: the number of seconds to
+        cache permission checks for (default: 60; 0 to not cache them).
+"""
+#######################################################################
+
+import threading
+from collections import namedtuple
+from time import monotonic
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_permission_codename, get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections
+from django.db.models import CharField, Exists, OuterRef, Q, UUIDField, Value
+from django.db.models.functions import Cast, Replace
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+#######################################################################
+
+# adaptively use django guardian.
+try:
+    from guardian.utils import (
+        get_group_obj_perms_model,
+        get_identity,
+        get_user_obj_perms_model,
+    )
+except ImportError:
+    get_identity = None
+
+#######################################################################
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+DEFAULT_CACHE_TIMEOUT = 60
+
+PermissionScope = namedtuple(
+    "PermissionScope",
+    [
+        "all",  # True if every row can be exported
+        "user",  # the (guardian) user's primary key, or None
+        "permission",  # the object permission's primary key, or None
+        "content_type",  # the model's content type primary key
+        "groups",  # the primary keys of the user's groups
+    ],
+)
+
+#######################################################################
+
+
+def get_cache_timeout():
+    return getattr(
+        settings, "ADMIN_EXPORT_PERMISSION_CACHE_TIMEOUT", DEFAULT_CACHE_TIMEOUT
+    )
+
+
+def clear_permission_cache(**kwargs):
+    """
+    Clear the cached permission checks; also a signal receiver.
+    """
+    with _cache_lock:
+        _cache.clear()
+
+
+def _user_saved(sender, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return  # logging in
+    clear_permission_cache()
+
+
+def resolve_permission_scope(user, model):
+    """
+    Return the ``PermissionScope`` of the user for exporting the model.
+    """
+    codename = get_permission_codename("change", model._meta)
+    content_type = ContentType.objects.get_for_model(model)
+    if user.has_perm("{0}.{1}".format(model._meta.app_label, codename)):
+        return PermissionScope(True, None, None, content_type.pk, ())
+    none = PermissionScope(False, None, None, content_type.pk, ())
+    if get_identity is None or not apps.is_installed("guardian"):
+        return none
+    user = get_identity(user)[0]
+    permission = (
+        Permission.objects.filter(content_type=content_type, codename=codename)
+        .values_list("pk", flat=True)
+        .first()
+    )
+    if user is None or permission is None:
+        return none
+    groups = ()
+    if hasattr(user, "groups"):
+        groups = tuple(user.groups.values_list("pk", flat=True))
+    return PermissionScope(False, user.pk, permission, content_type.pk, groups)
+
+
+def get_permission_scope(user, model):
+    """
+    Return the (cached) ``PermissionScope`` of the user for the model.
+    """
+    timeout = get_cache_timeout()
+    if not timeout or user.pk is None:
+        return resolve_permission_scope(user, model)
+    key = (user.pk, model._meta.label)
+    entry = _cache.get(key, None)
+    if entry is not None and entry[0] > monotonic():
+        return entry[1]
+    scope = resolve_permission_scope(user, model)
+    with _cache_lock:
+        _cache[key] = (monotonic() + timeout, scope)
+    return scope
+
+
+#######################################################################
+
+
+def _object_permissions(perm_model, queryset, scope, **lookups):
+    """
+    Return the object permissions (of ``perm_model``) in the scope for
+    the outer row of the queryset.
+    """
+    qs = perm_model.objects.filter(permission=scope.permission, **lookups)
+    if not perm_model.objects.is_generic():
+        return qs.filter(content_object=OuterRef("pk"))
+    qs = qs.filter(content_type=scope.content_type)
+    pk = queryset.model._meta.pk
+    while pk.is_relation:
+        pk = pk.target_field
+    if isinstance(pk, UUIDField):
+        if not connections[queryset.db].features.has_native_uuid_field:
+            # the column has no dashes, unlike the object pk.
+            return qs.annotate(
+                _export_pk=Replace("object_pk", Value("-"), Value(""))
+            ).filter(_export_pk=OuterRef("pk"))
+    elif isinstance(pk, CharField):
+        return qs.filter(object_pk=OuterRef("pk"))
+    return qs.filter(object_pk=Cast(OuterRef("pk"), output_field=CharField()))
+
+
+def filter_queryset(queryset, scope):
+    """
+    Return the rows of the queryset which can be exported in the scope.
+    """
+    if scope.all:
+        return queryset
+    if scope.permission is None:
+        return queryset.none()
+    conditions = [
+        Exists(
+            _object_permissions(
+                get_user_obj_perms_model(queryset.model),
+                queryset,
+                scope,
+                user=scope.user,
+            )
+        )
+    ]
+    if scope.groups:
+        conditions.append(
+            Exists(
+                _object_permissions(
+                    get_group_obj_perms_model(queryset.model),
+                    queryset,
+                    scope,
+                    group__in=scope.groups,
+                )
+            )
+        )
+    if django.VERSION >= (3, 0):
+        condition = Q(conditions[0])
+        for other in conditions[1:]:
+            condition |= Q(other)
+        return queryset.filter(condition)
+    # older versions can only filter on annotations.
+    names = ["_export_perm_{0}".format(i) for i in range(len(conditions))]
+    queryset = queryset.annotate(**dict(zip(names, conditions)))
+    condition = Q(**{names[0]: True})
+    for name in names[1:]:
+        condition |= Q(**{name: True})
+    return queryset.filter(condition)
+
+
+#######################################################################
+
+
+def connect_signals():
+    """
+    Clear the permission cache when users, groups or their permissions
+    change.
+    """
+    user_model = get_user_model()
+    post_save.connect(
+        _user_saved, sender=user_model, dispatch_uid="admin_export_permissions"
+    )
+    post_delete.connect(
+        clear_permission_cache,
+        sender=user_model,
+        dispatch_uid="admin_export_permissions",
+    )
+    for model in (Group, Permission):
+        for signal in (post_save, post_delete):
+            signal.connect(
+                clear_permission_cache,
+                sender=model,
+                dispatch_uid="admin_export_permissions",
+            )
+    through = [Group.permissions.through]
+    for name in ("groups", "user_permissions"):
+        field = getattr(user_model, name, None)
+        if field is not None:
+            through.append(field.through)
+    for model in through:
+        m2m_changed.connect(
+            clear_permission_cache,
+            sender=model,
+            dispatch_uid="admin_export_permissions",
+        )
+
+
+#######################################################################
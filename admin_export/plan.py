@@ -0,0 +1,204 @@
+"""
+Export plans.
+
+Everything about an export which does not depend on the selected rows --
+the model, the fields, their accessors, labels and cell types, the
+annotations and related lookups, and any custom template -- is resolved
+once into an immutable ``ExportPlan``.  Plans are cached across requests,
+by export view class, content type, format and field specification;
+template lookups (including misses) are cached likewise.  Nothing is
+cached while ``DEBUG`` is on, so that new templates are picked up.  The
+caches are bounded, since their keys come (in part) from the request:
+the least recently used entries are evicted first.  (The views only plan
+exports of supported formats.)
+
+Settings:
+    ADMIN_EXPORT_PLAN_CACHE_SIZE: the maximum number of entries in each
+        cache (default: 256).
+"""
+#######################################################################
+
+import threading
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist, loader
+
+#######################################################################
+
+_cache_lock = threading.Lock()
+
+# for template lookup misses.
+MISSING = object()
+
+DEFAULT_CACHE_SIZE = 256
+
+#######################################################################
+
+
+def get_cache_size():
+    return getattr(settings, "ADMIN_EXPORT_PLAN_CACHE_SIZE", DEFAULT_CACHE_SIZE)
+
+
+class LRUCache(object):
+    """
+    A (thread safe) mapping of at most ``get_cache_size()`` entries; the
+    least recently used entries are evicted first.
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        with _cache_lock:
+            try:
+                self.entries.move_to_end(key)
+            except KeyError:
+                return default
+            return self.entries[key]
+
+    def set(self, key, value):
+        with _cache_lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            size = max(get_cache_size(), 0)
+            while len(self.entries) > size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with _cache_lock:
+            self.entries.clear()
+
+
+_plan_cache = LRUCache()
+_template_cache = LRUCache()
+_fields_cache = LRUCache()
+
+#######################################################################
+
+
+ExportPlan = namedtuple(
+    "ExportPlan",
+    [
+        "content_type",
+        "model",
+        "format",
+        "fields",
+        "labels",
+        "accessors",
+        "value_columns",  # (paths, columns), or None
+        "cell_types",  # see converters
+        "annotations",  # (alias, expression) pairs; see annotations
+        "related_lookups",  # (select_related, prefetch_related)
+        "template",  # the custom template, or None
+    ],
+)
+
+#######################################################################
+
+
+def use_cache():
+    return not settings.DEBUG
+
+
+def find_template(template_names):
+    """
+    Return the first template found from the list of names, or ``None``.
+    """
+    key = tuple(template_names)
+    template = _template_cache.get(key, None)
+    if template is None:
+        try:
+            template = loader.select_template(template_names)
+        except TemplateDoesNotExist:
+            template = MISSING
+        if use_cache():
+            _template_cache.set(key, template)
+    if template is MISSING:
+        return None
+    return template
+
+
+def get_template_fields(template_name):
+    """
+    Return the list of field names from the (plain text) template,
+    or ``None`` if there is no such template.
+    """
+    fields = _fields_cache.get(template_name, None)
+    if fields is None:
+        template = find_template([template_name])
+        if template is None:
+            fields = MISSING
+        else:
+            fields = template.render({}).strip().split("\n")
+        if use_cache():
+            _fields_cache.set(template_name, fields)
+    if fields is MISSING:
+        return None
+    return list(fields)
+
+
+#######################################################################
+
+
+def build_export_plan(view, fields):
+    """
+    Build the plan for the export view, with the given fields.
+    """
+    ct = view.get_contenttype()
+    select_related, prefetch_related = view.get_related_lookups()
+    value_columns = view.get_value_columns()
+    if value_columns is not None:
+        value_columns = (tuple(value_columns[0]), tuple(value_columns[1]))
+    return ExportPlan(
+        content_type=ct,
+        model=ct.model_class(),
+        format=view.get_format(),
+        fields=tuple(fields),
+        labels=tuple(view.get_field_labels()),
+        accessors=tuple(view.get_accessors()),
+        value_columns=value_columns,
+        cell_types=tuple(view.get_cell_types()),
+        annotations=tuple(view.get_annotations()),
+        related_lookups=(tuple(select_related), tuple(prefetch_related)),
+        template=view.get_custom_template(),
+    )
+
+
+def get_export_plan(view):
+    """
+    Return the (cached) plan for the export view.
+    """
+    fields = view.get_export_fields()
+    if not view.cache_export_plan or not use_cache():
+        return build_export_plan(view, fields)
+    key = (
+        type(view),
+        view.get_contenttype().pk,
+        view.get_format(),
+        tuple(fields),
+        view.values_fast_path,
+        tuple(sorted(view.get_export_option("export_annotations", None) or ())),
+        tuple(view.get_export_option("export_select_related", None) or ()),
+        tuple(view.get_export_option("export_prefetch_related", None) or ()),
+    )
+    plan = _plan_cache.get(key, None)
+    if plan is None:
+        plan = build_export_plan(view, fields)
+        _plan_cache.set(key, plan)
+    return plan
+
+
+def clear_caches():
+    """
+    Clear the plan and template caches, e.g., for tests.
+    """
+    _plan_cache.clear()
+    _template_cache.clear()
+    _fields_cache.clear()
+
+
+#######################################################################
@@ -0,0 +1,178 @@
+"""
+Content-addressed cache of rendered exports.
+
+The rendered artifacts are kept as files on local disk, named by a hash
+of everything which determines their content (see
+``ExportMixin.get_result_cache_key()``).  The total size of the cache is
+bounded: the least recently used files are evicted first.  Only exports
+of models with an ``export_modified_field`` are cached; otherwise rows
+updated in place would not change the key.
+
+Settings:
+    ADMIN_EXPORT_RESULT_CACHE_DIR: the cache directory (default: ``None``,
+        i.e., results are not cached).
+    ADMIN_EXPORT_RESULT_CACHE_SIZE: the maximum total size, in bytes, of the
+        cached files (default: 1 GB).
+"""
+#######################################################################
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+
+#######################################################################
+
+_cache = None
+_cache_lock = threading.Lock()
+
+#######################################################################
+
+
+class ExportResultCache(object):
+    """
+    A size-bounded LRU cache of files on local disk.
+    Each entry is a data file, plus a ``.json`` file with its headers.
+    """
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    @staticmethod
+    def make_key(*parts):
+        """
+        Return the key for the given parts.
+        """
+        data = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """
+        Return the pair ``(file, headers)`` for the key, or ``None``.
+        The file is open for (binary) reading.
+        """
+        path = self._path(key)
+        try:
+            with open(path + ".json") as fp:
+                headers = json.load(fp)
+            data = open(path, "rb")
+            os.utime(path)  # mark as recently used
+        except (IOError, OSError, ValueError):
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return data, headers
+
+    def open_entry(self):
+        """
+        Return a temporary file for a new entry, to be passed to
+        ``commit()`` (or ``discard()``) once written.
+        """
+        return tempfile.NamedTemporaryFile(
+            dir=self.directory, prefix=".tmp-", delete=False
+        )
+
+    def commit(self, key, fp, headers):
+        """
+        Add the (closed) temporary file ``fp`` as the entry for ``key``.
+        """
+        path = self._path(key)
+        os.replace(fp.name, path)
+        with tempfile.NamedTemporaryFile(
+            "w", dir=self.directory, prefix=".tmp-", delete=False
+        ) as hfp:
+            json.dump(headers, hfp)
+        os.replace(hfp.name, path + ".json")
+        self.evict()
+
+    def discard(self, fp):
+        """
+        Remove an unused temporary file.
+        """
+        fp.close()
+        try:
+            os.remove(fp.name)
+        except OSError:
+            pass
+
+    def entries(self):
+        """
+        Return a list of ``(mtime, size, path)`` for the entries.
+        """
+        result = []
+        for name in os.listdir(self.directory):
+            if name.startswith(".") or name.endswith(".json"):
+                continue
+            path = self._path(name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            result.append((st.st_mtime, st.st_size, path))
+        return result
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits.
+        """
+        entries = sorted(self.entries())
+        total = sum(e[1] for e in entries)
+        for mtime, size, path in entries:
+            if total <= self.max_size:
+                break
+            for p in (path + ".json", path):
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+            total -= size
+
+    def stats(self):
+        """
+        Return the hit/miss counters (for this process) and the cache size.
+        """
+        entries = self.entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "size": sum(e[1] for e in entries),
+            "max_size": self.max_size,
+        }
+
+
+#######################################################################
+
+
+def get_result_cache():
+    """
+    Return the (process-wide) result cache, or ``None`` if not configured.
+    """
+    global _cache
+    directory = getattr(settings, "ADMIN_EXPORT_RESULT_CACHE_DIR", None)
+    if not directory:
+        return None
+    with _cache_lock:
+        if _cache is None or _cache.directory != directory:
+            _cache = ExportResultCache(
+                directory,
+                getattr(settings, "ADMIN_EXPORT_RESULT_CACHE_SIZE", 1024**3),
+            )
+        return _cache
+
+
+#######################################################################
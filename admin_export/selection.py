@@ -0,0 +1,94 @@
+"""
+Server-side storage for export selections.
+
+Rather than passing every selected primary key through the redirect url,
+the admin actions store the (pickled) query for the selection in the
+cache, under a short random token.  The export views then replay the
+query from the token; this covers both explicit selections and filtered
+or searched "select all" selections.
+"""
+#######################################################################
+
+import pickle
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+#######################################################################
+
+KEY_PREFIX = "admin_export:selection:"
+
+#######################################################################
+
+
+def get_cache():
+    """
+    Return the cache used for selections.
+    Use a shared cache (not the per-process local memory cache) when
+    running more than one server process.
+    """
+    return caches[getattr(settings, "ADMIN_EXPORT_CACHE", "default")]
+
+
+def get_timeout():
+    """
+    Return the lifetime, in seconds, of a stored selection.
+    """
+    return getattr(settings, "ADMIN_EXPORT_SELECTION_TIMEOUT", 60 * 60)
+
+
+#######################################################################
+
+
+def dump_selection(queryset):
+    """
+    Return a picklable description of the queryset selection.
+    This is either the query itself; or, if that cannot be pickled, the
+    list of primary keys.
+    """
+    data = {"model": queryset.model._meta.label_lower}
+    try:
+        data["query"] = pickle.dumps(queryset.query)
+    except (pickle.PicklingError, TypeError, AttributeError):
+        data["pk_list"] = list(queryset.values_list("pk", flat=True))
+    return data
+
+
+def restore_selection(model, data):
+    """
+    Return the queryset for a description from ``dump_selection()``,
+    or ``None`` if it does not apply to ``model``.
+    """
+    if data is None or data.get("model") != model._meta.label_lower:
+        return None
+    qs = model._default_manager.all()
+    if "query" in data:
+        qs.query = pickle.loads(data["query"])
+    else:
+        qs = qs.filter(pk__in=data["pk_list"])
+    return qs
+
+
+#######################################################################
+
+
+def store_selection(queryset):
+    """
+    Store the selection for the queryset, returning the token for it.
+    """
+    token = uuid.uuid4().hex
+    get_cache().set(KEY_PREFIX + token, dump_selection(queryset), get_timeout())
+    return token
+
+
+def load_selection(model, token):
+    """
+    Return the queryset for the stored selection ``token``,
+    or ``None`` if the selection does not exist (or has expired).
+    """
+    data = get_cache().get(KEY_PREFIX + token)
+    return restore_selection(model, data)
+
+
+#######################################################################
@@ -0,0 +1,152 @@
+"""
+Multi-process sharded exports.
+
+The selected primary key range is split into shards, and each shard is
+rendered by the same export view in a worker process (which has its own
+database connections).  The partial outputs are returned in shard order,
+for the view to concatenate (or merge).
+
+Settings:
+    ADMIN_EXPORT_WORKERS: the number of worker processes (default: 1,
+        i.e., no sharding).  A model admin (or view) can override this
+        with an ``export_workers`` attribute.
+    ADMIN_EXPORT_SHARD_MIN_ROWS: the smallest shard worth a worker
+        (default: 50000).
+    ADMIN_EXPORT_SHARD_START_METHOD: the multiprocessing start method
+        (default: the platform default).
+"""
+#######################################################################
+
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models import AutoField, IntegerField, Max, Min
+
+from .selection import dump_selection
+from .utils import get_sync_view_class, make_export_view
+
+#######################################################################
+
+
+def get_worker_count(view):
+    """
+    Return the number of worker processes for the view.
+    """
+    default = getattr(settings, "ADMIN_EXPORT_WORKERS", 1)
+    return view.get_export_option("export_workers", None) or default
+
+
+def get_shard_ranges(queryset, workers, min_rows=None):
+    """
+    Split the primary key range of the queryset into ``(low, high)``
+    ranges; or return ``None`` if it is not worth sharding.
+    Only integer primary keys can be split.
+    """
+    if min_rows is None:
+        min_rows = getattr(settings, "ADMIN_EXPORT_SHARD_MIN_ROWS", 50000)
+    if workers < 2:
+        return None
+    if not isinstance(queryset.model._meta.pk, (AutoField, IntegerField)):
+        return None
+    bounds = queryset.order_by().aggregate(low=Min("pk"), high=Max("pk"))
+    low, high = bounds["low"], bounds["high"]
+    if low is None:
+        return None
+    span = high - low + 1
+    count = min(workers * 4, span // max(min_rows, 1))
+    if count < 2:
+        return None
+    step = -(-span // count)  # ceiling division
+    return [
+        (start, min(start + step, high + 1)) for start in range(low, high + 1, step)
+    ]
+
+
+#######################################################################
+
+
+def _init_worker():
+    django.setup()
+
+
+def render_shard(task):
+    """
+    Render one shard in a worker process; returns ``(rows, result)``.
+    """
+    user = None
+    if task["user"] is not None:
+        user = get_user_model()._default_manager.get(pk=task["user"])
+    counter = []
+    view = make_export_view(
+        task["view_class"],
+        task["path"],
+        task["query_string"],
+        user,
+        selection_data=task["selection"],
+        shard=task["shard"],
+        progress_callback=counter.append,
+        **task["initkwargs"]
+    )
+    try:
+        result = getattr(view, task["method"])()
+    finally:
+        connections.close_all()
+    return sum(counter), result
+
+
+def make_shard_task(view, method):
+    """
+    Return the task (for ``render_shard()``) to call ``method`` of (a copy
+    of) ``view``; without the shard.
+    """
+    request = view.request
+    return {
+        "view_class": get_sync_view_class(type(view)),
+        "path": request.path,
+        "query_string": request.GET.urlencode(),
+        "user": getattr(request.user, "pk", None),
+        "selection": dump_selection(view.get_selected_queryset()),
+        "method": method,
+        "initkwargs": view.get_shard_initkwargs(),
+        "shard": None,
+    }
+
+
+def map_tasks(tasks, workers):
+    """
+    Run ``render_shard()`` for each task in a pool of worker processes,
+    generating the results in task order.
+    At most two tasks per worker are outstanding at any time.
+    """
+    start_method = getattr(settings, "ADMIN_EXPORT_SHARD_START_METHOD", None)
+    # connections must not be shared with the workers.
+    connections.close_all()
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context(start_method),
+        initializer=_init_worker,
+    ) as executor:
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(render_shard, task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def map_shards(view, method, shards, workers):
+    """
+    Call ``method`` of (a copy of) ``view`` for each shard in a pool of
+    worker processes, generating the results in shard order.
+    """
+    task = make_shard_task(view, method)
+    return map_tasks((dict(task, shard=shard) for shard in shards), workers)
+
+
+#######################################################################
@@ -0,0 +1,195 @@
+"""
+Multi-sheet workbooks of related data.
+
+A model admin (or export view) can list relations whose rows are
+exported alongside the selection, as ``export_sheets``: a list of
+``(relation, fields)`` pairs, where ``relation`` is the name of a
+(forward or reverse) foreign key, one-to-one or many-to-many relation of
+the model (reverse relations may also be named by their accessor, e.g.,
+``book_set``), and ``fields`` the export fields for the related model; or
+``None`` for its ``export_fields.txt`` template (or all of its fields).
+Otherwise the sheets are read from an ``export_sheets.txt`` template
+next to ``export_fields.txt``: a block of lines per sheet, separated by
+blank lines; the first line of a block is the relation, and any others
+the export fields.
+
+Spreadsheet exports in formats with several sheets (xlsx) then get a
+sheet per relation, after the sheet of the selection.  The related rows
+are fetched in the same pass as the selection: for each chunk of
+selected rows, with a ``<relation>__in`` lookup of their primary keys.
+Rows related to several selected rows are only written once.
+"""
+#######################################################################
+
+import re
+from collections import namedtuple
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.utils.text import capfirst
+
+from .annotations import get_annotations, get_output_fields
+from .converters import get_cell_types
+from .plan import get_template_fields
+from .utils import get_accessors, get_related_lookups, get_value_columns, titlize
+
+#######################################################################
+
+SheetPlan = namedtuple(
+    "SheetPlan",
+    [
+        "relation",
+        "title",
+        "model",
+        "lookup",  # the lookup from the related model to the selection
+        "distinct",  # True if rows may be related to several selected rows
+        "fields",
+        "labels",
+        "accessors",
+        "value_columns",  # (paths, columns), or None
+        "cell_types",
+        "annotations",  # (alias, expression) pairs
+        "related_lookups",  # (select_related, prefetch_related)
+    ],
+)
+
+# the longest sheet title, and the characters not allowed in one.
+MAX_TITLE_LENGTH = 31
+INVALID_TITLE_CHARS = re.compile(r"[\[\]:*?/\\]")
+
+#######################################################################
+
+
+def parse_sheets(lines):
+    """
+    Return the ``(relation, fields)`` pairs from the lines of an
+    ``export_sheets.txt`` template.
+    """
+    sheets = []
+    block = []
+    for line in list(lines) + [""]:
+        line = line.strip()
+        if line:
+            block.append(line)
+        elif block:
+            sheets.append((block[0], block[1:] or None))
+            block = []
+    return sheets
+
+
+def get_relation(model, name):
+    """
+    Return ``(related model, lookup, distinct)`` for the named relation of
+    the model: the lookup from the related model to the model's primary
+    key, and whether a related row can be related to several rows.
+    """
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        # reverse relations by accessor name, e.g., ``book_set``.
+        field = None
+        for rel in model._meta.related_objects:
+            if rel.get_accessor_name() == name:
+                field = rel
+    if field is None or not field.is_relation or field.related_model is None:
+        raise ImproperlyConfigured(
+            "{0} has no relation {1!r} to export".format(model._meta.label, name)
+        )
+    if field.concrete:
+        # forward: the related model's reverse relation.
+        lookup = field.related_query_name()
+        if lookup.endswith("+"):
+            raise ImproperlyConfigured(
+                "The relation {0}.{1} has no reverse relation to export "
+                "by".format(model._meta.label, name)
+            )
+        distinct = True
+    else:
+        # reverse: the related model's field.
+        lookup = field.field.name
+        distinct = field.many_to_many
+    return field.related_model, lookup + "__pk", distinct
+
+
+def make_sheet_title(title, used):
+    """
+    Return a valid, unused sheet title, like ``title``.
+    """
+    title = INVALID_TITLE_CHARS.sub("", str(title))[:MAX_TITLE_LENGTH] or "Sheet"
+    candidate = title
+    count = 1
+    while candidate.lower() in used:
+        count += 1
+        suffix = " ({0})".format(count)
+        candidate = title[: MAX_TITLE_LENGTH - len(suffix)] + suffix
+    used.add(candidate.lower())
+    return candidate
+
+
+def get_model_title(model):
+    """
+    Return the sheet title for the rows of the model.
+    """
+    return make_sheet_title(capfirst(model._meta.verbose_name_plural), set())
+
+
+def get_default_fields(model, template_base=None):
+    """
+    Return the export fields of a related model: from its
+    ``export_fields.txt`` template, or all of its fields.
+    """
+    name = "{0}/{1}/export_fields.txt".format(
+        model._meta.app_label, model._meta.model_name
+    )
+    if template_base:
+        name = template_base + "/" + name
+    fields = get_template_fields(name)
+    if fields is not None:
+        return fields
+    return [f.name for f in model._meta.fields]
+
+
+def build_sheet_plans(model, sheets, template_base=None, values_fast_path=True):
+    """
+    Return the ``SheetPlan`` for each ``(relation, fields)`` pair.
+    """
+    used = {get_model_title(model).lower()}
+    plans = []
+    for relation, fields in sheets:
+        related_model, lookup, distinct = get_relation(model, relation)
+        if not fields:
+            fields = get_default_fields(related_model, template_base)
+        fields = tuple(fields)
+        annotations = tuple(get_annotations(related_model, fields))
+        aliases = [alias for alias, expression in annotations]
+        value_columns = None
+        if values_fast_path:
+            value_columns = get_value_columns(related_model, fields, aliases)
+        if value_columns is not None:
+            value_columns = (tuple(value_columns[0]), tuple(value_columns[1]))
+        select_related, prefetch_related = get_related_lookups(related_model, fields)
+        plans.append(
+            SheetPlan(
+                relation=relation,
+                title=make_sheet_title(get_model_title(related_model), used),
+                model=related_model,
+                lookup=lookup,
+                distinct=distinct,
+                fields=fields,
+                labels=tuple(titlize(related_model, f) for f in fields),
+                accessors=tuple(get_accessors(related_model, fields)),
+                value_columns=value_columns,
+                cell_types=tuple(
+                    get_cell_types(
+                        related_model,
+                        fields,
+                        get_output_fields(related_model, annotations),
+                    )
+                ),
+                annotations=annotations,
+                related_lookups=(tuple(select_related), tuple(prefetch_related)),
+            )
+        )
+    return plans
+
+
+#######################################################################
@@ -0,0 +1,15 @@
+"""
+Signals for admin exports.
+"""
+#######################################################################
+
+from django.dispatch import Signal
+
+#######################################################################
+
+# sent when an export has been delivered (or abandoned), with the
+# arguments ``view``, ``request`` and ``metrics`` (see
+# ``admin_export.metrics``).
+export_finished = Signal()
+
+#######################################################################
@@ -0,0 +1,7 @@
+"""
+Tests for admin exports.
+
+Run them from the top of the source tree, with ``python -m
+admin_export.tests``; any arguments are passed on to the ``test``
+management command, e.g., the labels of test modules to run.
+"""
@@ -0,0 +1,17 @@
+"""
+Application configuration for the export tests.
+"""
+#######################################################################
+
+from django.apps import AppConfig
+
+#######################################################################
+
+
+class TestsConfig(AppConfig):
+    name = "admin_export.tests"
+    label = "admin_export_tests"
+    verbose_name = "Admin export tests"
+
+
+#######################################################################
@@ -0,0 +1,33 @@
+"""
+Url patterns for the export tests, with the async export views.
+"""
+#######################################################################
+
+from django.urls import re_path
+
+from ..asyncviews import (
+    ASYNC_VIEWS_SUPPORTED,
+    AsyncExportSerializer,
+    AsyncExportSpreadsheet,
+    async_admin_view,
+)
+
+#######################################################################
+
+urlpatterns = []
+
+if ASYNC_VIEWS_SUPPORTED:
+    urlpatterns += [
+        re_path(
+            r"^admin/export/spreadsheet/$",
+            async_admin_view(AsyncExportSpreadsheet.as_view()),
+            name="admin_export_spreadsheet",
+        ),
+        re_path(
+            r"^admin/export/data/$",
+            async_admin_view(AsyncExportSerializer.as_view()),
+            name="admin_export_data",
+        ),
+    ]
+
+#######################################################################
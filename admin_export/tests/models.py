@@ -0,0 +1,38 @@
+"""
+Models for the export tests.
+"""
+#######################################################################
+
+from django.db import models
+
+#######################################################################
+
+
+class Author(models.Model):
+    name = models.CharField(max_length=64)
+
+
+class Tag(models.Model):
+    name = models.CharField(max_length=64)
+
+
+class Book(models.Model):
+    title = models.CharField(max_length=64)
+    author = models.ForeignKey(
+        Author, null=True, blank=True, related_name="books", on_delete=models.CASCADE
+    )
+    tags = models.ManyToManyField(Tag, blank=True)
+    price = models.DecimalField(max_digits=8, decimal_places=2, null=True)
+    published = models.DateField(null=True)
+    binding = models.CharField(
+        max_length=1,
+        choices=[("h", "Hardcover"), ("p", "Paperback")],
+        default="p",
+    )
+    modified = models.DateTimeField(db_index=True)
+
+    def tag_list(self):
+        return ", ".join(tag.name for tag in self.tags.all())
+
+
+#######################################################################
@@ -0,0 +1,69 @@
+"""
+Settings for the export tests.
+"""
+#######################################################################
+
+import os
+import tempfile
+
+#######################################################################
+
+# adaptively test with django guardian.
+try:
+    import guardian
+except ImportError:
+    guardian = None
+
+#######################################################################
+
+SECRET_KEY = "admin-export-tests"
+
+INSTALLED_APPS = [
+    "django.contrib.admin",
+    "django.contrib.auth",
+    "django.contrib.contenttypes",
+    "django.contrib.sessions",
+    "django.contrib.messages",
+    "admin_export",
+    "admin_export.tests.apps.TestsConfig",
+]
+
+AUTHENTICATION_BACKENDS = ["django.contrib.auth.backends.ModelBackend"]
+
+if guardian is not None:
+    INSTALLED_APPS.append("guardian")
+    AUTHENTICATION_BACKENDS.append("guardian.backends.ObjectPermissionBackend")
+
+DATABASES = {"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}}
+
+DEFAULT_AUTO_FIELD = "django.db.models.AutoField"
+
+MIDDLEWARE = [
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+]
+
+TEMPLATES = [
+    {
+        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "APP_DIRS": True,
+        "OPTIONS": {
+            "context_processors": [
+                "django.template.context_processors.request",
+                "django.contrib.auth.context_processors.auth",
+                "django.contrib.messages.context_processors.messages",
+            ]
+        },
+    }
+]
+
+ROOT_URLCONF = "admin_export.tests.urls"
+
+MEDIA_ROOT = os.path.join(tempfile.gettempdir(), "admin_export-tests")
+
+USE_TZ = True
+
+ADMIN_EXPORT_LATEX_COMPILER = "admin_export.tests.utils.stub_latex"
+
+#######################################################################
@@ -0,0 +1,79 @@
+"""
+Tests for the precompiled field accessors.
+"""
+#######################################################################
+
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+
+from ..utils import decode_field, get_accessor, resolve_lookup, titlize
+from .models import Author, Book
+
+#######################################################################
+
+
+class AccessorTests(SimpleTestCase):
+    def test_decode_field(self):
+        self.assertEqual(decode_field("title"), ("title", "title", ""))
+        self.assertEqual(decode_field("title:Name"), ("title", "Name", ""))
+        self.assertEqual(
+            decode_field("author.name::anonymous"),
+            ("author.name", "author.name", "anonymous"),
+        )
+
+    def test_titles(self):
+        self.assertEqual(titlize(Book, "title"), "Title")
+        self.assertEqual(titlize(Book, "author.name"), "Name")
+        self.assertEqual(titlize(Book, "tag_list"), "Tag list")
+        self.assertEqual(titlize(Book, "author.name:Writer"), "Writer")
+
+    def test_cached(self):
+        self.assertIs(get_accessor(Book, "title"), get_accessor(Book, "title"))
+        self.assertIsNot(get_accessor(Book, "title"), get_accessor(Author, "title"))
+
+    def test_attributes(self):
+        book = Book(title="Dune", author=Author(name="Herbert"), price=Decimal("9.5"))
+        self.assertEqual(get_accessor(Book, "title")(book), "Dune")
+        self.assertEqual(get_accessor(Book, "author.name")(book), "Herbert")
+        self.assertEqual(get_accessor(Book, "price")(book), "9.5")
+        # methods are called.
+        self.assertEqual(get_accessor(Book, "title.upper")(book), "DUNE")
+
+    def test_none(self):
+        book = Book(title="Dune")
+        self.assertEqual(get_accessor(Book, "author.name")(book), "")
+        self.assertEqual(get_accessor(Book, "price")(book), "")
+        self.assertEqual(get_accessor(Book, "price::n/a")(book), "n/a")
+
+    def test_no_data_alteration(self):
+        self.assertEqual(
+            get_accessor(Book, "delete")(Book()),
+            "<< invalid -- no data alteration >>",
+        )
+
+    def test_failed_lookup(self):
+        self.assertIn(
+            "Failed lookup", get_accessor(Book, "title.missing")(Book(title="Dune"))
+        )
+
+    def test_mixed_items(self):
+        accessor = get_accessor(dict, "author.name")
+        items = [
+            {"author": {"name": "A"}},
+            {"author": Author(name="B")},
+            {"author": ["C"]},
+            {"author": {"name": "D"}},
+        ]
+        self.assertEqual(
+            [accessor(item) for item in items],
+            ["A", "B", "Failed lookup for key [name] in ['C']", "D"],
+        )
+        self.assertEqual(get_accessor(dict, "items.1")({"items": ["x", "y"]}), "y")
+
+    def test_resolve_lookup(self):
+        book = Book(title="Dune", author=Author(name="Herbert"))
+        self.assertEqual(resolve_lookup(book, "author.name"), "Herbert")
+
+
+#######################################################################
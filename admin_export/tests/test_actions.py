@@ -0,0 +1,55 @@
+"""
+Tests for the export admin actions.
+"""
+#######################################################################
+
+from django.contrib.admin import ModelAdmin
+from django.contrib.admin.sites import site
+from django.test import RequestFactory
+
+from ..actions import (
+    ALL_EXPORT_ACTIONS,
+    CODE_EXPORT_ACTIONS,
+    SPREADSHEET_EXPORT_ACTIONS,
+)
+from ..writers import get_formats
+from .models import Book
+from .utils import ExportTestCase
+
+#######################################################################
+
+
+class ActionTests(ExportTestCase):
+    def test_action_names(self):
+        self.assertEqual(
+            [action.__name__ for action in SPREADSHEET_EXPORT_ACTIONS],
+            ["export_redirect_spreadsheet_" + format for format in get_formats()],
+        )
+        self.assertEqual(
+            [action.__name__ for action in CODE_EXPORT_ACTIONS],
+            [
+                "export_redirect_serializer_json",
+                "export_redirect_serializer_ndjson",
+                "export_redirect_serializer_xml",
+            ],
+        )
+        names = [action.__name__ for action in ALL_EXPORT_ACTIONS]
+        self.assertIn("export_redirect_pdf", names)
+        self.assertEqual(len(names), len(set(names)))
+
+    def test_spreadsheet_action(self):
+        self.make_books(2)
+        request = RequestFactory().post("/")
+        request.user = self.user
+        modeladmin = ModelAdmin(Book, site)
+        for action in SPREADSHEET_EXPORT_ACTIONS:
+            format = action.__name__.rsplit("_", 1)[1]
+            response = action(modeladmin, request, Book.objects.all())
+            self.assertEqual(response.status_code, 302)
+            self.assertTrue(
+                response["Location"].startswith("/admin/export/spreadsheet/?")
+            )
+            self.assertIn("&format=" + format, response["Location"])
+
+
+#######################################################################
@@ -0,0 +1,159 @@
+"""
+Tests for SQL-side annotation columns.
+"""
+#######################################################################
+
+from decimal import Decimal
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.models import Count, OuterRef, Subquery
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..annotations import get_annotations, get_output_fields, make_aggregate
+from ..utils import decode_field, parse_annotation
+from ..views import ExportSpreadsheet
+from .models import Author, Book
+from .utils import ExportTestCase, get_content, read_csv
+
+#######################################################################
+
+
+class AnnotationSpecTests(SimpleTestCase):
+    def test_parse(self):
+        self.assertEqual(
+            parse_annotation("book_count = Count( books )"),
+            ("book_count", "Count", "books"),
+        )
+        self.assertEqual(
+            parse_annotation("latest=Max(books.published):Latest:never"),
+            ("latest", "Max", "books.published"),
+        )
+        for fieldname in ["books.count", "name:Name", "x=Count(a b)", "=Count(a)"]:
+            self.assertIsNone(parse_annotation(fieldname))
+
+    def test_decode(self):
+        self.assertEqual(
+            decode_field("book_count=Count(books)"),
+            ("book_count", "book_count", ""),
+        )
+        self.assertEqual(
+            decode_field("latest=Max(books.published):Latest:never"),
+            ("latest", "Latest", "never"),
+        )
+
+    def test_make_aggregate(self):
+        aggregate = make_aggregate(Author, "Count", "books.tags")
+        self.assertIsInstance(aggregate, Count)
+        self.assertTrue(aggregate.distinct)
+        with self.assertRaises(ImproperlyConfigured):
+            make_aggregate(Author, "Median", "books.price")
+
+    def test_get_annotations(self):
+        extra = {"first": Subquery(Book.objects.values("title")[:1])}
+        annotations = get_annotations(
+            Author,
+            ["name", "n=Count(books)", "n=Count(books):Books", "first", "other"],
+            extra,
+        )
+        self.assertEqual([alias for alias, expression in annotations], ["n", "first"])
+        self.assertIs(annotations[1][1], extra["first"])
+
+    def test_invalid_path(self):
+        annotations = get_annotations(Author, ["n=Count(missing)"])
+        with self.assertRaises(ImproperlyConfigured):
+            get_output_fields(Author, annotations)
+
+
+#######################################################################
+
+
+class AnnotationExportTests(ExportTestCase):
+    def setUp(self):
+        super(AnnotationExportTests, self).setUp()
+        self.books = self.make_books(9)
+        Author.objects.create(name="Nobody")
+
+    def export(self, fields, model=Author, **options):
+        options["export_fields"] = fields
+        response = self.get(
+            ExportSpreadsheet, model=model, options=options, format="csv"
+        )
+        return read_csv(get_content(response))
+
+    def test_aggregates(self):
+        rows = self.export(
+            [
+                "name",
+                "book_count=Count(books):Books",
+                "total=Sum(books__price)",
+                "latest=Max(books.published):Latest:never",
+            ]
+        )
+        self.assertEqual(rows[0], ["Name", "Books", "Total", "Latest"])
+        self.assertEqual(
+            [row[:2] + row[3:] for row in rows[1:]],
+            [
+                ["Author 0", "3", "2020-01-07"],
+                ["Author 1", "3", "2020-01-08"],
+                ["Author 2", "3", "2020-01-09"],
+                ["Nobody", "0", "never"],
+            ],
+        )
+        # (the scale of decimal sums depends on the database.)
+        self.assertEqual(
+            [Decimal(row[2]) for row in rows[1:4]],
+            [Decimal("39"), Decimal("42"), Decimal("45")],
+        )
+        self.assertEqual(rows[4][2], "")
+
+    def test_count_distinct(self):
+        # the joins for the tags do not inflate the book counts.
+        rows = self.export(
+            ["name", "book_count=Count(books)", "tag_count=Count(books.tags)"]
+        )
+        self.assertEqual(
+            [row[1:] for row in rows[1:]],
+            [["3", "0"], ["3", "1"], ["3", "2"], ["0", "0"]],
+        )
+
+    def test_single_query(self):
+        def count_queries(n):
+            Book.objects.all().delete()
+            Author.objects.all().delete()
+            self.make_books(n)
+            with CaptureQueriesContext(connection) as queries:
+                self.export(["name", "book_count=Count(books)"], chunk_size=100)
+            return len(queries)
+
+        self.assertEqual(count_queries(3), count_queries(9))
+
+    def test_export_annotations(self):
+        first_title = Subquery(
+            Book.objects.filter(author=OuterRef("pk"))
+            .order_by("pk")
+            .values("title")[:1]
+        )
+        rows = self.export(
+            ["name", "first_title:First"],
+            export_annotations={"first_title": first_title},
+        )
+        self.assertEqual(rows[0], ["Name", "First"])
+        self.assertEqual(
+            [row[1] for row in rows[1:]], ["Book 0", "Book 1", "Book 2", ""]
+        )
+
+    def test_unused_annotations(self):
+        # only the annotations which are exported are applied.
+        rows = self.export(["name"], export_annotations={"broken": Count("missing")})
+        self.assertEqual(len(rows), 5)
+
+    def test_invalid(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.export(["name", "n=Median(books.price)"])
+        with self.assertRaises(ImproperlyConfigured):
+            self.export(["name", "n=Count(missing)"])
+
+
+#######################################################################
@@ -0,0 +1,74 @@
+"""
+Tests for the async export views.
+"""
+#######################################################################
+
+import json
+from unittest import skipUnless
+
+from django.test import override_settings
+from django.urls import reverse
+
+from ..asyncviews import (
+    ASYNC_VIEWS_SUPPORTED,
+    AsyncExportSerializer,
+    AsyncExportSpreadsheet,
+)
+from ..jobs import claim_next_job, enqueue_export, run_job
+from ..models import ExportJob
+from ..sharding import make_shard_task
+from ..utils import make_export_view
+from ..views import ExportSerializer, ExportSpreadsheet
+from .models import Book
+from .utils import ExportTestCase, read_csv
+
+#######################################################################
+
+
+@skipUnless(ASYNC_VIEWS_SUPPORTED, "async export views need Django 4.2")
+@override_settings(ROOT_URLCONF="admin_export.tests.async_urls")
+class AsyncViewJobTests(ExportTestCase):
+    """
+    Background jobs and shards run async exports in the sync views.
+    """
+
+    def run_job(self, view_name, query_string):
+        request = self.make_request()
+        path = reverse(view_name)
+        enqueue_export(request, Book.objects.all(), path, query_string)
+        job = run_job(claim_next_job())
+        self.addCleanup(job.file.delete, save=False)
+        self.assertEqual(job.status, ExportJob.DONE, job.error)
+        with job.file.open("rb") as fp:
+            return fp.read()
+
+    def test_spreadsheet_job(self):
+        books = self.make_books(3)
+        query_string = "contenttype={0}&format=csv".format(
+            self.make_request().GET["contenttype"]
+        )
+        rows = read_csv(self.run_job("admin_export_spreadsheet", query_string))
+        self.assertEqual([row[0] for row in rows[1:]], [str(b.pk) for b in books])
+
+    def test_serializer_job(self):
+        books = self.make_books(3)
+        query_string = "contenttype={0}&format=json".format(
+            self.make_request().GET["contenttype"]
+        )
+        data = json.loads(self.run_job("admin_export_data", query_string))
+        self.assertEqual([item["pk"] for item in data], [b.pk for b in books])
+
+    def test_shard_task(self):
+        for async_class, sync_class, format in [
+            (AsyncExportSpreadsheet, ExportSpreadsheet, "csv"),
+            (AsyncExportSerializer, ExportSerializer, "json"),
+        ]:
+            request = self.make_request(format=format)
+            view = make_export_view(
+                async_class, "/", request.GET.urlencode(), self.user
+            )
+            task = make_shard_task(view, "render_rows_shard")
+            self.assertIs(task["view_class"], sync_class)
+
+
+#######################################################################
@@ -0,0 +1,132 @@
+"""
+Tests for the benchmark result comparison.
+"""
+#######################################################################
+
+import io
+import json
+import os
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+
+from django.test import SimpleTestCase
+
+from ..benchmarks.runner import case_key, compare, format_result, main
+
+#######################################################################
+
+
+def make_result(dataset="wide", format="csv", size=1000, **measures):
+    result = {
+        "dataset": dataset,
+        "format": format,
+        "size": size,
+        "seconds": 1.0,
+        "peak_rss": 100 * 1024**2,
+        "queries": 3,
+        "bytes": 5000,
+        "rows": size,
+        "rows_per_second": size / 1.0,
+    }
+    result.update(measures)
+    return result
+
+
+def make_results(*results):
+    return {"meta": {}, "results": list(results)}
+
+
+#######################################################################
+
+
+class CompareTests(SimpleTestCase):
+    def test_no_regressions(self):
+        baseline = make_results(make_result(), make_result(format="json"))
+        current = make_results(
+            make_result(seconds=1.19, peak_rss=110 * 1024**2),
+            make_result(format="json", seconds=0.5, queries=2),
+        )
+        self.assertEqual(compare(baseline, current), [])
+
+    def test_seconds(self):
+        baseline = make_results(make_result())
+        current = make_results(make_result(seconds=1.25))
+        regressions = compare(baseline, current)
+        self.assertEqual(regressions, ["wide/csv/1000: seconds 1 -> 1.25 (+25%)"])
+        self.assertEqual(compare(baseline, current, threshold=0.3), [])
+
+    def test_peak_rss(self):
+        baseline = make_results(make_result())
+        current = make_results(make_result(peak_rss=150 * 1024**2))
+        regressions = compare(baseline, current)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith("wide/csv/1000: peak_rss"))
+        self.assertTrue(regressions[0].endswith("(+50%)"))
+
+    def test_queries(self):
+        # any extra query is a regression, whatever the threshold.
+        baseline = make_results(make_result())
+        current = make_results(make_result(queries=4))
+        self.assertEqual(
+            compare(baseline, current, threshold=10),
+            ["wide/csv/1000: queries 3 -> 4"],
+        )
+
+    def test_errors(self):
+        baseline = make_results(make_result(), make_result(format="pdf", error="X"))
+        current = make_results(
+            make_result(error="OSError: boom"),
+            make_result(format="pdf", seconds=100),
+        )
+        # errors are regressions; cases without a baseline are not compared.
+        self.assertEqual(compare(baseline, current), ["wide/csv/1000: OSError: boom"])
+
+    def test_new_cases(self):
+        baseline = make_results(make_result())
+        current = make_results(make_result(size=10000, seconds=100))
+        self.assertEqual(compare(baseline, current), [])
+
+    def test_format_result(self):
+        self.assertEqual(case_key(make_result()), "wide/csv/1000")
+        self.assertIn("queries", format_result(make_result()))
+        self.assertIn("boom", format_result(make_result(error="boom")))
+
+
+#######################################################################
+
+
+class CommandTests(SimpleTestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir)
+
+    def save(self, name, results):
+        filename = os.path.join(self.workdir, name)
+        with open(filename, "w") as fp:
+            json.dump(results, fp)
+        return filename
+
+    def run_compare(self, current, *args):
+        baseline = self.save("baseline.json", make_results(make_result()))
+        current = self.save("current.json", make_results(current))
+        output = io.StringIO()
+        with redirect_stdout(output):
+            status = main(["compare", baseline, current] + list(args))
+        return status, output.getvalue()
+
+    def test_compare(self):
+        status, output = self.run_compare(make_result(seconds=1.1))
+        self.assertEqual(status, 0)
+        self.assertIn("No regressions (threshold 20%)", output)
+
+    def test_compare_regression(self):
+        status, output = self.run_compare(
+            make_result(seconds=1.1), "--threshold", "0.05"
+        )
+        self.assertEqual(status, 1)
+        self.assertIn("Regressions (threshold 5%)", output)
+        self.assertIn("wide/csv/1000: seconds", output)
+
+
+#######################################################################
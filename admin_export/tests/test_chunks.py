@@ -0,0 +1,72 @@
+"""
+Tests for chunked (keyset paginated) iteration.
+"""
+#######################################################################
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from ..views import ExportSpreadsheet
+from .models import Book
+from .utils import ExportTestCase, get_content, read_csv
+
+#######################################################################
+
+
+class KeysetPaginationTests(ExportTestCase):
+    def iter_chunks(self, queryset, **options):
+        options.setdefault("chunk_size", 3)
+        progress = []
+        options["progress_callback"] = progress.append
+        view = self.make_view(ExportSpreadsheet, options=options, format="csv")
+        with CaptureQueriesContext(connection) as queries:
+            chunks = [[obj.pk for obj in chunk] for chunk in view.iter_chunks(queryset)]
+        return chunks, [q["sql"] for q in queries.captured_queries], progress
+
+    def test_chunks(self):
+        books = self.make_books(10)
+        pks = [b.pk for b in books]
+        chunks, queries, progress = self.iter_chunks(Book.objects.order_by("-title"))
+        self.assertEqual(chunks, [pks[0:3], pks[3:6], pks[6:9], pks[9:]])
+        self.assertEqual(progress, [3, 3, 3, 1])
+        self.assertEqual(len(queries), 4)
+        for sql in queries:
+            self.assertIn("LIMIT 3", sql)
+            self.assertNotIn("OFFSET", sql)
+        self.assertNotIn('"id" >', queries[0])
+        for sql in queries[1:]:
+            self.assertIn('"id" >', sql)
+
+    def test_exact_chunks(self):
+        books = self.make_books(6)
+        chunks, queries, progress = self.iter_chunks(Book.objects.all())
+        self.assertEqual(chunks, [[b.pk for b in books[:3]], [b.pk for b in books[3:]]])
+        self.assertEqual(len(queries), 3)
+
+    def test_empty(self):
+        chunks, queries, progress = self.iter_chunks(Book.objects.all())
+        self.assertEqual((chunks, len(queries), progress), ([], 1, []))
+
+    def test_without_keyset_pagination(self):
+        books = self.make_books(7)
+        chunks, queries, progress = self.iter_chunks(
+            Book.objects.order_by("pk"), keyset_pagination=False
+        )
+        self.assertEqual(chunks, [[b.pk for b in books[i : i + 3]] for i in (0, 3, 6)])
+        self.assertEqual(progress, [3, 3, 1])
+        self.assertNotIn('"id" >', queries[-1])
+
+    def test_export(self):
+        books = self.make_books(7)
+        rows = []
+        for options in [
+            {"chunk_size": 2},
+            {"chunk_size": 2, "values_fast_path": False},
+        ]:
+            options["export_fields"] = ["id"]
+            response = self.get(ExportSpreadsheet, options=options, format="csv")
+            rows.append([row[0] for row in read_csv(get_content(response))[1:]])
+        self.assertEqual(rows, [[str(b.pk) for b in books]] * 2)
+
+
+#######################################################################
@@ -0,0 +1,109 @@
+"""
+Tests for the columnar (parquet and arrow) exports.
+"""
+#######################################################################
+
+import io
+import unittest
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from ..views import ExportSpreadsheet
+from ..writers import get_formats
+from .models import Book
+from .utils import ExportTestCase, get_content
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+#######################################################################
+
+
+@unittest.skipIf(pa is None, "pyarrow is not installed")
+class ColumnarExportTests(ExportTestCase):
+    options = {
+        "export_fields": [
+            "id",
+            "title:Title",
+            "price",
+            "published",
+            "modified",
+            "author.name:Author",
+        ]
+    }
+
+    def setUp(self):
+        super(ColumnarExportTests, self).setUp()
+        self.books = self.make_books(5)
+        Book.objects.create(title="Anonymous", modified=self.modified)
+
+    def export(self, format, **options):
+        response = self.get(
+            ExportSpreadsheet, options=dict(self.options, **options), format=format
+        )
+        self.assertEqual(response.status_code, 200)
+        data = io.BytesIO(get_content(response))
+        if format == "parquet":
+            return pq.read_table(data)
+        return pa.ipc.open_file(data).read_all()
+
+    def test_formats(self):
+        self.assertIn("parquet", get_formats())
+        self.assertIn("arrow", get_formats())
+
+    def test_schema(self):
+        for format in ["parquet", "arrow"]:
+            table = self.export(format)
+            self.assertEqual(
+                table.schema.names,
+                ["ID", "Title", "Price", "Published", "Modified", "Author"],
+            )
+            types = [field.type for field in table.schema]
+            self.assertEqual(types[0], pa.int64())
+            self.assertEqual(types[1], pa.string())
+            self.assertEqual(types[2], pa.decimal128(8, 2))
+            self.assertEqual(types[3], pa.date32())
+            self.assertEqual(types[4], pa.timestamp("us", tz="UTC"))
+            self.assertEqual(types[5], pa.string())
+
+    def test_values(self):
+        for format in ["parquet", "arrow"]:
+            rows = self.export(format).to_pylist()
+            self.assertEqual(len(rows), 6)
+            self.assertEqual(rows[1]["Title"], "Book 1")
+            self.assertEqual(rows[1]["Price"], Decimal("11.00"))
+            self.assertEqual(rows[1]["Published"], date(2020, 1, 2))
+            self.assertEqual(rows[1]["Modified"], self.modified + timedelta(hours=1))
+            self.assertEqual(rows[1]["Author"], "Author 1")
+            # nulls are nulls, except in text columns.
+            self.assertIsNone(rows[5]["Price"])
+            self.assertIsNone(rows[5]["Published"])
+            self.assertEqual(rows[5]["Author"], "")
+
+    def test_column_names(self):
+        table = self.export("parquet", export_fields=["title", "title", "id:Title"])
+        self.assertEqual(table.schema.names, ["Title", "Title_2", "Title_3"])
+
+    def test_annotation(self):
+        table = self.export("arrow", export_fields=["id", "tag_count=Count(tags)"])
+        self.assertEqual(table.schema.field("Tag count").type, pa.int64())
+        self.assertEqual(table.column("Tag count").to_pylist(), [0, 1, 2, 0, 1, 0])
+
+    def test_batches(self):
+        pks = [b.pk for b in self.books]
+        with mock.patch("admin_export.writers.ArrowWriter.batch_size", 2):
+            response = self.get(
+                ExportSpreadsheet,
+                options={"export_fields": ["id"]},
+                format="parquet",
+            )
+            data = pq.ParquetFile(io.BytesIO(get_content(response)))
+        self.assertEqual(data.metadata.num_row_groups, 3)
+        self.assertEqual(data.read().column("ID").to_pylist()[:5], pks)
+
+
+#######################################################################
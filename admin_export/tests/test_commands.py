@@ -0,0 +1,169 @@
+"""
+Tests for the export_admin_data management command.
+"""
+#######################################################################
+
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+
+from ..management.commands import export_admin_data
+from ..management.commands.export_admin_data import iter_segments, parse_filters
+from ..views import ExportSpreadsheet
+from .models import Book
+from .utils import ExportTestCase, get_content, read_csv
+
+#######################################################################
+
+
+class ParseFiltersTests(SimpleTestCase):
+    def test_parse(self):
+        self.assertEqual(
+            parse_filters(
+                ["title=A=B", "pk__in=1,2", "price__range=1,5", "author__isnull=True"]
+            ),
+            {
+                "title": "A=B",
+                "pk__in": ["1", "2"],
+                "price__range": ["1", "5"],
+                "author__isnull": True,
+            },
+        )
+
+    def test_invalid(self):
+        for expression in ["title", "=A"]:
+            with self.assertRaises(CommandError):
+                parse_filters([expression])
+
+
+#######################################################################
+
+
+class ExportAdminDataTests(ExportTestCase):
+    def setUp(self):
+        super(ExportAdminDataTests, self).setUp()
+        self.books = self.make_books(10)
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir)
+        self.output = os.path.join(self.workdir, "books.out")
+
+    def call(self, *args, **options):
+        options.setdefault("user", "admin")
+        options.setdefault("output", self.output)
+        stdout = io.StringIO()
+        call_command(
+            "export_admin_data",
+            "admin_export_tests.Book",
+            *args,
+            stdout=stdout,
+            **options
+        )
+        return stdout.getvalue()
+
+    def read(self):
+        with open(self.output, "rb") as fp:
+            return fp.read()
+
+    def test_segments(self):
+        pks = [b.pk for b in self.books]
+        self.assertEqual(
+            list(iter_segments(Book.objects.all(), 4)),
+            [(None, pks[3]), (pks[3], pks[7]), (pks[7], pks[9])],
+        )
+        self.assertEqual(
+            list(iter_segments(Book.objects.all(), 5, pks[4])), [(pks[4], pks[9])]
+        )
+        self.assertEqual(list(iter_segments(Book.objects.none(), 5)), [])
+
+    def test_csv(self):
+        fields = "id,title,author.name"
+        output = self.call(fields=fields, checkpoint_rows=3)
+        self.assertEqual(output.strip(), "Exported 10 rows to {0}".format(self.output))
+        expected = get_content(
+            self.get(
+                ExportSpreadsheet,
+                options={"export_fields": fields.split(",")},
+                format="csv",
+            )
+        )
+        self.assertEqual(read_csv(self.read()), read_csv(expected))
+        self.assertFalse(os.path.exists(self.output + ".checkpoint"))
+
+    def test_filter(self):
+        self.call("--filter", "author__name=Author 1", fields="title", format="csv")
+        rows = read_csv(self.read())
+        self.assertEqual(rows, [["Title"], ["Book 1"], ["Book 4"], ["Book 7"]])
+
+    def test_json(self):
+        self.call(format="json", checkpoint_rows=3)
+        data = json.loads(self.read().decode("utf-8"))
+        self.assertEqual([d["pk"] for d in data], [b.pk for b in self.books])
+
+    def test_json_empty(self):
+        self.call("--filter", "title=None", format="json", checkpoint_rows=3)
+        self.assertEqual(json.loads(self.read().decode("utf-8")), [])
+
+    def test_xlsx(self):
+        output = self.call(format="xlsx", fields="id,title")
+        self.assertIn("Exported 10 rows", output)
+        self.assertTrue(self.read().startswith(b"PK"))
+        with self.assertRaises(CommandError):
+            self.call(format="xlsx", resume=True)
+
+    def test_resume(self):
+        render_shard = export_admin_data.render_shard
+        calls = []
+
+        def interrupted(task):
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            calls.append(task)
+            return render_shard(task)
+
+        with mock.patch.object(export_admin_data, "render_shard", interrupted):
+            with self.assertRaises(KeyboardInterrupt):
+                self.call(format="json", checkpoint_rows=3)
+        checkpoint = self.output + ".checkpoint"
+        with open(checkpoint) as fp:
+            state = json.load(fp)
+        self.assertEqual(state["rows"], 6)
+        self.assertEqual(state["last_pk"], self.books[5].pk)
+        # a partial segment, written after the checkpoint, is dropped.
+        with open(self.output, "ab") as fp:
+            fp.write(b', {"partial')
+
+        with self.assertRaises(CommandError):
+            self.call(format="json", checkpoint_rows=3, fields="id", resume=True)
+        output = self.call(format="json", checkpoint_rows=3, resume=True)
+        self.assertIn("Exported 10 rows", output)
+        data = json.loads(self.read().decode("utf-8"))
+        self.assertEqual([d["pk"] for d in data], [b.pk for b in self.books])
+        self.assertFalse(os.path.exists(checkpoint))
+
+    def test_permissions(self):
+        get_user_model().objects.create_user("staff", is_staff=True)
+        output = self.call(user="staff", format="csv")
+        self.assertIn("Exported 0 rows", output)
+
+    def test_errors(self):
+        for args, options in [
+            ((), {"user": "nobody"}),
+            ((), {"format": "junk"}),
+            (("--filter", "junk=1"), {}),
+            (("--filter", "pk=junk"), {}),
+        ]:
+            with self.assertRaises(CommandError):
+                self.call(*args, **options)
+        with self.assertRaises(CommandError):
+            call_command("export_admin_data", "junk.Model", user="admin")
+
+
+#######################################################################
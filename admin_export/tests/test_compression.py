@@ -0,0 +1,134 @@
+"""
+Tests for compressed exports.
+"""
+#######################################################################
+
+import gzip
+import json
+import unittest
+from unittest import mock
+
+from django.http import Http404
+from django.test import SimpleTestCase, override_settings
+
+from .. import compression
+from ..compression import iter_compressed, negotiate_encoding, parse_accept_encoding
+from ..views import ExportSerializer, ExportSpreadsheet
+from .utils import ExportTestCase, get_content
+
+#######################################################################
+
+
+def decompress(data, encoding):
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    return compression.zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+
+#######################################################################
+
+
+class NegotiationTests(SimpleTestCase):
+    def test_parse(self):
+        self.assertEqual(
+            parse_accept_encoding("gzip;q=0.5, x-gzip, BR ; q=0.8, zstd;q=junk"),
+            {"gzip": 1.0, "br": 0.8, "zstd": 0.0},
+        )
+
+    @mock.patch.object(compression, "zstandard", None)
+    def test_gzip(self):
+        self.assertEqual(negotiate_encoding("gzip, deflate"), "gzip")
+        self.assertEqual(negotiate_encoding("*"), "gzip")
+        self.assertEqual(negotiate_encoding("x-gzip"), "gzip")
+        self.assertIsNone(negotiate_encoding("zstd, br"))
+        self.assertIsNone(negotiate_encoding("gzip;q=0"))
+        self.assertIsNone(negotiate_encoding("*, gzip;q=0"))
+        self.assertIsNone(negotiate_encoding(""))
+        self.assertIsNone(negotiate_encoding(None))
+
+    @unittest.skipIf(compression.zstandard is None, "zstandard is not installed")
+    def test_zstd(self):
+        self.assertEqual(negotiate_encoding("gzip, zstd"), "zstd")
+        self.assertEqual(negotiate_encoding("*"), "zstd")
+        self.assertEqual(negotiate_encoding("gzip, zstd;q=0.5"), "gzip")
+
+    def test_iter_compressed(self):
+        chunks = [b"a,b\r\n", b"", b"1,2\r\n" * 1000]
+        for encoding in compression.get_encodings():
+            data = b"".join(iter_compressed(chunks, encoding))
+            self.assertEqual(decompress(data, encoding), b"".join(chunks))
+
+
+#######################################################################
+
+
+class CompressedExportTests(ExportTestCase):
+    options = {"export_fields": ["id", "title", "author.name"]}
+
+    def setUp(self):
+        super(CompressedExportTests, self).setUp()
+        self.make_books(10)
+
+    def export(self, view_class=ExportSpreadsheet, encoding=None, **kwargs):
+        meta = {"HTTP_ACCEPT_ENCODING": encoding} if encoding else None
+        return self.get(view_class, options=self.options, meta=meta, **kwargs)
+
+    def test_content_encoding(self):
+        plain = get_content(self.export(format="csv"))
+        for encoding in compression.get_encodings():
+            for stream in ["1", "0"]:
+                response = self.export(encoding=encoding, format="csv", stream=stream)
+                self.assertEqual(response["Content-Encoding"], encoding)
+                self.assertIn("Accept-Encoding", response["Vary"])
+                self.assertEqual(response.streaming, stream == "1")
+                data = decompress(get_content(response), encoding)
+                self.assertEqual(data, plain)
+
+    def test_serializer(self):
+        response = self.export(ExportSerializer, encoding="gzip", format="json")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        data = json.loads(gzip.decompress(get_content(response)))
+        self.assertEqual(len(data), 10)
+
+    def test_not_accepted(self):
+        response = self.export(format="csv")
+        self.assertNotIn("Content-Encoding", response)
+        self.assertIn("Accept-Encoding", response["Vary"])
+        response = self.export(encoding="br", format="csv")
+        self.assertNotIn("Content-Encoding", response)
+
+    def test_precompressed(self):
+        response = self.export(encoding="gzip", format="xlsx")
+        self.assertNotIn("Content-Encoding", response)
+
+    @override_settings(ADMIN_EXPORT_COMPRESSION=False)
+    def test_disabled(self):
+        response = self.export(encoding="gzip", format="csv")
+        self.assertNotIn("Content-Encoding", response)
+        self.assertFalse(response.has_header("Vary"))
+
+    def test_compressed_file(self):
+        plain = get_content(self.export(format="csv"))
+        response = self.export(encoding="gzip", format="csv", compress="gzip")
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertEqual(response["Filename"], "book_list.csv.gz")
+        self.assertEqual(
+            response["Content-Disposition"], "attachment; filename=book_list.csv.gz"
+        )
+        self.assertEqual(gzip.decompress(get_content(response)), plain)
+
+    @unittest.skipIf(compression.zstandard is None, "zstandard is not installed")
+    def test_compressed_file_zstd(self):
+        plain = get_content(self.export(format="xlsx", stream="0"))
+        response = self.export(format="xlsx", compress="zstd", stream="0")
+        self.assertEqual(response["Content-Type"], "application/zstd")
+        self.assertEqual(response["Filename"], "book_list.xlsx.zst")
+        self.assertEqual(decompress(get_content(response), "zstd"), plain)
+
+    def test_unsupported(self):
+        with self.assertRaises(Http404):
+            self.export(format="csv", compress="lzma")
+
+
+#######################################################################
@@ -0,0 +1,104 @@
+"""
+Tests for conditional (ETag and Last-Modified) exports.
+"""
+#######################################################################
+
+from datetime import timedelta
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
+
+from ..views import ExportSerializer, ExportSpreadsheet
+from .models import Book
+from .utils import ExportTestCase, get_content
+
+#######################################################################
+
+
+class ConditionalExportTests(ExportTestCase):
+    options = {"export_fields": ["id", "title"], "export_modified_field": "modified"}
+
+    def setUp(self):
+        super(ConditionalExportTests, self).setUp()
+        self.books = self.make_books(10)
+
+    def export(self, options=None, meta=None, **kwargs):
+        kwargs.setdefault("format", "csv")
+        return self.get(
+            ExportSpreadsheet, options=options or self.options, meta=meta, **kwargs
+        )
+
+    def test_validators(self):
+        response = self.export()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["ETag"].startswith('"'))
+        last_modified = self.modified + timedelta(hours=9)
+        self.assertEqual(
+            response["Last-Modified"], http_date(last_modified.timestamp())
+        )
+        self.assertEqual(self.export()["ETag"], response["ETag"])
+
+    def test_not_modified(self):
+        etag = self.export()["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.export(meta={"HTTP_IF_NONE_MATCH": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(get_content(response), b"")
+        # the data version query, but not the export.
+        self.assertEqual(len(queries), 1)
+
+    def test_if_modified_since(self):
+        last_modified = self.export()["Last-Modified"]
+        response = self.export(meta={"HTTP_IF_MODIFIED_SINCE": last_modified})
+        self.assertEqual(response.status_code, 304)
+
+    def test_updated(self):
+        etag = self.export()["ETag"]
+        Book.objects.filter(pk=self.books[3].pk).update(
+            title="Updated", modified=self.modified + timedelta(days=1)
+        )
+        response = self.export(meta={"HTTP_IF_NONE_MATCH": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertIn(b"Updated", get_content(response))
+
+    def test_deleted(self):
+        etag = self.export()["ETag"]
+        self.books[3].delete()
+        response = self.export(meta={"HTTP_IF_NONE_MATCH": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_variants(self):
+        # each representation has its own validator.
+        etags = {
+            self.export()["ETag"],
+            self.export(format="xlsx")["ETag"],
+            self.export(query=str(self.books[0].pk))["ETag"],
+            self.export(meta={"HTTP_ACCEPT_ENCODING": "gzip"})["ETag"],
+            self.export(
+                options=dict(self.options, export_fields=["id"]),
+            )["ETag"],
+            self.get(ExportSerializer, options=self.options, format="json")["ETag"],
+        }
+        self.assertEqual(len(etags), 6)
+
+    def test_unversioned(self):
+        # without a modified field, updates in place would be missed.
+        response = self.export(options={"export_fields": ["id", "title"]})
+        self.assertNotIn("ETag", response)
+        self.assertNotIn("Last-Modified", response)
+
+    def test_disabled(self):
+        response = self.export(options=dict(self.options, export_conditional=False))
+        self.assertNotIn("ETag", response)
+        with override_settings(ADMIN_EXPORT_CONDITIONAL=False):
+            self.assertNotIn("ETag", self.export())
+            response = self.export(options=dict(self.options, export_conditional=True))
+            self.assertIn("ETag", response)
+
+
+#######################################################################
@@ -0,0 +1,166 @@
+"""
+Tests for typed cell conversion.
+"""
+#######################################################################
+
+import io
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db.models import Count
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+
+from .. import converters
+from ..annotations import get_output_fields
+from ..views import ExportSpreadsheet
+from ..writers import XLSXWriter, get_writer_class
+from .models import Author, Book
+from .utils import ExportTestCase, get_content, read_csv
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+#######################################################################
+
+
+class CellTypeTests(SimpleTestCase):
+    def test_model_fields(self):
+        fields = [
+            "id",
+            "title:Title:none",
+            "price",
+            "published",
+            "modified",
+            "binding",
+            "author",
+            "author.name",
+            "author.id",
+            "tag_list",
+            "missing",
+        ]
+        self.assertEqual(
+            converters.get_cell_types(Book, fields),
+            [
+                converters.INT,
+                converters.STR,
+                converters.DECIMAL,
+                converters.DATE,
+                converters.DATETIME,
+                converters.STR,
+                None,  # a relation
+                converters.STR,
+                converters.INT,
+                None,  # a method
+                None,
+            ],
+        )
+
+    def test_annotations(self):
+        output_fields = get_output_fields(Author, [("book_count", Count("books"))])
+        self.assertEqual(
+            converters.get_cell_types(Author, ["name", "book_count"], output_fields),
+            [converters.STR, converters.INT],
+        )
+
+    def test_get_converters(self):
+        cell_types = [converters.INT, None, converters.DATE]
+        self.assertEqual(
+            converters.get_converters(cell_types, converters.SPREADSHEET_CONVERTERS),
+            [converters.to_native, converters.force_str, converters.to_native],
+        )
+        self.assertEqual(
+            converters.get_converters(cell_types, converters.NATIVE_CONVERTERS),
+            [None, None, None],
+        )
+
+    def test_to_text(self):
+        self.assertEqual(converters.to_text("abc"), "abc")
+        self.assertEqual(converters.to_text(12), "12")
+
+    def test_to_native(self):
+        self.assertEqual(converters.to_native(12), 12)
+        self.assertIsNone(converters.to_native(""))
+        self.assertIsNone(converters.to_native("none"))
+
+    @override_settings(TIME_ZONE="America/Regina")
+    def test_to_naive_datetime(self):
+        value = datetime(2020, 1, 1, 12, tzinfo=timezone.utc)
+        self.assertEqual(converters.to_naive_datetime(value), datetime(2020, 1, 1, 6))
+        self.assertEqual(
+            converters.to_naive_datetime(datetime(2020, 1, 1)), datetime(2020, 1, 1)
+        )
+        self.assertIsNone(converters.to_naive_datetime(""))
+
+
+#######################################################################
+
+
+class TypedExportTests(ExportTestCase):
+    options = {
+        "export_fields": [
+            "id",
+            "title",
+            "price",
+            "published",
+            "modified",
+            "get_binding_display",
+            "author.name",
+        ]
+    }
+
+    def setUp(self):
+        super(TypedExportTests, self).setUp()
+        self.books = self.make_books(3)
+        Book.objects.create(title="Anonymous", modified=self.modified)
+
+    def export(self, format, **kwargs):
+        response = self.get(
+            ExportSpreadsheet, options=self.options, format=format, **kwargs
+        )
+        self.assertEqual(response.status_code, 200)
+        return get_content(response)
+
+    def test_csv(self):
+        rows = read_csv(self.export("csv"))
+        self.assertEqual(
+            rows[2],
+            [
+                str(self.books[1].pk),
+                "Book 1",
+                "11.00",
+                "2020-01-02",
+                "2020-01-01 01:00:00+00:00",
+                "Paperback",
+                "Author 1",
+            ],
+        )
+        self.assertEqual(rows[4][2:4], ["", ""])
+
+    @unittest.skipIf(
+        openpyxl is None or get_writer_class("xlsx") is not XLSXWriter,
+        "openpyxl is not installed",
+    )
+    def test_xlsx(self):
+        workbook = openpyxl.load_workbook(io.BytesIO(self.export("xlsx")))
+        rows = list(workbook.active.iter_rows(values_only=True))
+        self.assertEqual(len(rows), 5)
+        row = rows[2]
+        self.assertEqual(row[0], self.books[1].pk)
+        self.assertEqual(row[1], "Book 1")
+        self.assertEqual(Decimal(str(row[2])), Decimal("11.00"))
+        # dates are dates, and datetimes are naive, in the current time zone.
+        self.assertEqual(row[3], datetime(2020, 1, 2))
+        self.assertEqual(
+            row[4], timezone.make_naive(self.modified + timedelta(hours=1))
+        )
+        self.assertEqual(row[5:], ("Paperback", "Author 1"))
+        # nulls are empty cells, in typed columns.
+        self.assertEqual(rows[4][1:4], ("Anonymous", None, None))
+        self.assertEqual(rows[4][4], timezone.make_naive(self.modified))
+
+
+#######################################################################
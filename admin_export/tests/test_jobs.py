@@ -0,0 +1,160 @@
+"""
+Tests for background export jobs.
+"""
+#######################################################################
+
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..jobs import (
+    claim_next_job,
+    enqueue_export,
+    expire_jobs,
+    requeue_stale_jobs,
+    run_job,
+)
+from ..models import ExportJob
+from .models import Book
+from .utils import ExportTestCase, read_csv
+
+#######################################################################
+
+
+class JobTests(ExportTestCase):
+    def enqueue(self, queryset=None, format="csv"):
+        request = self.make_request(format=format)
+        query_string = "contenttype={0}&format={1}".format(
+            request.GET["contenttype"], format
+        )
+        if queryset is None:
+            queryset = Book.objects.all()
+        return enqueue_export(
+            request, queryset, reverse("admin_export_spreadsheet"), query_string
+        )
+
+    def run_next_job(self):
+        job = run_job(claim_next_job())
+        if job.file:
+            self.addCleanup(job.file.delete, save=False)
+        return ExportJob.objects.get(pk=job.pk)
+
+    def make_stale(self, job, **updates):
+        heartbeat = timezone.now() - timedelta(seconds=601)
+        ExportJob.objects.filter(pk=job.pk).update(heartbeat=heartbeat, **updates)
+
+    def test_run_job(self):
+        books = self.make_books(5)
+        job = self.enqueue(Book.objects.filter(pk__in=[b.pk for b in books[:3]]))
+        self.assertEqual(job.status, ExportJob.QUEUED)
+        job = self.run_next_job()
+        self.assertEqual(job.status, ExportJob.DONE, job.error)
+        self.assertEqual((job.rows_done, job.rows_total), (3, 3))
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.filename, "book_list.csv")
+        with job.file.open("rb") as fp:
+            rows = read_csv(fp.read())
+        self.assertEqual([row[0] for row in rows[1:]], [str(b.pk) for b in books[:3]])
+
+    def test_status_and_download(self):
+        self.make_books(2)
+        self.enqueue()
+        job = self.run_next_job()
+        self.client.force_login(self.user)
+        status = self.client.get(
+            reverse("admin_export_job_status", kwargs={"pk": job.pk})
+        ).json()
+        self.assertEqual(status["status"], ExportJob.DONE)
+        response = self.client.get(status["download"])
+        self.assertEqual(len(read_csv(b"".join(response.streaming_content))), 3)
+
+    def test_claim(self):
+        first, second = self.enqueue(), self.enqueue()
+        self.assertEqual(claim_next_job().pk, first.pk)
+        self.assertEqual(claim_next_job().pk, second.pk)
+        self.assertIsNone(claim_next_job())
+        first.refresh_from_db()
+        self.assertEqual(first.status, ExportJob.RUNNING)
+        self.assertIsNotNone(first.heartbeat)
+
+    def test_requeue_stale(self):
+        job = self.enqueue()
+        claim_next_job()
+        self.assertEqual(requeue_stale_jobs(), 0)
+        self.make_stale(job)
+        self.assertEqual(requeue_stale_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.QUEUED)
+        self.assertIsNone(job.heartbeat)
+        self.assertEqual(claim_next_job().attempts, 2)
+
+    def test_too_many_attempts(self):
+        job = self.enqueue()
+        claim_next_job()
+        self.make_stale(job, attempts=3)
+        self.assertEqual(requeue_stale_jobs(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.FAILED)
+        self.assertTrue(job.error)
+
+    def test_late_finish(self):
+        self.make_books(2)
+        self.enqueue()
+        job = claim_next_job()
+        # given up on, and queued again, while running.
+        self.make_stale(job)
+        requeue_stale_jobs()
+        media_root = tempfile.mkdtemp(prefix="admin_export-tests-")
+        self.addCleanup(shutil.rmtree, media_root)
+        with self.settings(MEDIA_ROOT=media_root):
+            run_job(job)
+        self.assertEqual([files for d, ds, files in os.walk(media_root) if files], [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.QUEUED)
+        self.assertFalse(job.file)
+
+    def finish(self, job, status=ExportJob.DONE, age=0):
+        job.file.save("export.csv", ContentFile(b"id\n"), save=False)
+        self.addCleanup(job.file.delete, save=False)
+        job.status = status
+        job.finished = timezone.now() - timedelta(seconds=age)
+        job.save()
+        return job
+
+    def test_expire_jobs(self):
+        week = 7 * 24 * 60 * 60
+        old = self.finish(self.enqueue(), age=week + 1)
+        failed = self.finish(self.enqueue(), ExportJob.FAILED, age=week + 1)
+        recent = self.finish(self.enqueue(), age=week - 60)
+        queued = self.enqueue()
+        with self.settings(ADMIN_EXPORT_JOB_EXPIRY=None):
+            self.assertEqual(expire_jobs(), 0)
+        self.assertEqual(expire_jobs(), 2)
+        self.assertFalse(default_storage.exists(old.file.name))
+        self.assertFalse(default_storage.exists(failed.file.name))
+        self.assertTrue(default_storage.exists(recent.file.name))
+        self.assertEqual(
+            set(ExportJob.objects.values_list("pk", flat=True)), {recent.pk, queued.pk}
+        )
+
+    @override_settings(ADMIN_EXPORT_JOB_EXPIRY=60)
+    def test_command(self):
+        self.make_books(2)
+        old = self.finish(self.enqueue(), age=61)
+        job = self.enqueue()
+        call_command("run_export_jobs", verbosity=0)
+        self.assertFalse(ExportJob.objects.filter(pk=old.pk).exists())
+        job.refresh_from_db()
+        self.addCleanup(job.file.delete, save=False)
+        self.assertEqual(job.status, ExportJob.DONE, job.error)
+
+
+#######################################################################
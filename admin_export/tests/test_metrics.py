@@ -0,0 +1,126 @@
+"""
+Tests for the export instrumentation.
+"""
+#######################################################################
+
+from django.test import override_settings
+
+from .. import metrics
+from ..signals import export_finished
+from ..views import ExportSpreadsheet
+from .utils import ExportTestCase, get_content
+
+#######################################################################
+
+emitted = []
+
+
+def record_sink(result):
+    emitted.append(("function", result))
+
+
+class RecordSink(metrics.MetricsSink):
+    def emit(self, result):
+        emitted.append(("class", result))
+
+
+def failing_sink(result):
+    raise RuntimeError("sink failed")
+
+
+SINKS = [
+    "admin_export.tests.test_metrics.failing_sink",
+    "admin_export.tests.test_metrics.record_sink",
+    "admin_export.tests.test_metrics.RecordSink",
+]
+
+#######################################################################
+
+
+class MetricsTests(ExportTestCase):
+    options = {"export_fields": ["id", "title", "author.name"]}
+
+    def setUp(self):
+        super(MetricsTests, self).setUp()
+        self.make_books(10)
+        self.received = []
+        export_finished.connect(self.receiver)
+        self.addCleanup(export_finished.disconnect, self.receiver)
+        del emitted[:]
+
+    def receiver(self, sender, view, request, metrics, **kwargs):
+        self.received.append((sender, request, metrics))
+
+    def export(self, **kwargs):
+        kwargs.setdefault("format", "csv")
+        return self.get(ExportSpreadsheet, options=self.options, **kwargs)
+
+    def test_metrics(self):
+        response = self.export(stream="0")
+        self.assertEqual(len(self.received), 1)
+        sender, request, result = self.received[0]
+        self.assertIs(sender, ExportSpreadsheet)
+        self.assertEqual(request.user, self.user)
+        self.assertEqual(result["view"], "admin_export.views.ExportSpreadsheet")
+        self.assertEqual(result["model"], "admin_export_tests.Book")
+        self.assertEqual(result["format"], "csv")
+        self.assertEqual(result["user"], self.user.pk)
+        self.assertEqual(result["rows"], 10)
+        self.assertGreater(result["queries"], 0)
+        self.assertEqual(
+            list(result["phases"]),
+            ["plan", "cache", "query", "rows", "shards", "encode", "write"],
+        )
+        self.assertGreaterEqual(result["total"], sum(result["phases"].values()) - 1e-6)
+        timing = response["Server-Timing"]
+        self.assertIn("total;dur=", timing)
+        self.assertIn('desc="10 rows, {0} queries"'.format(result["queries"]), timing)
+
+    def test_streaming(self):
+        response = self.export()
+        self.assertTrue(response.streaming)
+        self.assertIn("Server-Timing", response)
+        self.assertEqual(self.received, [])  # nothing is exported yet.
+        get_content(response)
+        self.assertEqual(len(self.received), 1)
+        self.assertEqual(self.received[0][2]["rows"], 10)
+        response.close()
+        self.assertEqual(len(self.received), 1)
+
+    def test_abandoned(self):
+        response = self.export()
+        response.close()
+        self.assertEqual(len(self.received), 1)
+        self.assertEqual(self.received[0][2]["rows"], 0)
+
+    def test_log(self):
+        with self.assertLogs("admin_export.metrics", "INFO") as logs:
+            self.export(stream="0")
+        (record,) = logs.records
+        self.assertEqual(record.export_metrics["rows"], 10)
+        self.assertIn(
+            "Exported 10 admin_export_tests.Book rows as csv", record.getMessage()
+        )
+
+    def test_sinks(self):
+        with override_settings(ADMIN_EXPORT_METRICS_SINKS=SINKS):
+            with self.assertLogs("admin_export.metrics", "ERROR") as logs:
+                self.export(stream="0")
+        self.assertIn("sink failed", logs.output[0])
+        self.assertEqual([kind for kind, result in emitted], ["function", "class"])
+        self.assertEqual(emitted[0][1], self.received[0][2])
+
+    @override_settings(ADMIN_EXPORT_SERVER_TIMING=False)
+    def test_no_server_timing(self):
+        response = self.export(stream="0")
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(len(self.received), 1)
+
+    @override_settings(ADMIN_EXPORT_METRICS=False)
+    def test_disabled(self):
+        response = self.export(stream="0")
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(self.received, [])
+
+
+#######################################################################
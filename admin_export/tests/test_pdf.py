@@ -0,0 +1,73 @@
+"""
+Tests for the PDF export pipeline; LaTeX is stubbed out (see the
+``ADMIN_EXPORT_LATEX_COMPILER`` test setting).
+"""
+#######################################################################
+
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+from ..pdf import LaTeXError, compile_latex, latex_escape
+from ..views import ExportPDF
+from .utils import ExportTestCase, get_content
+
+#######################################################################
+
+
+class PDFExportTests(ExportTestCase):
+    options = {"export_fields": ["id", "title"]}
+
+    def test_pdf(self):
+        books = self.make_books(3)
+        response = self.get(ExportPDF, options=self.options)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        content = get_content(response).decode("utf-8")
+        self.assertTrue(content.startswith("%PDF"))
+        for book in books:
+            self.assertIn("{0} & {1} \\\\".format(book.pk, book.title), content)
+
+    @override_settings(ADMIN_EXPORT_PDF_SEGMENT_ROWS=2)
+    def test_segments(self):
+        self.make_books(5)
+        response = self.get(ExportPDF, options=self.options)
+        content = get_content(response).decode("utf-8")
+        # the joining document, of three segments.
+        self.assertEqual(content.count("\\includepdf"), 3)
+        self.assertIn("segment-00002.pdf", content)
+
+
+class LaTeXTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="admin_export-tests-")
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.tex_path = os.path.join(self.directory, "test.tex")
+        with open(self.tex_path, "w") as fp:
+            fp.write("\\documentclass{article}\n")
+
+    def test_escape(self):
+        self.assertEqual(latex_escape("50% of $5 & #1_a"), r"50\% of \$5 \& \#1\_a")
+
+    def test_stub_compiler(self):
+        path = compile_latex(self.tex_path)
+        self.assertEqual(path, os.path.join(self.directory, "test.pdf"))
+
+    @override_settings(
+        ADMIN_EXPORT_LATEX_COMPILER=None,
+        ADMIN_EXPORT_LATEX_COMMAND="admin-export-no-such-latex",
+    )
+    def test_missing_compiler(self):
+        with self.assertRaises(LaTeXError):
+            compile_latex(self.tex_path)
+
+    @override_settings(
+        ADMIN_EXPORT_LATEX_COMPILER=None, ADMIN_EXPORT_LATEX_COMMAND="false"
+    )
+    def test_failed_compile(self):
+        with self.assertRaises(LaTeXError):
+            compile_latex(self.tex_path)
+
+
+#######################################################################
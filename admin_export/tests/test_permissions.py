@@ -0,0 +1,150 @@
+"""
+Tests for the permission filtering of exports.
+"""
+#######################################################################
+
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from ..permissions import filter_queryset, get_permission_scope
+from ..views import ExportSpreadsheet
+from .models import Book
+from .utils import ExportTestCase, get_content, read_csv
+
+try:
+    from guardian.shortcuts import assign_perm
+except ImportError:
+    assign_perm = None
+
+#######################################################################
+
+
+class PermissionTestCase(ExportTestCase):
+    def setUp(self):
+        super(PermissionTestCase, self).setUp()
+        self.books = self.make_books(10)
+        self.staff = get_user_model().objects.create_user("staff", is_staff=True)
+        self.group = Group.objects.create(name="editors")
+
+    def exported(self, user):
+        response = self.get(
+            ExportSpreadsheet,
+            user=user,
+            options={"export_fields": ["title"]},
+            format="csv",
+        )
+        return [row[0] for row in read_csv(get_content(response))[1:]]
+
+    def titles(self, *indexes):
+        return [self.books[i].title for i in indexes]
+
+    def get_user(self, user):
+        # a fresh instance, without django's permission caches.
+        return get_user_model().objects.get(pk=user.pk)
+
+
+#######################################################################
+
+
+class ModelPermissionTests(PermissionTestCase):
+    def test_superuser(self):
+        self.assertEqual(self.exported(self.user), self.titles(*range(10)))
+
+    def test_no_permission(self):
+        self.assertEqual(self.exported(self.staff), [])
+
+    def test_model_permission(self):
+        permission = Permission.objects.get(codename="change_book")
+        self.staff.user_permissions.add(permission)
+        self.assertEqual(
+            self.exported(self.get_user(self.staff)), self.titles(*range(10))
+        )
+
+    def test_group_permission(self):
+        self.group.permissions.add(Permission.objects.get(codename="change_book"))
+        self.staff.groups.add(self.group)
+        self.assertEqual(
+            self.exported(self.get_user(self.staff)), self.titles(*range(10))
+        )
+
+    def test_cache(self):
+        scope = get_permission_scope(self.staff, Book)
+        self.assertFalse(scope.all)
+        self.assertIs(get_permission_scope(self.staff, Book), scope)
+        # granting a permission clears the cache.
+        self.staff.user_permissions.add(Permission.objects.get(codename="change_book"))
+        self.assertTrue(get_permission_scope(self.get_user(self.staff), Book).all)
+
+    def test_cache_login(self):
+        scope = get_permission_scope(self.staff, Book)
+        self.staff.save(update_fields=["last_login"])
+        self.assertIs(get_permission_scope(self.staff, Book), scope)
+        self.staff.save()
+        self.assertIsNot(get_permission_scope(self.staff, Book), scope)
+
+    @override_settings(ADMIN_EXPORT_PERMISSION_CACHE_TIMEOUT=0)
+    def test_no_cache(self):
+        scope = get_permission_scope(self.staff, Book)
+        self.assertIsNot(get_permission_scope(self.staff, Book), scope)
+
+
+#######################################################################
+
+
+@unittest.skipIf(assign_perm is None, "django-guardian is not installed")
+class ObjectPermissionTests(PermissionTestCase):
+    def test_user_permissions(self):
+        for i in [1, 4]:
+            assign_perm("change_book", self.staff, self.books[i])
+        assign_perm("view_book", self.staff, self.books[5])  # not exportable
+        self.assertEqual(self.exported(self.staff), self.titles(1, 4))
+
+    def test_group_permissions(self):
+        self.staff.groups.add(self.group)
+        assign_perm("change_book", self.group, self.books[2])
+        assign_perm("change_book", self.staff, self.books[2])
+        assign_perm("change_book", self.staff, self.books[7])
+        # rows permitted both ways are exported once.
+        self.assertEqual(self.exported(self.staff), self.titles(2, 7))
+
+    def test_other_users(self):
+        other = get_user_model().objects.create_user("other", is_staff=True)
+        assign_perm("change_book", other, self.books[3])
+        self.assertEqual(self.exported(self.staff), [])
+        self.assertEqual(self.exported(other), self.titles(3))
+
+    def test_group_membership(self):
+        assign_perm("change_book", self.group, self.books[6])
+        self.assertEqual(self.exported(self.staff), [])
+        # joining a group clears the cached scope.
+        self.staff.groups.add(self.group)
+        self.assertEqual(self.exported(self.staff), self.titles(6))
+
+    def test_exists_subquery(self):
+        # object permissions are checked in the export query, however
+        # many there are.
+        self.staff.groups.add(self.group)
+        assign_perm("change_book", self.group, self.books[0])
+        scope = get_permission_scope(self.staff, Book)
+        queryset = filter_queryset(Book.objects.all(), scope)
+        self.assertIn("EXISTS", str(queryset.query).upper())
+
+        def count_queries():
+            get_permission_scope(self.staff, Book)  # cached
+            with CaptureQueriesContext(connection) as queries:
+                self.exported(self.staff)
+            return len(queries)
+
+        before = count_queries()
+        for book in self.books[1:]:
+            assign_perm("change_book", self.staff, book)
+        self.assertEqual(count_queries(), before)
+        self.assertEqual(self.exported(self.staff), self.titles(*range(10)))
+
+
+#######################################################################
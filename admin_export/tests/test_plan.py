@@ -0,0 +1,114 @@
+"""
+Tests for export plans.
+"""
+#######################################################################
+
+from django.http import Http404
+from django.test import override_settings
+
+from .. import plan
+from ..views import ExportPDF, ExportSerializer, ExportSpreadsheet
+from .models import Author
+from .utils import ExportTestCase, get_content, read_csv
+
+#######################################################################
+
+
+class ExportPlanTests(ExportTestCase):
+    options = {"export_fields": ["id", "title", "author.name"]}
+
+    def make_plan(self, view_class=ExportSpreadsheet, **kwargs):
+        return self.make_view(view_class, options=self.options, **kwargs).get_plan()
+
+    def test_plan(self):
+        export_plan = self.make_plan(format="csv")
+        self.assertEqual(export_plan.format, "csv")
+        self.assertEqual(export_plan.fields, ("id", "title", "author.name"))
+        self.assertEqual(export_plan.labels, ("ID", "Title", "Name"))
+        self.assertEqual(export_plan.related_lookups, (("author",), ()))
+        self.assertIsNone(export_plan.template)
+
+    def test_plan_is_cached(self):
+        export_plan = self.make_plan(format="csv")
+        self.assertIs(self.make_plan(format="csv"), export_plan)
+        self.assertIsNot(self.make_plan(format="xlsx"), export_plan)
+        self.assertIsNot(self.make_plan(format="csv", model=Author), export_plan)
+        self.assertIsNot(self.make_plan(ExportPDF), export_plan)
+
+    def test_cache_key_has_fields(self):
+        export_plan = self.make_plan(format="csv")
+        view = self.make_view(
+            ExportSpreadsheet, options={"export_fields": ["id"]}, format="csv"
+        )
+        self.assertEqual(view.get_plan().fields, ("id",))
+        self.assertIs(self.make_plan(format="csv"), export_plan)
+
+    @override_settings(DEBUG=True)
+    def test_not_cached_when_debugging(self):
+        self.assertIsNot(self.make_plan(format="csv"), self.make_plan(format="csv"))
+        self.assertEqual(len(plan._plan_cache), 0)
+
+    @override_settings(ADMIN_EXPORT_PLAN_CACHE_SIZE=2)
+    def test_cache_is_bounded(self):
+        csv_plan = self.make_plan(format="csv")
+        self.make_plan(format="xlsx")
+        self.assertIs(self.make_plan(format="csv"), csv_plan)
+        self.make_plan(ExportSerializer, format="json")
+        self.assertEqual(len(plan._plan_cache), 2)
+        # xlsx was the least recently used.
+        self.assertIs(self.make_plan(format="csv"), csv_plan)
+        self.assertEqual(len(plan._template_cache), 2)
+
+    def test_unsupported_format(self):
+        for view_class in [ExportSpreadsheet, ExportSerializer]:
+            for format in ["junk", "python"]:
+                with self.assertRaises(Http404):
+                    self.make_plan(view_class, format=format)
+        self.assertEqual(len(plan._plan_cache), 0)
+
+    def test_unsupported_format_response(self):
+        self.make_books(1)
+        for view_class in [ExportSpreadsheet, ExportSerializer]:
+            with self.assertRaises(Http404):
+                self.get(view_class, format="junk")
+        self.assertEqual(len(plan._plan_cache), 0)
+
+    def test_template_format(self):
+        books = self.make_books(2)
+        with self.settings(
+            TEMPLATES=[
+                {
+                    "BACKEND": "django.template.backends.django.DjangoTemplates",
+                    "OPTIONS": {
+                        "loaders": [
+                            (
+                                "django.template.loaders.locmem.Loader",
+                                {
+                                    "admin/admin_export_tests/book/export.tsv": (
+                                        "{% for book in object_list %}"
+                                        "{{ book.pk }}\t{{ book.title }}\n"
+                                        "{% endfor %}"
+                                    )
+                                },
+                            )
+                        ]
+                    },
+                }
+            ]
+        ):
+            response = self.get(ExportSpreadsheet, format="tsv")
+            content = get_content(response.render())
+        self.assertEqual(
+            [row.split("\t") for row in content.decode("utf-8").splitlines()],
+            [[str(b.pk), b.title] for b in books],
+        )
+
+    def test_export_uses_plan(self):
+        books = self.make_books(2)
+        response = self.get(ExportSpreadsheet, options=self.options, format="csv")
+        rows = read_csv(get_content(response))
+        self.assertEqual(rows[1], [str(books[0].pk), books[0].title, "Author 0"])
+        self.assertEqual(len(plan._plan_cache), 1)
+
+
+#######################################################################
@@ -0,0 +1,76 @@
+"""
+Tests for the related lookups of exports.
+"""
+#######################################################################
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from ..views import ExportSpreadsheet
+from .models import Author, Book
+from .utils import ExportTestCase, get_content, model_admin, read_csv
+
+#######################################################################
+
+
+class RelatedLookupTests(ExportTestCase):
+    def count_queries(self, options, model=Book):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(ExportSpreadsheet, model, options, format="csv")
+            rows = read_csv(get_content(response))
+        return len(queries), rows
+
+    def test_inferred(self):
+        view = self.make_view(
+            ExportSpreadsheet,
+            options={"export_fields": ["title", "author.name", "tags.count"]},
+            format="csv",
+        )
+        self.assertEqual(view.get_related_lookups(), (["author"], ["tags"]))
+        view = self.make_view(
+            ExportSpreadsheet,
+            Author,
+            options={"export_fields": ["name", "books.count"]},
+            format="csv",
+        )
+        self.assertEqual(view.get_related_lookups(), ([], ["books"]))
+
+    def test_queries_do_not_grow_with_rows(self):
+        options = {
+            "export_fields": ["title", "author.name"],
+            "values_fast_path": False,
+        }
+        self.make_books(3)
+        few, rows = self.count_queries(options)
+        self.assertEqual(len(rows), 4)
+        self.make_books(9)
+        many, rows = self.count_queries(options)
+        self.assertEqual(len(rows), 13)
+        self.assertEqual(few, many)
+
+    def test_view_option(self):
+        options = {
+            "export_fields": ["title", "tag_list"],
+            "export_prefetch_related": ["tags"],
+        }
+        view = self.make_view(ExportSpreadsheet, options=options, format="csv")
+        self.assertEqual(view.get_plan().related_lookups, ((), ("tags",)))
+        self.make_books(3)
+        few, rows = self.count_queries(options)
+        self.assertEqual(rows[-1], ["Book 2", "Tag 0, Tag 1"])
+        self.make_books(9)
+        self.assertEqual(self.count_queries(options)[0], few)
+
+    def test_model_admin_option(self):
+        options = {"export_fields": ["title", "tag_list"]}
+        view = self.make_view(ExportSpreadsheet, options=options, format="csv")
+        self.assertEqual(view.get_plan().related_lookups, ((), ()))
+        with model_admin(Book, export_prefetch_related=["tags"]):
+            view = self.make_view(ExportSpreadsheet, options=options, format="csv")
+            self.assertEqual(view.get_plan().related_lookups, ((), ("tags",)))
+        with model_admin(Book, export_select_related=["author"]):
+            view = self.make_view(ExportSpreadsheet, options=options, format="csv")
+            self.assertEqual(view.get_plan().related_lookups, (("author",), ()))
+
+
+#######################################################################
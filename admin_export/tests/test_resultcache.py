@@ -0,0 +1,129 @@
+"""
+Tests for the export result cache.
+"""
+#######################################################################
+
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.test import SimpleTestCase, override_settings
+
+from ..resultcache import ExportResultCache
+from ..views import ExportCacheStats, ExportSpreadsheet
+from .utils import ExportTestCase, get_content, read_csv
+
+#######################################################################
+
+
+def make_directory(test):
+    directory = tempfile.mkdtemp(prefix="admin_export-tests-")
+    test.addCleanup(shutil.rmtree, directory)
+    return directory
+
+
+class ResultCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = ExportResultCache(make_directory(self), 10)
+
+    def put(self, key, data, mtime=None):
+        fp = self.cache.open_entry()
+        with fp:
+            fp.write(data)
+        self.cache.commit(key, fp, [["Content-Type", "text/csv"]])
+        if mtime is not None:
+            os.utime(os.path.join(self.cache.directory, key), (mtime, mtime))
+
+    def test_make_key(self):
+        key = ExportResultCache.make_key("a", [1, 2], {"b": 3})
+        self.assertEqual(key, ExportResultCache.make_key("a", [1, 2], {"b": 3}))
+        self.assertNotEqual(key, ExportResultCache.make_key("a", [2, 1], {"b": 3}))
+
+    def test_get(self):
+        self.assertIsNone(self.cache.get("a"))
+        self.put("a", b"1234")
+        data, headers = self.cache.get("a")
+        with data:
+            self.assertEqual(data.read(), b"1234")
+        self.assertEqual(headers, [["Content-Type", "text/csv"]])
+        self.assertEqual(
+            self.cache.stats(),
+            {"hits": 1, "misses": 1, "entries": 1, "size": 4, "max_size": 10},
+        )
+
+    def test_eviction(self):
+        self.put("a", b"1234", mtime=1000)
+        self.put("b", b"1234", mtime=3000)
+        self.put("c", b"1234", mtime=2000)
+        # a, the least recently used, is evicted.
+        self.assertIsNone(self.cache.get("a"))
+        self.assertIsNotNone(self.cache.get("b"))
+        self.assertIsNotNone(self.cache.get("c"))
+
+    def test_discard(self):
+        fp = self.cache.open_entry()
+        fp.write(b"partial")
+        self.cache.discard(fp)
+        self.assertEqual(os.listdir(self.cache.directory), [])
+
+
+class CachedExportTests(ExportTestCase):
+    options = {"export_fields": ["id", "title"], "export_modified_field": "modified"}
+
+    def setUp(self):
+        super(CachedExportTests, self).setUp()
+        settings = override_settings(ADMIN_EXPORT_RESULT_CACHE_DIR=make_directory(self))
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def export(self, options=None, **params):
+        response = self.get(
+            ExportSpreadsheet, options=options or self.options, format="csv", **params
+        )
+        return response.get("X-Export-Cache", None), read_csv(get_content(response))
+
+    def test_hit(self):
+        self.make_books(3)
+        status, rows = self.export()
+        self.assertEqual((status, len(rows)), ("miss", 4))
+        self.assertEqual(self.export(), ("hit", rows))
+        self.assertEqual(self.export(stream="0"), ("hit", rows))
+
+    def test_update(self):
+        books = self.make_books(3)
+        status, rows = self.export()
+        books[0].title = "New title"
+        books[0].modified += timedelta(days=1)
+        books[0].save()
+        status, rows = self.export()
+        self.assertEqual((status, rows[1][1]), ("miss", "New title"))
+
+    def test_bypass(self):
+        self.make_books(1)
+        self.export()
+        self.assertEqual(self.export(cache="0")[0], None)
+        response = self.get(
+            ExportSpreadsheet,
+            options=self.options,
+            format="csv",
+            meta={"HTTP_CACHE_CONTROL": "no-cache"},
+        )
+        self.assertNotIn("X-Export-Cache", response)
+
+    def test_not_versioned(self):
+        self.make_books(1)
+        options = {"export_fields": ["id", "title"]}
+        self.assertEqual(self.export(options)[0], None)
+        self.assertEqual(self.export(options)[0], None)
+
+    def test_stats(self):
+        self.make_books(1)
+        self.export()
+        self.export()
+        stats = json.loads(ExportCacheStats.as_view()(self.make_request()).content)
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+
+
+#######################################################################
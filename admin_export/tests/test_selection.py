@@ -0,0 +1,79 @@
+"""
+Tests for server-side export selections.
+"""
+#######################################################################
+
+from django.contrib.admin import ModelAdmin
+from django.contrib.admin.sites import site
+from django.http import Http404
+from django.test import RequestFactory
+
+from ..actions import export_redirect_spreadsheet_csv
+from ..selection import load_selection, restore_selection, store_selection
+from ..views import ExportSpreadsheet
+from .models import Author, Book
+from .utils import ExportTestCase, get_content, read_csv
+
+#######################################################################
+
+
+class SelectionTests(ExportTestCase):
+    def export(self, **params):
+        response = self.get(
+            ExportSpreadsheet, options={"export_fields": ["id"]}, format="csv", **params
+        )
+        return [int(row[0]) for row in read_csv(get_content(response))[1:]]
+
+    def test_store_and_load(self):
+        books = self.make_books(6)
+        queryset = Book.objects.filter(author__name="Author 1")
+        token = store_selection(queryset)
+        self.assertEqual(
+            list(load_selection(Book, token).values_list("pk", flat=True)),
+            [books[1].pk, books[4].pk],
+        )
+        self.assertIsNone(load_selection(Author, token))
+        self.assertIsNone(load_selection(Book, "0" * 32))
+        self.assertIsNone(restore_selection(Book, None))
+
+    def test_filter_is_replayed(self):
+        self.make_books(3)
+        token = store_selection(Book.objects.filter(title__startswith="New"))
+        self.assertEqual(self.export(selection=token), [])
+        book = Book.objects.create(title="New book", modified=self.modified)
+        self.assertEqual(self.export(selection=token), [book.pk])
+
+    def test_export_selection(self):
+        books = self.make_books(4)
+        token = store_selection(Book.objects.filter(pk__in=[books[0].pk, books[2].pk]))
+        self.assertEqual(self.export(selection=token), [books[0].pk, books[2].pk])
+        with self.assertRaises(Http404):
+            self.export(selection="0" * 32)
+
+    def test_pk_list(self):
+        books = self.make_books(3)
+        request = self.make_request(format="csv")
+        request.GET = request.GET.copy()
+        del request.GET["query"]
+        request.GET.setlist("pk", [books[0].pk, books[1].pk])
+        response = ExportSpreadsheet.as_view(export_fields=["id"])(request)
+        rows = read_csv(get_content(response))
+        self.assertEqual([int(row[0]) for row in rows[1:]], [books[0].pk, books[1].pk])
+
+    def test_action_passes_token(self):
+        books = self.make_books(30)
+        request = RequestFactory().post("/")
+        request.user = self.user
+        response = export_redirect_spreadsheet_csv(
+            ModelAdmin(Book, site), request, Book.objects.exclude(pk=books[0].pk)
+        )
+        query = response["Location"].split("?", 1)[1]
+        self.assertNotIn("pk=", query)
+        self.assertLess(len(query), 100)
+        request = RequestFactory().get("/?" + query)
+        request.user = self.user
+        response = ExportSpreadsheet.as_view(export_fields=["id"])(request)
+        self.assertEqual(len(read_csv(get_content(response))), 30)
+
+
+#######################################################################
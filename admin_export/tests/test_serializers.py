@@ -0,0 +1,95 @@
+"""
+Tests for the streaming serializer exports.
+"""
+#######################################################################
+
+import json
+
+from django.core import serializers
+from django.db import connection
+from django.http import StreamingHttpResponse
+from django.test.utils import CaptureQueriesContext
+
+from ..views import ExportSerializer
+from .models import Book
+from .utils import ExportTestCase, get_content
+
+#######################################################################
+
+
+class StreamingSerializerTests(ExportTestCase):
+    def setUp(self):
+        super(StreamingSerializerTests, self).setUp()
+        self.books = self.make_books(10)
+
+    def expected(self, format):
+        return serializers.serialize(format, Book.objects.order_by("pk"))
+
+    def export(self, format, **options):
+        response = self.get(ExportSerializer, options=options, format=format)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_json(self):
+        response = self.export("json", chunk_size=3)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(
+            json.loads(get_content(response)), json.loads(self.expected("json"))
+        )
+        self.assertEqual(
+            response["Content-Disposition"], "attachment; filename=book_list.json"
+        )
+
+    def test_ndjson(self):
+        if "ndjson" not in serializers.get_public_serializer_formats():
+            self.skipTest("no ndjson serializer")
+        response = self.export("ndjson", chunk_size=3)
+        lines = get_content(response).splitlines()
+        self.assertEqual(len(lines), len(self.books))
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [json.loads(line) for line in self.expected("ndjson").splitlines()],
+        )
+
+    def test_xml(self):
+        response = self.export("xml", chunk_size=4)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        objects = [
+            d.object
+            for d in serializers.deserialize("xml", get_content(response).decode())
+        ]
+        self.assertEqual([o.pk for o in objects], [b.pk for b in self.books])
+        expected = [
+            d.object for d in serializers.deserialize("xml", self.expected("xml"))
+        ]
+        self.assertEqual([o.title for o in objects], [o.title for o in expected])
+
+    def test_m2m(self):
+        response = self.export("json", chunk_size=3)
+        data = json.loads(get_content(response))
+        self.assertEqual(
+            [d["fields"]["tags"] for d in data],
+            [sorted(t.pk for t in b.tags.all()) for b in self.books],
+        )
+
+    def test_empty(self):
+        Book.objects.all().delete()
+        response = self.export("json")
+        self.assertEqual(json.loads(get_content(response)), [])
+        response = self.export("xml")
+        self.assertEqual(
+            list(serializers.deserialize("xml", get_content(response).decode())), []
+        )
+
+    def test_queries(self):
+        def count(n):
+            Book.objects.all().delete()
+            self.make_books(n)
+            with CaptureQueriesContext(connection) as queries:
+                get_content(self.export("json", chunk_size=100))
+            return len(queries)
+
+        self.assertEqual(count(3), count(9))
+
+
+#######################################################################
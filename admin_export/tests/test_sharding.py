@@ -0,0 +1,127 @@
+"""
+Tests for sharded exports.
+
+The shards are rendered in this process (rather than in worker
+processes), since the test database is not shared with workers.
+"""
+#######################################################################
+
+import json
+from unittest import mock
+
+from django.test import override_settings
+
+from .. import sharding
+from ..sharding import get_shard_ranges, get_worker_count, render_shard
+from ..views import ExportSerializer, ExportSpreadsheet
+from .models import Book
+from .utils import ExportTestCase, get_content, read_csv
+
+#######################################################################
+
+
+def map_tasks(tasks, workers):
+    return (sharding.render_shard(task) for task in tasks)
+
+
+def get_shards(view, queryset):
+    if view.shard is not None:
+        return None
+    return get_shard_ranges(queryset, 2, min_rows=1)
+
+
+#######################################################################
+
+
+class ShardRangeTests(ExportTestCase):
+    def test_ranges(self):
+        books = self.make_books(10)
+        low, high = books[0].pk, books[-1].pk
+        ranges = get_shard_ranges(Book.objects.all(), 2, min_rows=1)
+        self.assertEqual(len(ranges), 5)  # at most 4 per worker
+        self.assertEqual(ranges[0][0], low)
+        self.assertEqual(ranges[-1][1], high + 1)
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+
+    def test_min_rows(self):
+        self.make_books(10)
+        ranges = get_shard_ranges(Book.objects.all(), 4, min_rows=4)
+        self.assertEqual(len(ranges), 2)
+        self.assertIsNone(get_shard_ranges(Book.objects.all(), 4, min_rows=6))
+
+    def test_no_shards(self):
+        self.assertIsNone(get_shard_ranges(Book.objects.all(), 4, min_rows=1))
+        self.make_books(10)
+        self.assertIsNone(get_shard_ranges(Book.objects.all(), 1, min_rows=1))
+
+    def test_worker_count(self):
+        view = self.make_view(ExportSpreadsheet, format="csv")
+        self.assertEqual(get_worker_count(view), 1)
+        with override_settings(ADMIN_EXPORT_WORKERS=3):
+            self.assertEqual(get_worker_count(view), 3)
+        view = self.make_view(
+            ExportSpreadsheet, options={"export_workers": 2}, format="csv"
+        )
+        self.assertEqual(get_worker_count(view), 2)
+
+    def test_atomic(self):
+        # the test case runs in a transaction.
+        self.make_books(10)
+        with override_settings(ADMIN_EXPORT_WORKERS=4, ADMIN_EXPORT_SHARD_MIN_ROWS=1):
+            view = self.make_view(ExportSpreadsheet, format="csv")
+            self.assertIsNone(view.get_shards(Book.objects.all()))
+
+
+#######################################################################
+
+
+@mock.patch("admin_export.sharding.map_tasks", map_tasks)
+class ShardedExportTests(ExportTestCase):
+    def setUp(self):
+        super(ShardedExportTests, self).setUp()
+        self.make_books(10)
+
+    def export(self, view_class, **kwargs):
+        return get_content(self.get(view_class, **kwargs))
+
+    def sharded_export(self, view_class, **kwargs):
+        with mock.patch.object(view_class, "get_shards", get_shards):
+            with mock.patch(
+                "admin_export.sharding.render_shard", side_effect=render_shard
+            ) as shard:
+                content = self.export(view_class, **kwargs)
+        self.assertGreater(shard.call_count, 1)
+        return content
+
+    def test_csv(self):
+        fields = {"fields": "title,author.name,price"}
+        expected = self.export(ExportSpreadsheet, format="csv", **fields)
+        content = self.sharded_export(ExportSpreadsheet, format="csv", **fields)
+        self.assertEqual(read_csv(content), read_csv(expected))
+        self.assertEqual(len(read_csv(content)), 11)
+
+    def test_rows(self):
+        options = {"export_fields": ["title", "price"]}
+        view = self.make_view(ExportSpreadsheet, options=options, format="csv")
+        expected = list(view.iter_rows())
+        view = self.make_view(ExportSpreadsheet, options=options, format="csv")
+        with mock.patch.object(ExportSpreadsheet, "get_shards", get_shards):
+            self.assertEqual(list(view.iter_rows()), expected)
+
+    def test_serializer(self):
+        expected = json.loads(self.export(ExportSerializer, format="json"))
+        data = json.loads(self.sharded_export(ExportSerializer, format="json"))
+        self.assertEqual(data, expected)
+        self.assertEqual(len(data), 10)
+
+    def test_selection(self):
+        pks = Book.objects.order_by("pk").values_list("pk", flat=True)
+        params = {"format": "csv", "query": " ".join(map(str, pks[2:7]))}
+        expected = self.export(ExportSpreadsheet, **params)
+        content = self.sharded_export(ExportSpreadsheet, **params)
+        self.assertEqual(read_csv(content), read_csv(expected))
+        self.assertEqual(len(read_csv(content)), 6)
+
+
+#######################################################################
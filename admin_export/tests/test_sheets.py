@@ -0,0 +1,142 @@
+"""
+Tests for multi-sheet workbooks of related data.
+"""
+#######################################################################
+
+import io
+import unittest
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+
+from ..sheets import get_relation, make_sheet_title, parse_sheets
+from ..views import ExportSpreadsheet
+from ..writers import XLSXWriter, get_writer_class
+from .models import Author, Book, Tag
+from .utils import ExportTestCase, get_content, read_csv
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+#######################################################################
+
+
+class SheetPlanTests(SimpleTestCase):
+    def test_parse_sheets(self):
+        lines = ["author", "id", "name", "", "", "tags", " ", "books", "title"]
+        self.assertEqual(
+            parse_sheets(lines),
+            [("author", ["id", "name"]), ("tags", None), ("books", ["title"])],
+        )
+
+    def test_relations(self):
+        self.assertEqual(get_relation(Book, "author"), (Author, "books__pk", True))
+        self.assertEqual(get_relation(Book, "tags"), (Tag, "book__pk", True))
+        self.assertEqual(get_relation(Author, "books"), (Book, "author__pk", False))
+        self.assertEqual(get_relation(Tag, "book_set"), (Book, "tags__pk", True))
+        for model, name in [(Book, "title"), (Book, "missing")]:
+            with self.assertRaises(ImproperlyConfigured):
+                get_relation(model, name)
+
+    def test_titles(self):
+        used = set()
+        self.assertEqual(make_sheet_title("Books", used), "Books")
+        self.assertEqual(make_sheet_title("books", used), "books (2)")
+        self.assertEqual(make_sheet_title("a/b [c]: *?", used), "ab c ")
+        self.assertEqual(make_sheet_title("", used), "Sheet")
+        long_title = "x" * 40
+        self.assertEqual(make_sheet_title(long_title, used), "x" * 31)
+        self.assertEqual(make_sheet_title(long_title, used), "x" * 27 + " (2)")
+
+
+#######################################################################
+
+
+@unittest.skipIf(
+    openpyxl is None or get_writer_class("xlsx") is not XLSXWriter,
+    "openpyxl is not installed",
+)
+class MultiSheetExportTests(ExportTestCase):
+    def setUp(self):
+        super(MultiSheetExportTests, self).setUp()
+        self.books = self.make_books(10)
+
+    def export(self, model=Book, format="xlsx", **options):
+        options.setdefault("chunk_size", 3)
+        response = self.get(
+            ExportSpreadsheet, model=model, options=options, format=format
+        )
+        self.assertEqual(response.status_code, 200)
+        return get_content(response)
+
+    def read_workbook(self, content):
+        workbook = openpyxl.load_workbook(io.BytesIO(content))
+        return {
+            sheet.title: list(sheet.iter_rows(values_only=True))
+            for sheet in workbook.worksheets
+        }
+
+    def test_forward(self):
+        workbook = self.read_workbook(
+            self.export(
+                export_fields=["id", "title"],
+                export_sheets=[("author", ["id", "name"]), ("tags", None)],
+            )
+        )
+        self.assertEqual(list(workbook), ["Books", "Authors", "Tags"])
+        self.assertEqual(len(workbook["Books"]), 11)
+        # related rows are written once, however many rows they are in.
+        authors = workbook["Authors"]
+        self.assertEqual(authors[0], ("ID", "Name"))
+        self.assertEqual(
+            sorted(row[1] for row in authors[1:]), ["Author 0", "Author 1", "Author 2"]
+        )
+        tags = workbook["Tags"]
+        self.assertEqual(tags[0], ("ID", "Name"))
+        self.assertEqual(sorted(row[1] for row in tags[1:]), ["Tag 0", "Tag 1"])
+
+    def test_reverse(self):
+        workbook = self.read_workbook(
+            self.export(
+                model=Author,
+                export_fields=["id", "name"],
+                export_sheets=[("books", ["title", "author.name"])],
+            )
+        )
+        self.assertEqual(list(workbook), ["Authors", "Books"])
+        books = workbook["Books"]
+        self.assertEqual(
+            sorted(books[1:]),
+            sorted((b.title, b.author.name) for b in self.books),
+        )
+
+    def test_selection(self):
+        selected = [self.books[0], self.books[3]]  # by Author 0
+        response = self.get(
+            ExportSpreadsheet,
+            options={
+                "export_fields": ["title"],
+                "export_sheets": [("author", ["name"])],
+            },
+            format="xlsx",
+            query=" ".join(str(b.pk) for b in selected),
+        )
+        workbook = self.read_workbook(get_content(response))
+        self.assertEqual(workbook["Books"][1:], [("Book 0",), ("Book 3",)])
+        self.assertEqual(workbook["Authors"][1:], [("Author 0",)])
+
+    def test_single_sheet_formats(self):
+        # formats with one sheet ignore the related sheets.
+        content = self.export(
+            format="csv", export_fields=["title"], export_sheets=[("author", None)]
+        )
+        self.assertEqual(len(read_csv(content)), 11)
+
+    def test_invalid(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.export(export_fields=["title"], export_sheets=[("title", None)])
+
+
+#######################################################################
@@ -0,0 +1,53 @@
+"""
+Tests for streaming spreadsheet exports.
+"""
+#######################################################################
+
+from django.http import StreamingHttpResponse
+
+from ..views import ExportSpreadsheet
+from .utils import ExportTestCase, get_content, read_csv
+
+#######################################################################
+
+
+class StreamingSpreadsheetTests(ExportTestCase):
+    options = {"export_fields": ["id", "title", "author.name"]}
+    headers = ["ID", "Title", "Name"]
+
+    def test_csv_is_streamed(self):
+        books = self.make_books(5)
+        response = self.get(ExportSpreadsheet, options=self.options, format="csv")
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertEqual(
+            read_csv(get_content(response)),
+            [self.headers] + [[str(b.pk), b.title, b.author.name] for b in books],
+        )
+
+    def test_csv_rows_are_generated_lazily(self):
+        self.make_books(5)
+        response = self.get(
+            ExportSpreadsheet, options=dict(self.options, chunk_size=2), format="csv"
+        )
+        content = iter(response.streaming_content)
+        self.assertEqual(read_csv(next(content)), [self.headers])
+        self.assertEqual(len(read_csv(b"".join(content))), 5)
+
+    def test_not_streamed(self):
+        self.make_books(3)
+        response = self.get(
+            ExportSpreadsheet, options=self.options, format="csv", stream="0"
+        )
+        self.assertFalse(response.streaming)
+        self.assertEqual(len(read_csv(response.content)), 4)
+
+    def test_no_selection(self):
+        self.make_books(3)
+        response = self.get(
+            ExportSpreadsheet, options=self.options, format="csv", query="0"
+        )
+        self.assertEqual(read_csv(get_content(response)), [self.headers])
+
+
+#######################################################################
@@ -0,0 +1,89 @@
+"""
+Tests for the ``values_list()`` fast path.
+"""
+#######################################################################
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from ..views import ExportSpreadsheet
+from .utils import ExportTestCase, get_content, read_csv
+
+#######################################################################
+
+FIELDS = [
+    "id",
+    "title",
+    "author.name",
+    "author.pk",
+    "price::n/a",
+    "published",
+    "get_binding_display",
+    "modified",
+]
+
+
+class ValuesFastPathTests(ExportTestCase):
+    def export(self, fields=FIELDS, **options):
+        options["export_fields"] = fields
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(ExportSpreadsheet, options=options, format="csv")
+            rows = read_csv(get_content(response))
+        return rows, [q["sql"] for q in queries.captured_queries]
+
+    def test_value_columns(self):
+        view = self.make_view(
+            ExportSpreadsheet, options={"export_fields": FIELDS}, format="csv"
+        )
+        paths, columns = view.get_value_columns()
+        self.assertEqual(
+            paths,
+            [
+                "id",
+                "title",
+                "author__name",
+                "author",
+                "author__pk",
+                "price",
+                "published",
+                "binding",
+                "modified",
+            ],
+        )
+        self.assertEqual(len(columns), len(FIELDS))
+
+    def test_not_columns(self):
+        for fields in [["title", "tag_list"], ["title", "author"], ["tags.count"]]:
+            view = self.make_view(
+                ExportSpreadsheet, options={"export_fields": fields}, format="csv"
+            )
+            self.assertIsNone(view.get_value_columns(), fields)
+        view = self.make_view(
+            ExportSpreadsheet,
+            options={"export_fields": ["title"], "values_fast_path": False},
+            format="csv",
+        )
+        self.assertIsNone(view.get_value_columns())
+
+    def test_same_rows(self):
+        books = self.make_books(5)
+        books[0].author = None
+        books[0].price = None
+        books[0].binding = "h"
+        books[0].save()
+        rows, queries = self.export()
+        self.assertEqual(rows, self.export(values_fast_path=False)[0])
+        self.assertEqual(rows[1][2:7], ["", "", "n/a", "2020-01-01", "Hardcover"])
+
+    def test_only_the_columns_are_fetched(self):
+        self.make_books(3)
+        rows, queries = self.export(["title"])
+        self.assertEqual(rows[1], ["Book 0"])
+        query = [sql for sql in queries if '"admin_export_tests_book"' in sql][0]
+        self.assertNotIn('"published"', query)
+        rows, queries = self.export(["title"], values_fast_path=False)
+        query = [sql for sql in queries if '"admin_export_tests_book"' in sql][0]
+        self.assertIn('"published"', query)
+
+
+#######################################################################
@@ -0,0 +1,100 @@
+"""
+Tests for delta exports.
+"""
+#######################################################################
+
+from datetime import timedelta
+
+from django.http import Http404
+from django.test import RequestFactory
+from django.utils import timezone
+
+from ..models import ExportWatermark
+from ..views import ExportSpreadsheet
+from ..watermarks import WATERMARK_HEADER, format_watermark, parse_watermark
+from .models import Book
+from .utils import ExportTestCase, get_content, read_csv
+
+#######################################################################
+
+
+class WatermarkTests(ExportTestCase):
+    options = {"export_fields": ["id"], "export_watermark_field": "modified"}
+
+    def export(self, since=None, query_string=None):
+        """
+        Return the primary keys exported, and the new watermark.
+        """
+        if query_string is not None:
+            request = RequestFactory().get("/?" + query_string)
+            request.user = self.user
+        else:
+            params = {"format": "csv"}
+            if since is not None:
+                params["since"] = since
+            request = self.make_request(**params)
+        response = ExportSpreadsheet.as_view(**self.options)(request)
+        rows = read_csv(get_content(response))
+        return [int(row[0]) for row in rows[1:]], response.get(WATERMARK_HEADER, None)
+
+    def test_format(self):
+        value = timezone.now()
+        text = format_watermark(value)
+        self.assertTrue(text.endswith("Z"))
+        self.assertNotIn("+", text)
+        field = Book._meta.get_field("modified")
+        self.assertEqual(parse_watermark(field, text), value)
+        self.assertEqual(format_watermark(12), "12")
+
+    def test_decoded_offset(self):
+        field = Book._meta.get_field("modified")
+        self.assertEqual(
+            parse_watermark(field, "2020-01-01T00:00:00.5 00:00"),
+            self.modified + timedelta(microseconds=500000),
+        )
+        with self.assertRaises(ValueError):
+            parse_watermark(field, "yesterday")
+
+    def test_no_delta(self):
+        books = self.make_books(3)
+        pks, watermark = self.export()
+        self.assertEqual(pks, [b.pk for b in books])
+        self.assertIsNone(watermark)
+
+    def test_since_last(self):
+        books = self.make_books(3)
+        pks, watermark = self.export("last")
+        self.assertEqual(pks, [b.pk for b in books])
+        self.assertEqual(watermark, format_watermark(books[-1].modified))
+        self.assertEqual(ExportWatermark.objects.get().value, watermark)
+        self.assertEqual(self.export("last"), ([], watermark))
+        Book.objects.filter(pk=books[0].pk).update(
+            modified=books[-1].modified + timedelta(seconds=1)
+        )
+        pks, new_watermark = self.export("last")
+        self.assertEqual(pks, [books[0].pk])
+        self.assertGreater(new_watermark, watermark)
+
+    def test_since_value(self):
+        books = self.make_books(3)
+        pks, watermark = self.export(format_watermark(books[0].modified))
+        self.assertEqual(pks, [b.pk for b in books[1:]])
+        self.assertEqual(watermark, format_watermark(books[-1].modified))
+
+    def test_unencoded_query_string(self):
+        books = self.make_books(3)
+        query_string = "contenttype={0}&query=all&format=csv&since={1}".format(
+            self.make_request().GET["contenttype"], books[1].modified.isoformat()
+        )
+        self.assertIn("+", query_string)
+        self.assertEqual(self.export(query_string=query_string)[0], [books[2].pk])
+        pks, watermark = self.export("last")
+        query_string = query_string.rsplit("=", 1)[0] + "=" + watermark
+        self.assertEqual(self.export(query_string=query_string)[0], [])
+
+    def test_invalid(self):
+        with self.assertRaises(Http404):
+            self.export("yesterday")
+
+
+#######################################################################
@@ -0,0 +1,16 @@
+"""
+Url patterns for the export tests.
+"""
+#######################################################################
+
+from django.contrib import admin
+from django.urls import include, re_path
+
+#######################################################################
+
+urlpatterns = [
+    re_path(r"^admin/export/", include("admin_export.urls")),
+    re_path(r"^admin/", admin.site.urls),
+]
+
+#######################################################################
@@ -0,0 +1,132 @@
+"""
+Helpers for the export tests.
+"""
+#######################################################################
+
+import csv
+import io
+import os
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.admin import ModelAdmin
+from django.contrib.admin.sites import site
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from ..permissions import clear_permission_cache
+from ..plan import clear_caches
+from .models import Author, Book, Tag
+
+#######################################################################
+
+
+def stub_latex(tex_path, timeout, passes=2):
+    """
+    Stand in for LaTeX: the "PDF" is the LaTeX source.
+    """
+    pdf_path = os.path.splitext(tex_path)[0] + ".pdf"
+    with open(tex_path, "rb") as src, open(pdf_path, "wb") as fp:
+        fp.write(b"%PDF-1.4\n")
+        fp.write(src.read())
+    return pdf_path
+
+
+def get_content(response):
+    """
+    Return the content of a (possibly streaming) response.
+    """
+    if response.streaming:
+        return b"".join(response.streaming_content)
+    return response.content
+
+
+def read_csv(content):
+    """
+    Return the rows of the CSV content.
+    """
+    return list(csv.reader(io.StringIO(content.decode("utf-8"))))
+
+
+@contextmanager
+def model_admin(model, **options):
+    """
+    Register a model admin with the (export) options, for the block.
+    """
+    admin_class = type(model.__name__ + "Admin", (ModelAdmin,), options)
+    site.register(model, admin_class)
+    try:
+        yield site._registry[model]
+    finally:
+        site.unregister(model)
+
+
+#######################################################################
+
+
+class ExportTestCase(TestCase):
+    """
+    Base class for the export tests: a superuser, and helpers to make
+    books and export them.
+    """
+
+    def setUp(self):
+        clear_caches()
+        clear_permission_cache()
+        self.user = get_user_model().objects.create_superuser(
+            "admin", "admin@example.com", "password"
+        )
+        self.modified = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+    def make_books(self, count=10):
+        """
+        Make ``count`` books, by three authors, with some tags.
+        """
+        authors = [Author.objects.create(name="Author {0}".format(i)) for i in range(3)]
+        tags = [Tag.objects.create(name="Tag {0}".format(i)) for i in range(2)]
+        books = []
+        for i in range(count):
+            book = Book.objects.create(
+                title="Book {0}".format(i),
+                author=authors[i % 3],
+                price=Decimal("10.00") + i,
+                published=date(2020, 1, 1) + timedelta(days=i),
+                modified=self.modified + timedelta(hours=i),
+            )
+            book.tags.set(tags[: i % 3])
+            books.append(book)
+        return books
+
+    def make_request(self, model=Book, user=None, meta=None, **params):
+        """
+        Return a GET request (by the user; default: the superuser) to
+        export all the rows of the model, with the params.
+        """
+        params.setdefault("query", "all")
+        params["contenttype"] = ContentType.objects.get_for_model(model).pk
+        request = RequestFactory().get("/", params, **(meta or {}))
+        request.user = user or self.user
+        return request
+
+    def make_view(self, view_class, model=Book, options=None, **kwargs):
+        """
+        Return an instance of the export view (with the ``as_view()``
+        options), set up for a request (see ``make_request()``).
+        """
+        view = view_class(**(options or {}))
+        view.setup(self.make_request(model, **kwargs))
+        return view
+
+    def get(self, view_class, model=Book, options=None, **kwargs):
+        """
+        Return the response of the export view (with the ``as_view()``
+        options) to a request (see ``make_request()``).
+        """
+        request = self.make_request(model, **kwargs)
+        return view_class.as_view(**(options or {}))(request)
+
+
+#######################################################################
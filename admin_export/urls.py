@@ -4,9 +4,22 @@ Url patterns for admin exports.
 #######################
 from __future__ import print_function, unicode_literals
 
-from admin_export.views import ExportPDF, ExportSerializer, ExportSpreadsheet
-from django.conf.urls import url
+from admin_export.asyncviews import (
+    AsyncExportSerializer,
+    AsyncExportSpreadsheet,
+    async_admin_view,
+    async_views_enabled,
+)
+from admin_export.views import (
+    ExportCacheStats,
+    ExportJobDownload,
+    ExportJobStatus,
+    ExportPDF,
+    ExportSerializer,
+    ExportSpreadsheet,
+)
 from django.contrib.admin.sites import site
+from django.urls import re_path
 
 #######################
 #######################################################################
@@ -14,16 +27,34 @@ from django.contrib.admin.sites import site
 
 #######################################################################
 
-admin_export_spreadsheet = site.admin_view(ExportSpreadsheet.as_view())
+if async_views_enabled():
+    admin_export_spreadsheet = async_admin_view(AsyncExportSpreadsheet.as_view())
+    admin_export_data = async_admin_view(AsyncExportSerializer.as_view())
+else:
+    admin_export_spreadsheet = site.admin_view(ExportSpreadsheet.as_view())
+    admin_export_data = site.admin_view(ExportSerializer.as_view())
 admin_export_pdf = site.admin_view(ExportPDF.as_view())
-admin_export_data = site.admin_view(ExportSerializer.as_view())
+admin_export_job_status = site.admin_view(ExportJobStatus.as_view())
+admin_export_job_download = site.admin_view(ExportJobDownload.as_view())
+admin_export_cache_stats = site.admin_view(ExportCacheStats.as_view())
 
 #######################################################################
 
 urlpatterns = [
-    url(r"^spreadsheet/$", admin_export_spreadsheet, name="admin_export_spreadsheet"),
-    url(r"^pdf/$", admin_export_pdf, name="admin_export_pdf"),
-    url(r"^data/$", admin_export_data, name="admin_export_data"),
+    re_path(
+        r"^spreadsheet/$", admin_export_spreadsheet, name="admin_export_spreadsheet"
+    ),
+    re_path(r"^pdf/$", admin_export_pdf, name="admin_export_pdf"),
+    re_path(r"^data/$", admin_export_data, name="admin_export_data"),
+    re_path(
+        r"^job/(?P<pk>\d+)/$", admin_export_job_status, name="admin_export_job_status"
+    ),
+    re_path(
+        r"^job/(?P<pk>\d+)/download/$",
+        admin_export_job_download,
+        name="admin_export_job_download",
+    ),
+    re_path(r"^cache/$", admin_export_cache_stats, name="admin_export_cache_stats"),
 ]
 
 
@@ -33,15 +64,17 @@ urlpatterns = [
 # one.  Otherwise exporters can be enable in individual model admins
 # appropriately (by setting/extending the ``actions`` class attribute).
 
-# Current action names are:
+# Current action names are (see ``admin_export.actions``):
 #   SPREADSHEET_EXPORT_ACTIONS:
-#         * export_redirect_spreadsheet_csv
-#         * export_redirect_spreadsheet_xlsx
+#         * export_redirect_spreadsheet_<format>, for each format with a
+#           registered writer (``admin_export.writers.get_formats()``),
+#           e.g., csv, xlsx, parquet, arrow
 #   PDF_EXPORT_ACTIONS:
 #         * export_redirect_pdf
-#   DATA_EXPORT_ACTIONS
-#         * export_redirect_data_xml
-#         * export_redirect_data_json
+#   CODE_EXPORT_ACTIONS:
+#         * export_redirect_serializer_json
+#         * export_redirect_serializer_ndjson
+#         * export_redirect_serializer_xml
 
 # Enable export actions globaly
 # from django.contrib.admin.sites import site
@@ -1,26 +1,50 @@
 #####################################################################
 
+import inspect
+import re
+from functools import partialmethod
+
 from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core import serializers
+from django.core.exceptions import FieldDoesNotExist
+from django.http import HttpRequest, QueryDict
 from django.template import Template
-from django.utils.encoding import force_text
+from django.utils.encoding import force_str
 from django.utils.text import capfirst
 
 #####################################################################
 
 
 def safe_field_name(name):
-    if ":" in name:
-        name = name.split(":", 1)[0]
-    return name
+    return decode_field(name)[0]
 
 
 #####################################################################
 
+# alias=Function(path); see ``admin_export.annotations``.
+ANNOTATION_SPEC = re.compile(r"^\s*(\w+)\s*=\s*(\w+)\(\s*([\w.]+)\s*\)\s*$")
+
+
+def parse_annotation(fieldname):
+    """
+    If the export field is an annotation spec, ``alias=Function(path)``,
+    return ``(alias, function, path)``; otherwise ``None``.
+    """
+    match = ANNOTATION_SPEC.match(fieldname.split(":", 1)[0])
+    if match is None:
+        return None
+    return match.groups()
+
 
 def decode_field(fieldname):
     """
     actualname[:title[:none_str]]
+    The actual name of an annotation spec is its alias.
     """
+    spec = parse_annotation(fieldname)
+    if spec is not None:
+        fieldname = spec[0] + fieldname[len(fieldname.split(":", 1)[0]) :]
     if ":" not in fieldname:
         return fieldname, fieldname, ""
     colon_count = fieldname.count(":")
@@ -37,17 +61,14 @@ def decode_field(fieldname):
 #####################################################################
 
 
-def default_latex_template(headers, fields):
+def latex_preamble(headers):
     """
-    Generate and return the default *compiled* template for LaTeX/PDF.
+    Return the default LaTeX document, up to the start of the table body.
     """
     header_line = " & ".join(headers)
     column_spec = "l" * len(headers)
     orientation = "portrait" if len(headers) < 6 else "landscape"
-    object_line = " & ".join(
-        ["{{ object." + safe_field_name(f) + " }}" for f in fields]
-    )
-    return Template(
+    return (
         r"""\documentclass[letterpaper,10pt]{article}
 
 
@@ -92,33 +113,398 @@ def default_latex_template(headers, fields):
     \endhead
     \bottomrule
     \endfoot
-    {% for object in object_list %}%
+"""
+    )
+
+
+def latex_postamble():
+    """
+    Return the default LaTeX document, after the table body.
+    """
+    return r"""\end{longtable}
+
+\end{document}
+"""
+
+
+def default_latex_template(headers, fields):
+    """
+    Generate and return the default *compiled* template for LaTeX/PDF.
+    """
+    object_line = " & ".join(
+        ["{{ object." + safe_field_name(f) + " }}" for f in fields]
+    )
+    return Template(
+        latex_preamble(headers)
+        + r"""    {% for object in object_list %}%
         """
         + object_line
         + r""" \\
     {% endfor %}%
-\end{longtable}
-
-\end{document}
 """
+        + latex_postamble()
     )
 
 
 #####################################################################
 
 
+def _relation_map(model):
+    """
+    Map the attribute names of ``model`` to their relation fields,
+    i.e., forward relations by name, reverse relations by accessor name.
+    """
+    result = {}
+    for f in model._meta.get_fields():
+        if not f.is_relation:
+            continue
+        if f.auto_created and not f.concrete:
+            accessor = f.get_accessor_name()
+            if accessor:
+                result[accessor] = f
+        else:
+            result[f.name] = f
+    return result
+
+
+def get_related_lookups(model, fields):
+    """
+    Analyse the (dotted) export fields against the model metadata, and
+    return a pair of lists ``(select_related, prefetch_related)`` for
+    the relations traversed.
+    Forward foreign key and one-to-one chains can be selected; once a
+    reverse foreign key or a many-to-many relation is traversed the
+    remainder of the chain must be prefetched.
+    """
+    select_related = []
+    prefetch_related = []
+    for fieldname in fields:
+        name = decode_field(fieldname)[0]
+        current = model
+        path = []
+        many = False
+        for bit in name.split("."):
+            field = _relation_map(current).get(bit, None)
+            if field is None:
+                break  # not a relation; or a method, property, etc.
+            if field.auto_created and not field.concrete and field.one_to_one:
+                path.append(field.field.related_query_name())
+            else:
+                path.append(bit)
+            if field.many_to_many or field.one_to_many:
+                many = True
+            if field.related_model is None:
+                # e.g., a generic foreign key; cannot follow any further.
+                many = True
+                break
+            current = field.related_model
+        if not path:
+            continue
+        lookup = "__".join(path)
+        target = prefetch_related if many else select_related
+        if lookup not in target:
+            target.append(lookup)
+    return select_related, prefetch_related
+
+
+#####################################################################
+
+
+DISPLAY_METHOD = re.compile(r"^get_(\w+)_display$")
+
+
+def get_display_field(model, name):
+    """
+    If ``name`` is the ``get_FOO_display()`` method Django generates for a
+    field with choices, return the field; otherwise ``None``.
+    """
+    match = DISPLAY_METHOD.match(name)
+    if match is None:
+        return None
+    try:
+        field = model._meta.get_field(match.group(1))
+    except FieldDoesNotExist:
+        return None
+    if not (field.concrete and field.choices) or field.name != match.group(1):
+        return None
+    for klass in model.__mro__:
+        if name in vars(klass):
+            # not overridden by the model.
+            if isinstance(vars(klass)[name], partialmethod):
+                return field
+            return None
+    return None
+
+
+_display_choices_cache = {}
+
+
+def get_display_choices(model, fieldname):
+    """
+    If the export field is a ``get_FOO_display()`` method (see
+    ``get_display_field()``), return the (cached) map of the field values
+    to their display values; otherwise ``None``.
+    """
+    key = (model, fieldname)
+    try:
+        return _display_choices_cache[key]
+    except KeyError:
+        pass
+    choices = None
+    head, _, bit = decode_field(fieldname)[0].rpartition(".")
+    current = model
+    if head:
+        field = get_model_field(model, head)
+        current = getattr(field, "related_model", None)
+    if current is not None:
+        field = get_display_field(current, bit)
+        if field is not None:
+            choices = {
+                value: force_str(label, strings_only=True)
+                for value, label in field.flatchoices
+            }
+    _display_choices_cache[key] = choices
+    return choices
+
+
+def get_column_path(model, fieldname, annotations=()):
+    """
+    If the export field is a plain database column, possibly reached
+    through forward foreign key or one-to-one relations, return the pair
+    ``(path, guards)``: the ``values()`` lookup for the column, and the
+    ``values()`` lookups of the relations traversed on the way.  The
+    ``get_FOO_display()`` method of a field with choices maps to the
+    column of the field.
+    Otherwise (methods, properties, reverse or many-to-many relations,
+    etc.) return ``None``.
+    Annotation columns (aliases in ``annotations``) are columns too.
+    """
+    name = decode_field(fieldname)[0]
+    if name in annotations:
+        return name, []
+    bits = name.split(".")
+    current = model
+    path = []
+    guards = []
+    for bit in bits[:-1]:
+        try:
+            field = current._meta.get_field(bit)
+        except FieldDoesNotExist:
+            return None
+        if not (
+            field.concrete
+            and (field.many_to_one or field.one_to_one)
+            and field.related_model is not None
+            and field.name == bit
+        ):
+            return None
+        path.append(bit)
+        guards.append("__".join(path))
+        current = field.related_model
+    bit = bits[-1]
+    if bit == "pk":
+        path.append(bit)
+        return "__".join(path), guards
+    display_field = get_display_field(current, bit)
+    if display_field is not None:
+        bit = display_field.attname
+    try:
+        field = current._meta.get_field(bit)
+    except FieldDoesNotExist:
+        return None
+    if not field.concrete:
+        return None
+    if field.is_relation and bit != field.attname:
+        # the related object itself is exported, not a column.
+        return None
+    path.append(bit)
+    return "__".join(path), guards
+
+
+def get_model_field(model, fieldname):
+    """
+    Return the model field for the export field, possibly reached through
+    forward foreign key or one-to-one relations; or ``None`` if the export
+    field is not a model field (e.g., a method or property).
+    """
+    name = decode_field(fieldname)[0]
+    current = model
+    field = None
+    for bit in name.split("."):
+        if field is not None:
+            if not (field.many_to_one or field.one_to_one) or not field.concrete:
+                return None
+            current = field.related_model
+            if current is None:
+                return None
+        if bit == "pk":
+            bit = current._meta.pk.name
+        try:
+            field = current._meta.get_field(bit)
+        except FieldDoesNotExist:
+            return None
+    if field.is_relation and bit == field.attname and bit != field.name:
+        # the column for the relation, e.g., ``author_id``.
+        return field.target_field
+    return field
+
+
+class ValueColumn(object):
+    """
+    Resolves an export field against a ``values_list()`` row, with the
+    same results as the field accessor on a model instance.  ``choices``
+    maps the column values to display values, for ``get_FOO_display()``.
+    """
+
+    def __init__(self, index, guards, none_str, choices=None):
+        self.index = index
+        self.guards = guards
+        self.none_str = none_str
+        self.choices = choices
+
+    def resolve(self, row):
+        for g in self.guards:
+            if row[g] is None:
+                return ""  # a null relation on the way to the column.
+        value = row[self.index]
+        if self.choices is not None:
+            try:
+                value = self.choices.get(value, value)
+            except TypeError:  # unhashable
+                pass
+        if value is None:
+            return self.none_str
+        return value
+
+    def __call__(self, row):
+        return force_str(self.resolve(row))
+
+
+def get_value_columns(model, fields, annotations=()):
+    """
+    If every export field is a plain column (see ``get_column_path()``),
+    return the pair ``(paths, columns)``: the lookups to pass to
+    ``values_list()``, and a ``ValueColumn`` for each field.
+    Otherwise return ``None``.
+    """
+    paths = []
+    columns = []
+
+    def index_of(lookup):
+        if lookup not in paths:
+            paths.append(lookup)
+        return paths.index(lookup)
+
+    for fieldname in fields:
+        result = get_column_path(model, fieldname, annotations)
+        if result is None:
+            return None
+        path, guards = result
+        index = index_of(path)
+        columns.append(
+            ValueColumn(
+                index,
+                [index_of(g) for g in guards],
+                decode_field(fieldname)[2],
+                get_display_choices(model, fieldname),
+            )
+        )
+    return paths, columns
+
+
+#####################################################################
+
+
+class _PrefetchedManager(object):
+    """
+    Stands in for a related manager, iterating over prefetched objects.
+    """
+
+    def __init__(self, objects):
+        self.objects = objects
+
+    def select_related(self, *fields):
+        return self
+
+    def only(self, *fields):
+        return self
+
+    def iterator(self):
+        return iter(self.objects)
+
+
+class _PrefetchedObject(object):
+    """
+    Proxies a model instance, so that a serializer's
+    ``getattr(obj, name).iterator()`` uses the prefetched objects.
+    """
+
+    def __init__(self, obj, name, objects):
+        self._obj = obj
+        self._name = name
+        self._objects = objects
+
+    def __getattr__(self, attr):
+        if attr == self._name:
+            return _PrefetchedManager(self._objects)
+        return getattr(self._obj, attr)
+
+
+_serializer_cache = {}
+
+
+def get_prefetch_serializer(format):
+    """
+    Return a serializer class for ``format`` which uses prefetched
+    many-to-many relations, rather than one query per object.
+    """
+    try:
+        return _serializer_cache[format]
+    except KeyError:
+        pass
+    base = serializers.get_serializer(format)
+
+    class Serializer(base):
+        def handle_m2m_field(self, obj, field):
+            cache = getattr(obj, "_prefetched_objects_cache", {})
+            if field.name in cache:
+                obj = _PrefetchedObject(obj, field.name, list(cache[field.name]))
+            return super(Serializer, self).handle_m2m_field(obj, field)
+
+    _serializer_cache[format] = Serializer
+    return Serializer
+
+
+#####################################################################
+
+
+_verbose_name_cache = {}
+
+
+def get_verbose_names(model):
+    """
+    Return a map of the (concrete) field names of the model to their
+    verbose names.
+    """
+    try:
+        return _verbose_name_cache[model]
+    except KeyError:
+        names = {f.name: f.verbose_name for f in model._meta.fields}
+        _verbose_name_cache[model] = names
+        return names
+
+
 def titlize(model, name):
     """
     Attempt to pull a meaningful title for this name.
     """
     if ":" in name:
         return name.split(":")[1]
+    name = decode_field(name)[0]
 
     s = None
     if "." not in name:
-        for f in model._meta.fields:
-            if f.name == name:
-                s = f.verbose_name
+        s = get_verbose_names(model).get(name, None)
     if not s:
         s = name
         if "." in s:
@@ -131,6 +517,210 @@ def titlize(model, name):
 #####################################################################
 
 
+# lookup kinds, in the order they are attempted:
+DICT_LOOKUP = "dict"
+ATTRIBUTE_LOOKUP = "attribute"
+INDEX_LOOKUP = "index"
+
+# treatment of callable values:
+CALL = "call"
+NO_CALL = "no-call"
+NO_ALTERS = "alters-data"
+
+
+def _callable_mode(value):
+    """
+    Determine how a callable value is treated, i.e., the same way that
+    templates treat them.
+    """
+    if getattr(value, "do_not_call_in_templates", False):
+        return NO_CALL
+    if getattr(value, "alters_data", False):
+        return NO_ALTERS
+    return CALL
+
+
+def _call(value, mode):
+    """
+    Apply the callable ``mode`` to ``value``.
+    """
+    if mode == NO_CALL:
+        return value
+    if mode == NO_ALTERS:
+        return "<< invalid -- no data alteration >>"
+    try:  # method call (assuming no args required)
+        return value()
+    except TypeError:  # arguments *were* required
+        # GOTCHA: This will also catch any TypeError
+        # raised in the function itself.
+        return settings.TEMPLATE_STRING_IF_INVALID  # invalid method call
+
+
+class FailedLookup(Exception):
+    """
+    Raised internally when no lookup kind works for a path segment.
+    """
+
+
+class FieldAccessor(object):
+    """
+    A precompiled accessor for an export field spec.
+
+    The field spec is decoded and split once.  As objects are resolved,
+    the accessor records which lookup kind worked for each path segment
+    (for the type seen there), and for methods whether they are called;
+    later objects of the same type then skip straight to that lookup.
+    The results are the same as those of ``resolve_lookup``.
+    """
+
+    def __init__(self, fieldname):
+        self.fieldname = fieldname
+        self.name, self.title, self.none_str = decode_field(fieldname)
+        self.bits = tuple(self.name.split("."))
+        # for each segment: None, or (type, lookup kind, callable mode)
+        self.plan = [None] * len(self.bits)
+
+    def _learn(self, index, owner, kind):
+        """
+        Record the lookup kind for the segment, when it is safe to do so
+        for every object of the same type.
+        """
+        owner_type = type(owner)
+        if kind == ATTRIBUTE_LOOKUP:
+            if getattr(owner_type, "__getitem__", None) is not None:
+                # a dictionary lookup may work for other instances
+                return
+            attr = getattr(owner_type, self.bits[index], None)
+            if inspect.isfunction(attr):
+                mode = _callable_mode(attr)
+            else:
+                mode = None  # check the value each time
+        elif kind == INDEX_LOOKUP:
+            if not issubclass(owner_type, (list, tuple)):
+                return
+            mode = None
+        else:
+            mode = None
+        self.plan[index] = (owner_type, kind, mode)
+
+    def _lookup(self, index, current):
+        """
+        Full lookup ladder: dictionary, then attribute, then list-index.
+        """
+        bit = self.bits[index]
+        try:  # dictionary lookup
+            value = current[bit]
+        except (TypeError, AttributeError, KeyError, ValueError):
+            pass
+        else:
+            self._learn(index, current, DICT_LOOKUP)
+            return value
+        return self._lookup_attribute(index, current, learn=True)
+
+    def _lookup_attribute(self, index, current, learn=False):
+        """
+        The lookup ladder from the attribute lookup onwards.
+        """
+        bit = self.bits[index]
+        try:  # attribute lookup
+            value = getattr(current, bit)
+        except (TypeError, AttributeError):
+            pass
+        else:
+            if learn:
+                self._learn(index, current, ATTRIBUTE_LOOKUP)
+            return value
+        try:  # list-index lookup
+            value = current[int(bit)]
+        except (
+            IndexError,  # list index out of range
+            ValueError,  # invalid literal for int()
+            KeyError,  # current is a dict without `int(bit)` key
+            TypeError,
+        ):  # unsubscriptable object
+            raise FailedLookup(
+                "Failed lookup for key [%s] in %r" % (bit, current)
+            )  # missing attribute
+        if learn:
+            self._learn(index, current, INDEX_LOOKUP)
+        return value
+
+    def resolve(self, object):
+        """
+        Resolve this field against ``object``, without formatting.
+        """
+        current = object
+        try:  # catch-all for silent variable failures
+            for index, bit in enumerate(self.bits):
+                if current is None:
+                    return ""
+                step = self.plan[index]
+                if step is None or step[0] is not type(current):
+                    current = self._lookup(index, current)
+                    mode = None
+                else:
+                    kind, mode = step[1], step[2]
+                    if kind == ATTRIBUTE_LOOKUP:
+                        try:
+                            current = getattr(current, bit)
+                        except (TypeError, AttributeError):
+                            # the type is not subscriptable.
+                            raise FailedLookup(
+                                "Failed lookup for key [%s] in %r" % (bit, current)
+                            )
+                    elif kind == DICT_LOOKUP:
+                        try:
+                            current = current[bit]
+                        except (TypeError, AttributeError, KeyError, ValueError):
+                            current = self._lookup_attribute(index, current)
+                            mode = None
+                    else:
+                        current = self._lookup_attribute(index, current)
+                if mode is not None:
+                    current = _call(current, mode)
+                elif callable(current):
+                    current = _call(current, _callable_mode(current))
+        except FailedLookup as e:
+            return str(e)
+        except Exception as e:
+            if getattr(e, "silent_variable_failure", False):
+                current = "<< invalid -- exception >>"
+            else:
+                raise
+
+        if current is None and self.none_str is not None:
+            current = self.none_str
+        return current
+
+    def __call__(self, object):
+        return force_str(self.resolve(object))
+
+
+_accessor_cache = {}
+
+
+def get_accessor(model, fieldname):
+    """
+    Return the (cached) ``FieldAccessor`` for ``fieldname`` on ``model``.
+    """
+    key = (model, fieldname)
+    try:
+        return _accessor_cache[key]
+    except KeyError:
+        accessor = _accessor_cache[key] = FieldAccessor(fieldname)
+        return accessor
+
+
+def get_accessors(model, fields):
+    """
+    Return the list of accessors for the given export fields.
+    """
+    return [get_accessor(model, f) for f in fields]
+
+
+#####################################################################
+
+
 def resolve_lookup(object, fieldname):
     """
     This function originally found in django.templates.base.py, modified
@@ -140,53 +730,40 @@ def resolve_lookup(object, fieldname):
     i.e., this function returns the same as ``{{ object.name }}``  would
     in a template.
     """
-    name, title, none_str = decode_field(fieldname)
-    current = object
-    try:  # catch-all for silent variable failures
-        for bit in name.split("."):
-            if current is None:
-                return ""
-            try:  # dictionary lookup
-                current = current[bit]
-            except (TypeError, AttributeError, KeyError, ValueError):
-                try:  # attribute lookup
-                    current = getattr(current, bit)
-                except (TypeError, AttributeError):
-                    try:  # list-index lookup
-                        current = current[int(bit)]
-                    except (
-                        IndexError,  # list index out of range
-                        ValueError,  # invalid literal for int()
-                        KeyError,  # current is a dict without `int(bit)` key
-                        TypeError,
-                    ):  # unsubscriptable object
-                        return "Failed lookup for key [%s] in %r" % (
-                            bit,
-                            current,
-                        )  # missing attribute
-            if callable(current):
-                if getattr(current, "do_not_call_in_templates", False):
-                    pass
-                elif getattr(current, "alters_data", False):
-                    current = "<< invalid -- no data alteration >>"
-                else:
-                    try:  # method call (assuming no args required)
-                        current = current()
-                    except TypeError:  # arguments *were* required
-                        # GOTCHA: This will also catch any TypeError
-                        # raised in the function itself.
-                        current = (
-                            settings.TEMPLATE_STRING_IF_INVALID
-                        )  # invalid method call
-    except Exception as e:
-        if getattr(e, "silent_variable_failure", False):
-            current = "<< invalid -- exception >>"
-        else:
-            raise
+    return get_accessor(type(object), fieldname)(object)
 
-    if current is None and none_str is not None:
-        current = none_str
-    return force_text(current)
+
+#####################################################################
+
+
+def get_sync_view_class(view):
+    """
+    Return the (sync) export view class of a view function, or class;
+    async export views name theirs as ``sync_view_class``.
+    """
+    view_class = getattr(view, "view_class", view)
+    return (
+        getattr(view, "sync_view_class", None)
+        or getattr(view_class, "sync_view_class", None)
+        or view_class
+    )
+
+
+def make_export_view(view_class, path, query_string, user, **initkwargs):
+    """
+    Return an export view instance set up for a GET request, without
+    an actual (client) request; e.g., for background jobs and workers.
+    """
+    request = HttpRequest()
+    request.method = "GET"
+    request.path = path
+    request.GET = QueryDict(query_string)
+    request.user = user or AnonymousUser()
+    view = view_class(**initkwargs)
+    view.request = request
+    view.args = ()
+    view.kwargs = {}
+    return view
 
 
 #####################################################################
@@ -3,20 +3,96 @@ Views for admin exports.
 """
 #######################################################################
 
+import calendar
+import datetime
 import mimetypes
+import shutil
+import tempfile
+from itertools import islice
+from operator import attrgetter, itemgetter
 
-from django.contrib.auth import get_permission_codename
+from django.conf import settings
+from django.contrib.admin.sites import site
 from django.contrib.contenttypes.models import ContentType
 from django.core import serializers
-from django.core.exceptions import ImproperlyConfigured
-from django.http import HttpResponse
-from django.template import TemplateDoesNotExist, loader
+from django.core.exceptions import (
+    EmptyResultSet,
+    FieldDoesNotExist,
+    ImproperlyConfigured,
+    PermissionDenied,
+)
+from django.db import connections
+from django.db.models import Count, Max, UUIDField, prefetch_related_objects
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404
 from django.template.response import TemplateResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.views.generic import View
 from django.views.generic.list import ListView
 from latex.djangoviews import LaTeXListView
-from spreadsheet import sheetWriter
 
-from .utils import default_latex_template, resolve_lookup, titlize
+from .annotations import get_annotations, get_output_fields
+from .compression import CONTENT_TYPES as COMPRESSED_CONTENT_TYPES
+from .compression import EXTENSIONS as COMPRESSED_EXTENSIONS
+from .compression import (
+    PRECOMPRESSED_FORMATS,
+    compress_response,
+    compression_enabled,
+    get_encodings,
+    negotiate_encoding,
+)
+from .converters import TEXT_CONVERTERS, get_cell_types, get_converters
+from .jobs import is_stale, job_status, recover_jobs
+from .metrics import NULL_METRICS, ExportMetrics, metrics_enabled
+from .models import ExportJob
+from .pdf import render_pdf
+from .permissions import filter_queryset, get_permission_scope
+from .plan import find_template, get_export_plan, get_template_fields
+from .resultcache import ExportResultCache, get_result_cache
+from .selection import load_selection, restore_selection
+from .sheets import build_sheet_plans, get_model_title, parse_sheets
+from .sharding import get_shard_ranges, get_worker_count, map_shards
+from .watermarks import (
+    WATERMARK_HEADER,
+    format_watermark,
+    load_watermark,
+    parse_watermark,
+    store_watermark,
+)
+from .utils import (
+    default_latex_template,
+    get_accessors,
+    get_prefetch_serializer,
+    get_related_lookups,
+    get_value_columns,
+    titlize,
+)
+from .writers import get_formats, get_writer_class
+
+#######################################################################
+
+# view initkwargs which are not passed on to shards.
+SHARD_LOCAL_INITKWARGS = ("selection_data", "shard", "progress_callback")
+
+#######################################################################
+
+
+def _convert(resolve, convert):
+    """
+    Compose a column resolver and a cell converter.
+    """
+    if convert is None:
+        return resolve
+    return lambda item: convert(resolve(item))
+
 
 #######################################################################
 
@@ -31,6 +107,28 @@ class ExportMixin(object):
     export_fields = None  # or a list of strings; field names for export.
     template_base = "admin"  # /app_label/model/export will be added.
     export_fields_template_name = "export_fields.txt"
+    export_select_related = None  # or a list of extra select_related lookups
+    export_prefetch_related = None  # or a list of extra prefetch lookups
+    export_annotations = None  # or a dict of aliases to SQL expressions
+    chunk_size = 2000  # rows fetched from the database at a time
+    values_fast_path = True  # use values_list() when all fields are columns
+    keyset_pagination = True  # page through the results by primary key
+    selection_data = None  # a stored selection, e.g., for background jobs
+    progress_callback = None  # called with the number of rows per chunk
+    export_modified_field = None  # a last modified field; see is_versioned()
+    shard = None  # a (low, high) primary key range, for sharded exports
+    export_watermark_field = None  # a monotonic field, for delta exports
+    watermark_window = None  # (field, since, until), once resolved
+    export_conditional = None  # send validators; default from settings
+    cache_export_plan = True  # False if the plan varies by request
+    metrics = NULL_METRICS  # see ``admin_export.metrics``
+    _contenttype = None
+    _plan = None
+    _export_version = None
+
+    def __init__(self, **kwargs):
+        super(ExportMixin, self).__init__(**kwargs)
+        self.view_initkwargs = kwargs
 
     # allow post to this view -- admin actions.
     # def post(self, *args, **kwargs):
@@ -39,11 +137,18 @@ class ExportMixin(object):
         """
         Get the content type of the model.
         """
-        contenttype_pk = self.request.GET.get("contenttype", None)
-        if contenttype_pk is None:
-            raise ImproperlyConfigured("Export views require a contenttype paramter")
-        ct = ContentType.objects.get(pk=contenttype_pk)
-        return ct
+        if self._contenttype is None:
+            contenttype_pk = self.request.GET.get("contenttype", None)
+            if contenttype_pk is None:
+                raise ImproperlyConfigured(
+                    "Export views require a contenttype paramter"
+                )
+            try:
+                contenttype_pk = int(contenttype_pk)
+            except ValueError:
+                raise Http404("Invalid contenttype")
+            self._contenttype = ContentType.objects.get_for_id(contenttype_pk)
+        return self._contenttype
 
     def get_model(self):
         """
@@ -51,6 +156,20 @@ class ExportMixin(object):
         """
         return self.get_contenttype().model_class()
 
+    def get_model_admin(self):
+        """
+        Return the model admin registered for the model, if any.
+        """
+        return site._registry.get(self.get_model(), None)
+
+    def get_export_option(self, name, default=None):
+        """
+        Return an export option; a model admin attribute of the same name
+        overrides the attribute on this view.
+        """
+        value = getattr(self, name, default)
+        return getattr(self.get_model_admin(), name, value)
+
     def get_export_fields_template_name(self):
         """
         Return the template name for export fields.
@@ -74,12 +193,9 @@ class ExportMixin(object):
             return self.export_fields
 
         # field list from template:
-        try:
-            t = loader.get_template(self.get_export_fields_template_name())
-        except TemplateDoesNotExist:
-            pass
-        else:
-            self.export_fields = t.render({}).strip().split("\n")
+        fields = get_template_fields(self.get_export_fields_template_name())
+        if fields is not None:
+            self.export_fields = fields
             return self.export_fields
 
         # introspection!
@@ -94,6 +210,88 @@ class ExportMixin(object):
         fields = self.get_export_fields()
         return [titlize(model_class, f) for f in fields]
 
+    def get_accessors(self):
+        """
+        Return the accessors for the export fields.
+        """
+        return get_accessors(self.get_model(), self.get_export_fields())
+
+    def get_cell_types(self):
+        """
+        Return the cell type of each export field (see ``converters``).
+        """
+        model = self.get_model()
+        return get_cell_types(
+            model,
+            self.get_export_fields(),
+            get_output_fields(model, self.get_annotations()),
+        )
+
+    def get_annotations(self):
+        """
+        Return the ``(alias, expression)`` pairs of the annotation columns
+        of the export fields; see ``admin_export.annotations``.
+        """
+        return get_annotations(
+            self.get_model(),
+            self.get_export_fields(),
+            self.get_export_option("export_annotations", None),
+        )
+
+    def get_custom_template(self):
+        """
+        Return the custom template for this export, or ``None``.
+        """
+        return None
+
+    def get_plan(self):
+        """
+        Return the ``ExportPlan`` for this export; which is resolved once
+        per request (and cached across requests).
+        """
+        if self._plan is None:
+            if not self.is_supported_format(self.get_format()):
+                raise Http404("Unsupported export format")
+            self._plan = get_export_plan(self)
+        return self._plan
+
+    def is_supported_format(self, format):
+        """
+        Return True if this view can export the format.
+        """
+        return True
+
+    def get_related_lookups(self):
+        """
+        Return the pair ``(select_related, prefetch_related)`` of lookups
+        to apply to the queryset.
+        These are inferred from the export fields; override this (or set
+        ``export_select_related``/``export_prefetch_related``, on the view
+        or the model admin) for relations which cannot be inferred, e.g.,
+        those used in methods.
+        """
+        select_related, prefetch_related = get_related_lookups(
+            self.get_model(), self.get_export_fields()
+        )
+        for lookup in self.get_export_option("export_select_related", None) or []:
+            if lookup not in select_related:
+                select_related.append(lookup)
+        for lookup in self.get_export_option("export_prefetch_related", None) or []:
+            if lookup not in prefetch_related:
+                prefetch_related.append(lookup)
+        return select_related, prefetch_related
+
+    def get_value_columns(self):
+        """
+        Return the pair ``(paths, columns)`` when every export field is a
+        plain column, so that rows can be fetched with ``values_list()``
+        instead of building model instances; otherwise return ``None``.
+        """
+        if not self.values_fast_path:
+            return None
+        aliases = [alias for alias, expression in self.get_annotations()]
+        return get_value_columns(self.get_model(), self.get_export_fields(), aliases)
+
     def get_template_names(self):
         """
         Get the template name.
@@ -113,33 +311,29 @@ class ExportMixin(object):
     def security_filter(self, queryset):
         """
         Check to ensure that it's reasonable to release data contained
-        in this queryset.
+        in this queryset (of the export model, or a related model); see
+        ``admin_export.permissions``.
         """
         if not self.request.user:
-            return queryset.empty()
-        model = self.get_model()
-        codename = get_permission_codename("change", model._meta)
-        permname = "%s.%s" % (model._meta.app_label, codename)
-        if self.request.user.has_perm(permname):
-            return queryset
-        # adaptively attempt to use django guardian.
-        try:
-            from guardian.shortcuts import get_objects_for_user
-        except ImportError:
-            pass
-        else:
-            user_qs = get_objects_for_user(self.request.user, permname)
-            user_pk_list = user_qs.values_list("pk", flat=True)
-            return queryset.filter(pk__in=user_pk_list)
-        return queryset.none()
+            return queryset.none()
+        scope = get_permission_scope(self.request.user, queryset.model)
+        return filter_queryset(queryset, scope)
 
-    def get_queryset(self):
+    def get_selected_queryset(self):
         """
-        Get the actual queryset.
+        Get the queryset for the selection, before any security filtering.
         """
         model = self.get_model()
         qs = model.objects.all()
-        if "pk" in self.request.GET:
+        if self.selection_data is not None:
+            qs = restore_selection(model, self.selection_data)
+            if qs is None:
+                raise Http404("This export selection is for another model")
+        elif "selection" in self.request.GET:
+            qs = load_selection(model, self.request.GET.get("selection"))
+            if qs is None:
+                raise Http404("This export selection has expired")
+        elif "pk" in self.request.GET:
             selected = self.request.GET.getlist("pk")
             qs = qs.filter(pk__in=selected)
         elif "query" in self.request.GET:
@@ -149,9 +343,585 @@ class ExportMixin(object):
                 qs = qs.filter(pk__in=selected)
         else:
             qs = qs.none()
-        qs = self.security_filter(qs)
         return qs
 
+    def get_watermark_window(self):
+        """
+        Return ``(field, since, until)`` for a delta export, or ``None``;
+        see ``admin_export.watermarks``.
+        ``since`` is ``None`` when there is no previous watermark; and
+        ``until`` is ``None`` when no rows have changed.
+        """
+        if self.watermark_window is None:
+            self.watermark_window = self.resolve_watermark_window() or ()
+        return self.watermark_window or None
+
+    def resolve_watermark_window(self):
+        name = self.get_export_option("export_watermark_field", None)
+        since = self.request.GET.get("since", None)
+        if not name or since is None:
+            return None
+        field = self.get_model()._meta.get_field(name)
+        if since == "last":
+            since = load_watermark(self.request.user, self.get_contenttype(), name)
+        if since is not None:
+            try:
+                since = parse_watermark(field, since)
+            except ValueError:
+                raise Http404("Invalid watermark")
+        qs = self.security_filter(self.get_selected_queryset())
+        if since is not None:
+            qs = qs.filter(**{name + "__gt": since})
+        until = qs.aggregate(until=Max(name))["until"]
+        return name, since, until
+
+    def get_shard_initkwargs(self):
+        """
+        Return the view attributes for shards in worker processes: the
+        ``as_view()`` initkwargs of this view, and its resolved export
+        options.
+        """
+        self.get_watermark_window()
+        plan = self.get_plan()
+        select_related, prefetch_related = plan.related_lookups
+        initkwargs = {
+            name: value
+            for name, value in self.view_initkwargs.items()
+            if name not in SHARD_LOCAL_INITKWARGS
+        }
+        initkwargs.update(
+            export_fields=list(plan.fields),
+            export_annotations=dict(plan.annotations) or None,
+            export_select_related=list(select_related),
+            export_prefetch_related=list(prefetch_related),
+            chunk_size=self.get_chunk_size(),
+            watermark_window=self.watermark_window,
+        )
+        return initkwargs
+
+    def get_filtered_queryset(self):
+        """
+        Get the queryset of the exported rows, without the annotations
+        and related lookups; e.g., for counting them.
+        """
+        qs = self.security_filter(self.get_selected_queryset())
+        window = self.get_watermark_window()
+        if window is not None:
+            name, since, until = window
+            if until is None:
+                qs = qs.none()
+            elif since is None:
+                qs = qs.filter(**{name + "__lte": until})
+            else:
+                qs = qs.filter(**{name + "__gt": since, name + "__lte": until})
+        if self.shard is not None:
+            low, high = self.shard
+            qs = qs.filter(pk__gte=low, pk__lt=high)
+        return qs
+
+    def get_queryset(self):
+        """
+        Get the actual queryset.
+        """
+        qs = self.get_filtered_queryset()
+        plan = self.get_plan()
+        if plan.annotations:
+            qs = qs.annotate(**dict(plan.annotations))
+        select_related, prefetch_related = plan.related_lookups
+        if select_related:
+            qs = qs.select_related(*select_related)
+        if prefetch_related:
+            qs = qs.prefetch_related(*prefetch_related)
+        return qs
+
+    def get_chunk_size(self):
+        """
+        Return the number of rows fetched from the database at a time.
+        """
+        return self.chunk_size
+
+    def iter_chunks(self, queryset, key=None, progress=True):
+        """
+        Generate the results of the queryset as lists of (at most)
+        ``get_chunk_size()`` items.
+
+        With ``keyset_pagination`` each chunk is a separate short query,
+        ``pk > last_seen ORDER BY pk LIMIT n``; so no server-side cursor
+        or long-lived transaction is held, and the cost of a chunk does
+        not depend on how far into the table it is.  Note that the
+        results are then in primary key order.
+        ``key`` returns the primary key of an item (default: ``obj.pk``).
+        The chunks are reported as progress, unless ``progress`` is False.
+        """
+        chunk_size = self.get_chunk_size()
+        if not self.keyset_pagination:
+            iterator = queryset.iterator(chunk_size=chunk_size)
+            while True:
+                with self.metrics.phase("query"):
+                    chunk = list(islice(iterator, chunk_size))
+                if not chunk:
+                    return
+                yield chunk
+                if progress:
+                    self.report_progress(len(chunk))
+                if len(chunk) < chunk_size:
+                    return
+        if key is None:
+            key = attrgetter("pk")
+        queryset = queryset.order_by("pk")
+        page = queryset
+        while True:
+            with self.metrics.phase("query"):
+                chunk = list(page[:chunk_size])
+            if not chunk:
+                return
+            yield chunk
+            if progress:
+                self.report_progress(len(chunk))
+            if len(chunk) < chunk_size:
+                return
+            page = queryset.filter(pk__gt=key(chunk[-1]))
+
+    def report_progress(self, count):
+        """
+        Report that ``count`` more rows have been exported.
+        """
+        self.metrics.add_rows(count)
+        if self.progress_callback is not None:
+            self.progress_callback(count)
+
+    def get_shards(self, queryset):
+        """
+        Return the primary key ranges to export in separate worker
+        processes; or ``None`` to export in this process.
+        """
+        if self.shard is not None or not self.keyset_pagination:
+            return None
+        if any(c.in_atomic_block for c in connections.all()):
+            # the connections cannot be handed over to the workers.
+            return None
+        return get_shard_ranges(queryset, get_worker_count(self))
+
+    def map_shards(self, method, shards):
+        """
+        Generate the results of ``method`` for each shard (in order), as
+        run in worker processes.
+        """
+        results = map_shards(self, method, shards, get_worker_count(self))
+        while True:
+            with self.metrics.phase("shards"):
+                try:
+                    count, result = next(results)
+                except StopIteration:
+                    return
+            self.report_progress(count)
+            yield result
+
+    def iter_object_chunks(self, queryset):
+        """
+        Generate the objects of the queryset in chunks (lists), without
+        caching the results.
+        Prefetching is done one chunk at a time.
+        """
+        prefetch_related = self.get_plan().related_lookups[1]
+        for chunk in self.iter_chunks(queryset.prefetch_related(None)):
+            if prefetch_related:
+                with self.metrics.phase("query"):
+                    prefetch_related_objects(chunk, *prefetch_related)
+            yield chunk
+
+    def iter_objects(self, queryset):
+        """
+        Iterate over the objects of the queryset in chunks.
+        """
+        for chunk in self.iter_object_chunks(queryset):
+            for obj in chunk:
+                yield obj
+
+    def iter_value_chunks(self, queryset, paths):
+        """
+        Generate the ``values_list()`` tuples of the queryset in chunks.
+        """
+        if "pk" not in paths:
+            paths = list(paths) + ["pk"]
+        queryset = queryset.prefetch_related(None).values_list(*paths)
+        return self.iter_chunks(queryset, key=itemgetter(paths.index("pk")))
+
+    def iter_values(self, queryset, paths):
+        """
+        Iterate over the ``values_list()`` tuples of the queryset in chunks.
+        """
+        for chunk in self.iter_value_chunks(queryset, paths):
+            for row in chunk:
+                yield row
+
+    def get_cells(self, plan, converters=None):
+        """
+        Return a function for each column of the plan (an ``ExportPlan``,
+        or the like), which resolves the column of an item and converts
+        it with the converters for the cell types of the columns (by
+        default, to text).  The items are ``values_list()`` rows if the
+        plan has value columns, and objects otherwise.
+        """
+        if plan.value_columns is not None:
+            columns = plan.value_columns[1]
+        else:
+            columns = plan.accessors
+        if converters is None:
+            converters = TEXT_CONVERTERS
+        return [
+            _convert(column.resolve, convert)
+            for column, convert in zip(
+                columns, get_converters(plan.cell_types, converters)
+            )
+        ]
+
+    def get_item_key(self, plan):
+        """
+        Return a function of an item of the plan (see ``get_cells()``)
+        which returns its primary key.
+        """
+        if plan.value_columns is None:
+            return attrgetter("pk")
+        paths = plan.value_columns[0]
+        # see iter_value_chunks()
+        return itemgetter(paths.index("pk") if "pk" in paths else len(paths))
+
+    def iter_body_chunks(self, queryset, converters=None):
+        """
+        Generate ``(items, rows)`` for each chunk of the queryset: the
+        items (see ``get_cells()``), and their rows of the export.
+        The queryset is iterated in chunks, so that the full result set
+        is never held in memory.
+        """
+        plan = self.get_plan()
+        cells = self.get_cells(plan, converters)
+        if plan.value_columns is not None:
+            chunks = self.iter_value_chunks(queryset, plan.value_columns[0])
+        else:
+            chunks = self.iter_object_chunks(queryset)
+        for chunk in chunks:
+            # rows are resolved a chunk at a time, to time them cheaply.
+            with self.metrics.phase("rows"):
+                rows = [[c(item) for c in cells] for item in chunk]
+            yield chunk, rows
+
+    def iter_body_rows(self, queryset, converters=None):
+        """
+        Generate the rows of the export for the queryset (no headers);
+        see ``iter_body_chunks()``.
+        """
+        for chunk, rows in self.iter_body_chunks(queryset, converters):
+            for row in rows:
+                yield row
+
+    def iter_rows(self):
+        """
+        Generate the rows of the export (no headers).
+        """
+        queryset = self.get_queryset()
+        shards = self.get_shards(self.get_filtered_queryset())
+        if shards is None:
+            for row in self.iter_body_rows(queryset):
+                yield row
+            return
+        for rows in self.map_shards("render_rows_shard", shards):
+            for row in rows:
+                yield row
+
+    def render_rows_shard(self):
+        """
+        Return the rows for this shard (in a worker process).
+        """
+        return list(self.iter_body_rows(self.get_queryset()))
+
+    def get_selection_fingerprint(self, queryset):
+        """
+        Return a fingerprint of the selection, i.e., the SQL for it.
+        """
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return None
+        return [sql, [str(p) for p in params]]
+
+    def get_data_version(self, queryset):
+        """
+        Return a cheap version for the data in the queryset: the row
+        count, the largest primary key and, if ``export_modified_field``
+        is set, the latest modification.
+        """
+        aggregates = {"count": Count("pk")}
+        if not isinstance(queryset.model._meta.pk, UUIDField):
+            aggregates["max_pk"] = Max("pk")
+        modified_field = self.get_modified_field(queryset.model)
+        if modified_field:
+            aggregates["modified"] = Max(modified_field)
+        return queryset.order_by().aggregate(**aggregates)
+
+    def get_modified_field(self, model=None):
+        """
+        Return the name of the ``export_modified_field`` of the model
+        (default: the export model); or ``None`` if it has none.
+        """
+        name = self.get_export_option("export_modified_field")
+        if not name:
+            return None
+        if model is None:
+            model = self.get_model()
+        try:
+            model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        return name
+
+    def is_versioned(self):
+        """
+        Return True if the data version changes whenever the exported
+        rows do.  This needs an ``export_modified_field``: without one,
+        the version (the row count and largest primary key) misses rows
+        updated in place.
+        """
+        return self.get_modified_field() is not None
+
+    def get_result_cache(self):
+        """
+        Return the result cache, or ``None`` if results are not cached
+        (or the cache is bypassed for this request, with ``cache=0`` or
+        ``Cache-Control: no-cache``).  Only versioned exports (see
+        ``is_versioned()``) are cached, since the key would not change
+        when rows are updated in place.
+        """
+        if not self.is_versioned():
+            return None
+        if self.request.GET.get("cache", None) == "0":
+            return None
+        if "no-cache" in self.request.META.get("HTTP_CACHE_CONTROL", ""):
+            return None
+        return get_result_cache()
+
+    def get_export_version(self, queryset):
+        """
+        Return the list of everything which determines the content of
+        the export of the queryset; the data version is only queried once
+        per request.
+        """
+        if self._export_version is None:
+            self._export_version = [
+                self.__class__.__module__,
+                self.__class__.__name__,
+                self.get_contenttype().pk,
+                self.get_selection_fingerprint(queryset),
+                self.get_plan().fields,
+                [[a, str(e)] for a, e in self.get_plan().annotations],
+                self.get_format(),
+                self.get_data_version(queryset),
+            ]
+        return self._export_version
+
+    def get_result_cache_key(self, queryset):
+        """
+        Return the result cache key for the export of the queryset.
+        """
+        return ExportResultCache.make_key(*self.get_export_version(queryset))
+
+    def is_conditional(self):
+        """
+        Return True if responses should carry validators (and requests
+        with matching ones be answered with 304 Not Modified).
+        Only versioned exports (see ``is_versioned()``) are conditional;
+        otherwise clients could keep stale copies of updated rows.
+        """
+        if not self.is_versioned():
+            return False
+        default = getattr(settings, "ADMIN_EXPORT_CONDITIONAL", True)
+        value = self.get_export_option("export_conditional", None)
+        return default if value is None else value
+
+    def get_validators(self, compression=None):
+        """
+        Return ``(etag, last_modified)`` for the export; ``last_modified``
+        is a timestamp, or ``None`` unless the ``export_modified_field``
+        is a date/time.
+        """
+        version = self.get_export_version(self.get_filtered_queryset())
+        etag = '"{0}"'.format(ExportResultCache.make_key(compression, *version))
+        modified = version[-1].get("modified", None)
+        if isinstance(modified, datetime.datetime):
+            return etag, calendar.timegm(modified.utctimetuple())
+        return etag, None
+
+    def get(self, request, *args, **kwargs):
+        """
+        Export, with instrumentation; see ``admin_export.metrics``.
+        """
+        if not metrics_enabled():
+            return self.get_export_response(request, *args, **kwargs)
+        self.metrics = ExportMetrics(self)
+        try:
+            with self.metrics.phase("plan"):
+                self.get_plan()
+            response = self.get_export_response(request, *args, **kwargs)
+        except BaseException:
+            self.metrics.abort()
+            raise
+        return self.metrics.attach(response)
+
+    def get_export_response(self, request, *args, **kwargs):
+        """
+        Return the response for the export, compressed if appropriate;
+        or 304 Not Modified, if the client has the current version.
+        """
+        compression = self.get_compression()
+        validators = None
+        if self.is_conditional():
+            with self.metrics.phase("cache"):
+                validators = self.get_validators(compression)
+            etag, last_modified = validators
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is not None:
+                # not modified (or a failed precondition).
+                self.add_validators(response, validators)
+                return response
+        response = self.get_cached_response(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        self.add_watermark(response)
+        self.add_validators(response, validators)
+        if compression is None:
+            return response
+        encoding, as_file = compression
+        if as_file:
+            filename = (response.get("Filename", None) or self.get_filename()) + (
+                COMPRESSED_EXTENSIONS[encoding]
+            )
+            response["Filename"] = filename
+            response["Content-Disposition"] = "attachment; filename={0}".format(
+                filename
+            )
+            response["Content-Type"] = COMPRESSED_CONTENT_TYPES[encoding]
+        else:
+            response["Content-Encoding"] = encoding
+        return compress_response(response, encoding)
+
+    def add_validators(self, response, validators):
+        if compression_enabled() and "compress" not in self.request.GET:
+            patch_vary_headers(response, ["Accept-Encoding"])
+        if validators is None:
+            return
+        etag, last_modified = validators
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+
+    def get_compression(self):
+        """
+        Return ``(encoding, as_file)`` for compressed output, or ``None``;
+        see ``admin_export.compression``.
+        """
+        requested = self.request.GET.get("compress", None)
+        if requested:
+            if requested not in get_encodings():
+                raise Http404("Unsupported compression")
+            return requested, True
+        if not compression_enabled() or self.get_format() in PRECOMPRESSED_FORMATS:
+            return None
+        accept_encoding = self.request.META.get("HTTP_ACCEPT_ENCODING", "")
+        encoding = negotiate_encoding(accept_encoding)
+        if encoding is None:
+            return None
+        return encoding, False
+
+    def add_watermark(self, response):
+        """
+        For delta exports, add the new watermark to the response; it is
+        stored once the export is complete.
+        """
+        window = self.get_watermark_window()
+        if window is None:
+            return
+        name, since, until = window
+        if until is None:
+            until = since
+        if until is not None:
+            response[WATERMARK_HEADER] = format_watermark(until)
+
+            def store(response=None):
+                store_watermark(self.request.user, self.get_contenttype(), name, until)
+
+            self.on_complete(response, store)
+
+    def on_complete(self, response, callback):
+        """
+        Call ``callback`` once the response content is complete.
+        """
+        if response.streaming:
+            response.streaming_content = self._call_after(
+                response.streaming_content, callback
+            )
+        elif getattr(response, "is_rendered", True):
+            callback(response)
+        else:
+            response.add_post_render_callback(callback)
+
+    def _call_after(self, content, callback):
+        for chunk in content:
+            yield chunk
+        callback()
+
+    def get_cached_response(self, request, *args, **kwargs):
+        """
+        Serve the export from the result cache, when possible.
+        """
+        cache = self.get_result_cache()
+        if cache is None:
+            return super(ExportMixin, self).get(request, *args, **kwargs)
+        with self.metrics.phase("cache"):
+            key = self.get_result_cache_key(self.get_filtered_queryset())
+            entry = cache.get(key)
+        if entry is not None:
+            data, headers = entry
+            response = FileResponse(data)
+            for header, value in headers:
+                response[header] = value
+            response["X-Export-Cache"] = "hit"
+            return response
+        response = super(ExportMixin, self).get(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        if response.streaming:
+            response.streaming_content = self._tee_to_cache(
+                cache, key, response.streaming_content, list(response.items())
+            )
+        elif getattr(response, "is_rendered", True):
+            self._store_in_cache(cache, key, response)
+        else:
+            response.add_post_render_callback(
+                lambda r: self._store_in_cache(cache, key, r)
+            )
+        response["X-Export-Cache"] = "miss"
+        return response
+
+    def _store_in_cache(self, cache, key, response):
+        fp = cache.open_entry()
+        with fp:
+            fp.write(response.content)
+        cache.commit(key, fp, list(response.items()))
+
+    def _tee_to_cache(self, cache, key, content, headers):
+        fp = cache.open_entry()
+        try:
+            for chunk in content:
+                fp.write(chunk)
+                yield chunk
+        except BaseException:
+            cache.discard(fp)
+            raise
+        fp.close()
+        cache.commit(key, fp, headers)
+
     def is_template_export(self, template):
         """
         Called to see if this will be rendered via a template; or via
@@ -162,16 +932,11 @@ class ExportMixin(object):
             # so be wary of recursion.
             template = self.get_template_names()
 
+        if isinstance(template, str):
+            template = [template]
         if isinstance(template, (list, tuple)):
-            try:
-                return loader.select_template(template)
-            except TemplateDoesNotExist:
-                pass
-        elif isinstance(template, six.string_types):
-            try:
-                return loader.get_template(template)
-            except TemplateDoesNotExist:
-                pass
+            # misses are cached too; see ``admin_export.plan``.
+            return find_template(template)
         # will not be exported via a template.
         return None
 
@@ -186,10 +951,10 @@ class ExportSpreadsheet(ExportMixin, ListView):
 
     include_headers = True
     as_attachment = False
-
-    def __init__(self, *args, **kwargs):
-        self.render_via_template = False
-        return super(ExportSpreadsheet, self).__init__(*args, **kwargs)
+    encoding = "utf-8"
+    export_sheets = None  # or a list of (relation, fields); see ``sheets``
+    export_sheets_template_name = "export_sheets.txt"
+    _sheets = None
 
     def get_format(self):
         """
@@ -202,10 +967,26 @@ class ExportSpreadsheet(ExportMixin, ListView):
             )
         return format
 
-    def is_template_export(self, template):
-        result = super(ExportSpreadsheet, self).is_template_export(template)
-        if result is not None:
-            self.render_via_template = True
+    def is_supported_format(self, format):
+        """
+        Formats with a registered writer, or a custom template.
+        """
+        if format in get_formats():
+            return True
+        return self.get_custom_template() is not None
+
+    @property
+    def render_via_template(self):
+        return self.get_plan().template is not None
+
+    def get_custom_template(self):
+        """
+        Return the custom template for this format, or ``None``.
+        """
+        template_list = super(ExportSpreadsheet, self).get_template_names()
+        format = self.get_format()
+        template_list = [t + "." + format for t in template_list]
+        return self.is_template_export(template_list)
 
     def get_template_names(self):
         """
@@ -215,14 +996,12 @@ class ExportSpreadsheet(ExportMixin, ListView):
         Templates make sense for, e.g., CSV or tab-delimted files;
         but not for binary spreadsheet formats.
         """
-        template_list = super(ExportSpreadsheet, self).get_template_names()
-        format = self.get_format()
-        template_list = [t + "." + format for t in template_list]
-        template = self.is_template_export(template_list)
+        template = self.get_plan().template
         if template is not None:
             # return pre-rendered template
             return template
-        return template_list
+        template_list = super(ExportSpreadsheet, self).get_template_names()
+        return [t + "." + self.get_format() for t in template_list]
 
     def get_filename(self):
         """
@@ -252,23 +1031,206 @@ class ExportSpreadsheet(ExportMixin, ListView):
         response["Content-Type"] = content_type
         return response
 
+    def get_writer(self):
+        """
+        Return the writer backend for the format.
+        """
+        plan = self.get_plan()
+        writer_class = get_writer_class(plan.format)
+        return writer_class(
+            model=plan.model,
+            fields=list(plan.fields),
+            encoding=self.encoding,
+            cell_types=list(plan.cell_types),
+        )
+
+    def is_streaming(self):
+        """
+        Return True if this export should be streamed.
+        """
+        return self.request.GET.get("stream", None) != "0"
+
+    def get_cells(self, plan, converters=None):
+        """
+        By default, the cells are converted to those the writer takes.
+        """
+        if converters is None:
+            converters = self.get_writer().cell_converters
+        return super(ExportSpreadsheet, self).get_cells(plan, converters)
+
+    def get_export_sheets(self):
+        """
+        Return the ``(relation, fields)`` pairs for the related sheets;
+        from ``export_sheets``, or the ``export_sheets.txt`` template.
+        """
+        sheets = self.get_export_option("export_sheets", None)
+        if sheets is not None:
+            return sheets
+        ct = self.get_contenttype()
+        name = "{0}/{1}/{2}".format(
+            ct.app_label, ct.model, self.export_sheets_template_name
+        )
+        if self.template_base:
+            name = self.template_base + "/" + name
+        lines = get_template_fields(name)
+        if lines is None:
+            return []
+        return parse_sheets(lines)
+
+    def get_sheets(self):
+        """
+        Return the ``SheetPlan`` of each related sheet; none unless the
+        writer can write several sheets.
+        """
+        if self._sheets is None:
+            self._sheets = []
+            if not self.render_via_template and self.get_writer().multiple_sheets:
+                self._sheets = build_sheet_plans(
+                    self.get_model(),
+                    self.get_export_sheets(),
+                    self.template_base,
+                    self.values_fast_path,
+                )
+        return self._sheets
+
+    def get_related_queryset(self, sheet, keys):
+        """
+        Return the queryset of the sheet's rows related to the selected
+        rows with primary keys ``keys`` (a list, or a queryset).
+        """
+        qs = sheet.model._default_manager.filter(**{sheet.lookup + "__in": keys})
+        if sheet.distinct:
+            qs = qs.distinct()
+        return self.security_filter(qs)
+
+    def iter_related_rows(self, sheet, keys, seen, converters=None):
+        """
+        Generate the sheet's rows related to the selected rows with
+        primary keys ``keys``, in chunks; skipping (and adding to) the
+        primary keys in ``seen``.
+        """
+        qs = self.get_related_queryset(sheet, keys)
+        if sheet.annotations:
+            qs = qs.annotate(**dict(sheet.annotations))
+        select_related, prefetch_related = sheet.related_lookups
+        if select_related:
+            qs = qs.select_related(*select_related)
+        cells = self.get_cells(sheet, converters)
+        key = self.get_item_key(sheet)
+        if sheet.value_columns is not None:
+            paths = list(sheet.value_columns[0])
+            if "pk" not in paths:
+                paths.append("pk")
+            chunks = self.iter_chunks(qs.values_list(*paths), key=key, progress=False)
+        else:
+            chunks = self.iter_chunks(qs, progress=False)
+        for chunk in chunks:
+            if sheet.distinct:
+                chunk = [item for item in chunk if key(item) not in seen]
+                seen.update(key(item) for item in chunk)
+            if prefetch_related and sheet.value_columns is None:
+                with self.metrics.phase("query"):
+                    prefetch_related_objects(chunk, *prefetch_related)
+            with self.metrics.phase("rows"):
+                rows = [[c(item) for c in cells] for item in chunk]
+            for row in rows:
+                yield row
+
+    def iter_sheet_rows(self, queryset, converters=None):
+        """
+        Generate ``(sheet index, row)`` for the rows of the selection
+        (sheet 0), and after each chunk of them, the related rows of each
+        related sheet.
+        """
+        sheets = self.get_sheets()
+        key = self.get_item_key(self.get_plan())
+        seen = [set() for sheet in sheets]
+        for chunk, rows in self.iter_body_chunks(queryset, converters):
+            for row in rows:
+                yield 0, row
+            keys = [key(item) for item in chunk]
+            for index, sheet in enumerate(sheets):
+                for row in self.iter_related_rows(sheet, keys, seen[index], converters):
+                    yield index + 1, row
+
+    def is_versioned(self):
+        """
+        Related sheets are versioned by their models' modified fields.
+        """
+        if not super(ExportSpreadsheet, self).is_versioned():
+            return False
+        return all(self.get_modified_field(sheet.model) for sheet in self.get_sheets())
+
+    def get_data_version(self, queryset):
+        """
+        The data version includes that of the related sheets.
+        """
+        version = super(ExportSpreadsheet, self).get_data_version(queryset)
+        sheets = self.get_sheets()
+        if sheets:
+            keys = queryset.order_by().values("pk")
+            version["sheets"] = [
+                [
+                    sheet.relation,
+                    sheet.fields,
+                    super(ExportSpreadsheet, self).get_data_version(
+                        self.get_related_queryset(sheet, keys)
+                    ),
+                ]
+                for sheet in sheets
+            ]
+        return version
+
+    def render_bytes_shard(self):
+        """
+        Return the encoded output for this shard (in a worker process).
+        """
+        rows = self.iter_body_rows(self.get_queryset())
+        return b"".join(self.get_writer().iter_bytes(rows))
+
+    def iter_bytes(self):
+        """
+        Generate the encoded output of the export.
+        """
+        writer = self.get_writer()
+        headers = list(self.get_plan().labels) if self.include_headers else None
+        sheets = self.get_sheets()
+        if sheets:
+            titles = [get_model_title(self.get_model())]
+            titles.extend(sheet.title for sheet in sheets)
+            sheet_headers = [headers]
+            sheet_headers.extend(
+                list(sheet.labels) if self.include_headers else None for sheet in sheets
+            )
+            rows = self.iter_sheet_rows(self.get_queryset())
+            for data in writer.iter_sheets_bytes(
+                list(zip(titles, sheet_headers)), rows
+            ):
+                yield data
+            return
+        if not writer.concatenate:
+            for data in writer.iter_bytes(self.iter_rows(), headers):
+                yield data
+            return
+        queryset = self.get_queryset()
+        shards = self.get_shards(self.get_filtered_queryset())
+        if shards is None:
+            for data in writer.iter_bytes(self.iter_body_rows(queryset), headers):
+                yield data
+            return
+        if headers is not None:
+            for data in writer.iter_bytes([], headers):
+                yield data
+        for data in self.map_shards("render_bytes_shard", shards):
+            yield data
+
     def export_spreadsheet_response(self):
         """
         Actually do the spreadsheet export
         """
-        fields = self.get_export_fields()
-        # Future: maybe introspect for field verbose names?
-        headers = self.get_field_labels()
-        if self.include_headers:
-            data = [headers]
-        else:
-            data = []
-        for obj in self.get_queryset():
-            data.append([resolve_lookup(obj, f) for f in fields])
-        # now, construct the data stream.
-        stream = sheetWriter(data, self.get_format())
-        response = HttpResponse(stream)
-        return response
+        if self.is_streaming():
+            return StreamingHttpResponse(self.iter_bytes())
+        return HttpResponse(b"".join(self.iter_bytes()))
 
     def render_to_response(self, context, **response_kwargs):
         """
@@ -278,7 +1240,6 @@ class ExportSpreadsheet(ExportMixin, ListView):
         If any keyword arguments are provided, they will be
         passed to the constructor of the response class.
         """
-        self.get_template_names()
         if self.render_via_template:
             # may need to augment the response appropriately.
             response = super(ExportSpreadsheet, self).render_to_response(
@@ -300,6 +1261,9 @@ class ExportPDF(ExportMixin, LaTeXListView):
 
     as_attachment = False
 
+    def get_format(self):
+        return "pdf"
+
     def get_filename(self, doc=None):
         """
         Return a suggested filename for the export.
@@ -308,22 +1272,68 @@ class ExportPDF(ExportMixin, LaTeXListView):
         filename = "{1}_list.pdf".format(ct.app_label, ct.model)
         return self.fix_filename_extension(filename)
 
+    def get_custom_template(self):
+        """
+        Return the custom LaTeX template for this export, or ``None``.
+        """
+        template_list = super(ExportPDF, self).get_template_names()
+        template_list = [t + ".tex" for t in template_list]
+        # this will pre-render an existing template; or return None
+        return self.is_template_export(template_list)
+
+    def _augment_response(self, response, filename=None):
+        """
+        Augment the response object with extra headers, e.g.,
+        * Filename
+        * Content-Disposition
+        """
+        if filename is None:
+            filename = self.get_filename()
+        response["Filename"] = filename  # IE needs this
+        if self.as_attachment:
+            attachment = "attachment; "
+        else:
+            attachment = ""
+        response["Content-Disposition"] = "{0}filename={1}".format(attachment, filename)
+        return response
+
+    def export_pdf_response(self):
+        """
+        Render the default (table) layout with the segmented PDF pipeline;
+        see ``admin_export.pdf``.
+        """
+        workdir = tempfile.mkdtemp(prefix="admin_export-")
+        try:
+            path = render_pdf(workdir, self.get_plan().labels, self.iter_rows())
+            fp = tempfile.TemporaryFile()
+            with open(path, "rb") as src:
+                shutil.copyfileobj(src, fp)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        fp.seek(0)
+        response = FileResponse(fp, content_type="application/pdf")
+        return self._augment_response(response)
+
+    def render_to_response(self, context, **response_kwargs):
+        """
+        Custom templates are rendered by ``LaTeXListView``; the default
+        layout is compiled in segments.
+        """
+        if self.get_plan().template is not None:
+            return super(ExportPDF, self).render_to_response(context, **response_kwargs)
+        return self.export_pdf_response()
+
     def get_template_names(self):
         """
         Get the template name.
         Note: descendant classes should call this but add their own
         extensions.
         """
-        template_list = super(ExportPDF, self).get_template_names()
-        template_list = [t + ".tex" for t in template_list]
-        # this will pre-render an existing template; or return None
-        template = self.is_template_export(template_list)
-        if template is None:
-            headers = self.get_field_labels()
-            fields = self.get_export_fields()
+        plan = self.get_plan()
+        if plan.template is None:
             # Note: This is a compiled Django template.
-            return default_latex_template(headers, fields)
-        return template
+            return default_latex_template(plan.labels, plan.fields)
+        return plan.template
 
 
 #######################################################################
@@ -335,6 +1345,17 @@ class ExportSerializer(ExportMixin, ListView):
     """
 
     as_attachment = True
+    # (head, separator, tail) of the formats which are streamed by chunk:
+    streaming_envelopes = {
+        "json": ("[", ", ", "]"),
+        "ndjson": ("", "", ""),
+        "xml": (
+            '<?xml version="1.0" encoding="utf-8"?>\n<django-objects version="1.0">',
+            "",
+            "</django-objects>",
+        ),
+        "yaml": ("", "", ""),
+    }
 
     def get_format(self):
         format = self.request.GET.get("format", None)
@@ -344,6 +1365,9 @@ class ExportSerializer(ExportMixin, ListView):
             )
         return format
 
+    def is_supported_format(self, format):
+        return format in serializers.get_public_serializer_formats()
+
     def get_filename(self):
         """
         Return a suggested filename for the export.
@@ -354,6 +1378,78 @@ class ExportSerializer(ExportMixin, ListView):
     def get_as_attachment(self):
         return self.as_attachment
 
+    def get_related_lookups(self):
+        """
+        The serializers do not use the export fields; but they do walk
+        the many-to-many relations of each object.
+        """
+        model = self.get_model()
+        return [], [
+            f.name
+            for f in model._meta.many_to_many
+            if f.remote_field.through._meta.auto_created
+        ]
+
+    def get_annotations(self):
+        """
+        Nor the annotations.
+        """
+        return []
+
+    def get_envelope(self, format):
+        """
+        Return ``(head, separator, tail)`` for streaming the format one
+        chunk at a time; or ``None`` if the format cannot be streamed.
+        """
+        return self.streaming_envelopes.get(format, None)
+
+    def iter_serialized(self, queryset, format, envelope):
+        """
+        Generate the serialized (non-empty) bodies of each chunk of
+        objects, i.e., without the head and tail of the document.
+        """
+        head, separator, tail = envelope
+        serializer_class = get_prefetch_serializer(format)
+        for chunk in self.iter_object_chunks(queryset):
+            data = serializer_class().serialize(chunk)
+            if not (data.startswith(head) and data.endswith(tail)):
+                raise ValueError(
+                    "Unexpected {0} serializer output for streaming".format(format)
+                )
+            body = data[len(head) : len(data) - len(tail)]
+            if body:
+                yield body
+
+    def render_serialized_shard(self):
+        """
+        Return the serialized body for this shard (in a worker process).
+        """
+        format = self.get_format()
+        envelope = self.get_envelope(format)
+        bodies = self.iter_serialized(self.get_queryset(), format, envelope)
+        return envelope[1].join(bodies)
+
+    def stream_serialized(self, queryset, format, envelope):
+        """
+        Generate the serialized document, one chunk of objects at a time.
+        """
+        head, separator, tail = envelope
+        shards = self.get_shards(queryset)
+        if shards is None:
+            bodies = self.iter_serialized(queryset, format, envelope)
+        else:
+            bodies = self.map_shards("render_serialized_shard", shards)
+        yield head
+        first = True
+        for body in bodies:
+            if not body:
+                continue
+            if not first:
+                yield separator
+            first = False
+            yield body
+        yield tail
+
     def _augment_response(self, response, filename=None):
         """
         Augment the response object with extra headers, e.g.,
@@ -376,11 +1472,98 @@ class ExportSerializer(ExportMixin, ListView):
         """
         filename = self.get_filename()
         content_type, encoding = mimetypes.guess_type(filename)
-        response = HttpResponse(content_type=content_type)
         queryset = self.get_queryset()
         format = self.get_format()
-        serializers.serialize(format, queryset, stream=response)
+        envelope = self.get_envelope(format)
+        if envelope is not None:
+            response = StreamingHttpResponse(
+                self.stream_serialized(queryset, format, envelope),
+                content_type=content_type,
+            )
+        else:
+            response = HttpResponse(content_type=content_type)
+            serializers.serialize(format, self.iter_objects(queryset), stream=response)
         return self._augment_response(response, filename=filename)
 
 
+#######################################################################
+
+
+class ExportJobMixin(object):
+    """
+    Common code for the background export job views.
+    """
+
+    def get_job(self):
+        """
+        Return the job; only its owner (or a superuser) can see it.
+        """
+        job = get_object_or_404(ExportJob, pk=self.kwargs["pk"])
+        user = self.request.user
+        if job.user_id != user.pk and not user.is_superuser:
+            raise PermissionDenied
+        return job
+
+
+class ExportJobStatus(ExportJobMixin, View):
+    """
+    Report the progress of a background export job.
+    """
+
+    def get(self, request, *args, **kwargs):
+        job = self.get_job()
+        if is_stale(job):
+            recover_jobs()
+            job.refresh_from_db()
+        status = job_status(job)
+        if job.status == ExportJob.DONE:
+            status["download"] = reverse(
+                "admin_export_job_download", kwargs={"pk": job.pk}
+            )
+        return JsonResponse(status)
+
+
+class ExportJobDownload(ExportJobMixin, View):
+    """
+    Download the result of a finished background export job.
+    """
+
+    as_attachment = True
+
+    def get(self, request, *args, **kwargs):
+        job = self.get_job()
+        if job.status != ExportJob.DONE:
+            raise Http404("This export is not finished")
+        content_type, encoding = mimetypes.guess_type(job.filename)
+        response = FileResponse(
+            job.file.open("rb"), content_type=content_type or "application/octet-stream"
+        )
+        response["Filename"] = job.filename  # IE needs this
+        if self.as_attachment:
+            attachment = "attachment; "
+        else:
+            attachment = ""
+        response["Content-Disposition"] = "{0}filename={1}".format(
+            attachment, job.filename
+        )
+        return response
+
+
+#######################################################################
+
+
+class ExportCacheStats(View):
+    """
+    Report the result cache counters (superusers only).
+    """
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_superuser:
+            raise PermissionDenied
+        cache = get_result_cache()
+        if cache is None:
+            raise Http404("Export results are not cached")
+        return JsonResponse(cache.stats())
+
+
 #####################################################################
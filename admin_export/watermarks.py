@@ -0,0 +1,99 @@
+"""
+Watermarks for delta exports.
+
+A model admin (or export view) names a monotonically increasing field,
+e.g., a last modified timestamp or a version number, as its
+``export_watermark_field``.  Exports given ``since=<value>`` then only
+include the rows whose field is greater than the value (and at most the
+new watermark, which is the greatest value when the export starts); the
+new watermark is returned in the ``X-Export-Watermark`` header.  With
+``since=last`` the watermark of the last delta export by the same user
+(for the content type) is used; the first such export includes every
+row.
+
+The field should be indexed, so that a delta export costs time in
+proportion to the changed rows.
+
+Watermarks can be used in a query string as they are: aware date/times
+are given in UTC (``...Z``), rather than with a ``+`` offset, which
+would be decoded as a space.  (Such a space is taken as a ``+`` again.)
+"""
+#######################################################################
+
+import datetime
+import re
+
+from django.core.exceptions import ValidationError
+from django.db.models import DateTimeField
+
+from .models import ExportWatermark
+
+#######################################################################
+
+WATERMARK_HEADER = "X-Export-Watermark"
+
+# a time zone offset, with its "+" decoded as a space.
+DECODED_OFFSET = re.compile(r"([T ][\d:.]+) (\d\d(:?\d\d)?)$")
+
+#######################################################################
+
+
+def format_watermark(value):
+    """
+    Return the watermark value as a string (full precision), which is
+    safe to use in a query string.
+    """
+    if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return value.isoformat() + "Z"
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def parse_watermark(field, value):
+    """
+    Return the watermark value for the model field, from the string;
+    raising ``ValueError`` if it is not valid.
+    """
+    if isinstance(field, DateTimeField):
+        value = DECODED_OFFSET.sub(r"\1+\2", value)
+    try:
+        return field.to_python(value)
+    except ValidationError as e:
+        raise ValueError("; ".join(e.messages))
+
+
+def _user_id(user):
+    if user is None or not user.is_authenticated:
+        return None
+    return user.pk
+
+
+def load_watermark(user, content_type, field_name):
+    """
+    Return the stored watermark (as a string), or ``None``.
+    """
+    watermark = (
+        ExportWatermark.objects.filter(
+            user_id=_user_id(user), content_type=content_type, field=field_name
+        )
+        .values_list("value", flat=True)
+        .first()
+    )
+    return watermark
+
+
+def store_watermark(user, content_type, field_name, value):
+    """
+    Store the watermark value.
+    """
+    ExportWatermark.objects.update_or_create(
+        user_id=_user_id(user),
+        content_type=content_type,
+        field=field_name,
+        defaults={"value": format_watermark(value)},
+    )
+
+
+#######################################################################
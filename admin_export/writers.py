@@ -0,0 +1,390 @@
+"""
+Spreadsheet writer backends, registered by format.
+
+A writer turns the header and data rows of an export into encoded bytes,
+generated as the rows are consumed.  The spreadsheet admin actions are
+registered for each format in this registry; so custom writers should
+be registered before ``admin_export.actions`` is imported.
+"""
+#######################################################################
+
+import csv
+import mimetypes
+import tempfile
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+from django.utils.encoding import force_str
+
+from .converters import (
+    BOOL,
+    DATE,
+    DATETIME,
+    DECIMAL,
+    DURATION,
+    FLOAT,
+    INT,
+    NATIVE_CONVERTERS,
+    SPREADSHEET_CONVERTERS,
+    TEXT_CONVERTERS,
+    TIME,
+    get_cell_types,
+)
+from .utils import decode_field, get_model_field
+
+#######################################################################
+
+_registry = OrderedDict()
+
+mimetypes.add_type("application/vnd.apache.parquet", ".parquet")
+mimetypes.add_type("application/vnd.apache.arrow.file", ".arrow")
+
+#######################################################################
+
+
+def register_writer(writer_class):
+    """
+    Register a writer class for its format (can be used as a decorator).
+    """
+    _registry[writer_class.format] = writer_class
+    return writer_class
+
+
+def get_writer_class(format):
+    """
+    Return the writer class for the format.
+    """
+    try:
+        return _registry[format]
+    except KeyError:
+        raise ImproperlyConfigured(
+            "No spreadsheet writer is registered for {0!r}".format(format)
+        )
+
+
+def get_formats():
+    """
+    Return the registered formats.
+    """
+    return list(_registry)
+
+
+#######################################################################
+
+
+class Echo(object):
+    """
+    A file-like object which simply returns what is written to it,
+    so that ``csv.writer`` can be used to produce rows one at a time.
+    """
+
+    def write(self, value):
+        return value
+
+
+#######################################################################
+
+
+class BaseWriter(object):
+    """
+    Base class for writers.
+    """
+
+    format = None
+    # True if outputs (without headers) can simply be concatenated.
+    concatenate = False
+    # the converters for the cells of the rows, by cell type.
+    cell_converters = TEXT_CONVERTERS
+    # True if the writer can write several sheets (``iter_sheets_bytes()``).
+    multiple_sheets = False
+    block_size = 64 * 1024
+
+    def __init__(self, model=None, fields=None, encoding="utf-8", cell_types=None):
+        self.model = model
+        self.fields = fields
+        self.encoding = encoding
+        if cell_types is None and model is not None and fields is not None:
+            cell_types = get_cell_types(model, fields)
+        self.cell_types = cell_types
+
+    def iter_bytes(self, rows, headers=None):
+        """
+        Generate the encoded output for the rows (with headers, if given).
+        """
+        raise NotImplementedError
+
+    def iter_file(self, fp):
+        """
+        Generate the contents of the (binary) file, from the start.
+        """
+        fp.seek(0)
+        while True:
+            data = fp.read(self.block_size)
+            if not data:
+                break
+            yield data
+
+
+class CSVWriter(BaseWriter):
+    """
+    Comma separated values, written one row at a time.
+    """
+
+    format = "csv"
+    concatenate = True
+
+    def iter_bytes(self, rows, headers=None):
+        writer = csv.writer(Echo())
+        if headers is not None:
+            yield writer.writerow(headers).encode(self.encoding)
+        for row in rows:
+            yield writer.writerow(row).encode(self.encoding)
+
+
+class SheetWriter(BaseWriter):
+    """
+    Any format supported by ``python-spreadsheet``; note that this needs
+    all of the rows up front.
+    """
+
+    def iter_bytes(self, rows, headers=None):
+        from spreadsheet import sheetWriter
+
+        data = [headers] if headers is not None else []
+        data.extend(rows)
+        stream = sheetWriter(data, self.format)
+        if not isinstance(stream, bytes):
+            stream = stream.encode(self.encoding)
+        yield stream
+
+
+class XLSXWriter(BaseWriter):
+    """
+    Office Open XML workbooks, with ``openpyxl`` in write-only mode:
+    rows are written one at a time into a temporary file, so memory use
+    does not grow with the number of rows.  Numbers, dates, etc., are
+    written as typed cells.
+    """
+
+    format = "xlsx"
+    cell_converters = SPREADSHEET_CONVERTERS
+    multiple_sheets = True
+
+    def iter_bytes(self, rows, headers=None):
+        return self.iter_sheets_bytes([(None, headers)], ((0, row) for row in rows))
+
+    def iter_sheets_bytes(self, sheets, rows):
+        """
+        Write a workbook of several sheets: ``sheets`` is a list of
+        ``(title, headers)``, and ``rows`` generates ``(sheet index, row)``
+        in any order.
+        """
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        worksheets = []
+        for title, headers in sheets:
+            worksheet = workbook.create_sheet(title)
+            if headers is not None:
+                worksheet.append(headers)
+            worksheets.append(worksheet)
+        for index, row in rows:
+            worksheets[index].append(row)
+        with tempfile.TemporaryFile() as fp:
+            workbook.save(fp)
+            for data in self.iter_file(fp):
+                yield data
+
+
+class ArrowWriter(BaseWriter):
+    """
+    Base class for columnar formats, written with ``pyarrow``.
+
+    Rows are collected into column buffers of ``batch_size`` rows; each
+    batch is converted to typed arrays (from the cell types) and written
+    as a record batch (or row group), so memory use is bounded.
+    """
+
+    cell_converters = NATIVE_CONVERTERS
+    batch_size = 10000
+    # the scale of decimal columns which are not model fields (e.g., sums).
+    decimal_scale = 10
+
+    def get_arrow_type(self, cell_type, fieldname):
+        """
+        Return the arrow type for the cell type of the export field; or
+        ``None`` for text.
+        """
+        import pyarrow as pa
+
+        if cell_type == DECIMAL:
+            field = get_model_field(self.model, fieldname)
+            if isinstance(field, models.DecimalField) and field.max_digits:
+                return pa.decimal128(field.max_digits, field.decimal_places)
+            return pa.decimal128(38, self.decimal_scale)
+        if cell_type == DATETIME:
+            return pa.timestamp("us", tz="UTC" if settings.USE_TZ else None)
+        return {
+            BOOL: pa.bool_(),
+            INT: pa.int64(),
+            FLOAT: pa.float64(),
+            DATE: pa.date32(),
+            TIME: pa.time64("us"),
+            DURATION: pa.duration("us"),
+        }.get(cell_type, None)
+
+    def get_column_names(self, headers):
+        """
+        Return unique column names: the headers, or the field names.
+        """
+        if headers is None:
+            headers = [decode_field(f)[0] for f in self.fields]
+        names = []
+        for name in headers:
+            name = force_str(name)
+            unique, n = name, 1
+            while unique in names:
+                n += 1
+                unique = "{0}_{1}".format(name, n)
+            names.append(unique)
+        return names
+
+    def get_schema(self, headers):
+        """
+        Return the arrow schema for the export.
+        """
+        import pyarrow as pa
+
+        self.arrow_types = [
+            self.get_arrow_type(t, f) for t, f in zip(self.cell_types, self.fields)
+        ]
+        return pa.schema(
+            [
+                pa.field(name, t if t is not None else pa.string())
+                for name, t in zip(self.get_column_names(headers), self.arrow_types)
+            ]
+        )
+
+    def convert(self, value, arrow_type):
+        """
+        Convert a cell value for a column of the given type.
+        """
+        if arrow_type is None:
+            return force_str(value)
+        if isinstance(value, str):
+            return None  # the none_str, or a null relation on the way.
+        if isinstance(value, Decimal):
+            # e.g., averages may have more places than the column.
+            return value.quantize(Decimal(1).scaleb(-arrow_type.scale))
+        return value
+
+    def make_batch(self, schema, rows):
+        """
+        Return the record batch for the rows.
+        """
+        import pyarrow as pa
+
+        arrays = []
+        for i, (field, arrow_type) in enumerate(zip(schema, self.arrow_types)):
+            values = [self.convert(row[i], arrow_type) for row in rows]
+            arrays.append(pa.array(values, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    def iter_batches(self, schema, rows):
+        """
+        Generate the record batches for the rows.
+        """
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                yield self.make_batch(schema, batch)
+                batch = []
+        if batch:
+            yield self.make_batch(schema, batch)
+
+    def open_writer(self, fp, schema):
+        raise NotImplementedError
+
+    def iter_bytes(self, rows, headers=None):
+        schema = self.get_schema(headers)
+        with tempfile.TemporaryFile() as fp:
+            writer = self.open_writer(fp, schema)
+            for batch in self.iter_batches(schema, rows):
+                self.write_batch(writer, batch)
+            writer.close()
+            for data in self.iter_file(fp):
+                yield data
+
+    def write_batch(self, writer, batch):
+        writer.write_batch(batch)
+
+
+class ParquetWriter(ArrowWriter):
+    """
+    Apache Parquet; one row group per batch.
+    """
+
+    format = "parquet"
+    compression = "snappy"
+
+    def open_writer(self, fp, schema):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetWriter(fp, schema, compression=self.compression)
+
+    def write_batch(self, writer, batch):
+        import pyarrow as pa
+
+        writer.write_table(pa.Table.from_batches([batch]))
+
+
+class ArrowIPCWriter(ArrowWriter):
+    """
+    Apache Arrow IPC (Feather v2) files.
+    """
+
+    format = "arrow"
+
+    def open_writer(self, fp, schema):
+        import pyarrow as pa
+
+        return pa.ipc.new_file(fp, schema)
+
+
+class XLSXSheetWriter(SheetWriter):
+    """
+    Office Open XML workbooks, via ``python-spreadsheet``.
+    """
+
+    format = "xlsx"
+
+
+#######################################################################
+
+register_writer(CSVWriter)
+
+# adaptively use openpyxl for xlsx.
+try:
+    import openpyxl  # noqa: F401
+except ImportError:
+    register_writer(XLSXSheetWriter)
+else:
+    register_writer(XLSXWriter)
+
+# adaptively use pyarrow for columnar formats.
+try:
+    import pyarrow  # noqa: F401
+    import pyarrow.parquet  # noqa: F401
+except ImportError:
+    pass
+else:
+    register_writer(ParquetWriter)
+    register_writer(ArrowIPCWriter)
+
+# consider also: odf, xls (via SheetWriter)
+
+#######################################################################